@@ -0,0 +1,248 @@
+from decimal import Decimal
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from balCoop.models import IndicadorCarteraCoopModel
+from balCoop.sync import obtener_registros_locales
+from indicadores.motor import C, P, div, suma
+from indicadores.registro import registrar
+
+# Calidad de cartera y depósitos materializados por (entidad, periodo, mes) en
+# indicador_cartera_coop. Se recalcula el mes completo cada vez que cambian sus
+# saldos y BalCoopApiViewIndicadorC sólo calcula en línea lo que falte.
+# Las entidades se identifican con (nit_dv, razón social): los saldos del nit
+# prevalecen y los de la razón social completan las cuentas que falten.
+
+def claves_entidad(entidad):
+    """Las entidades del bloque son (nit_dv, razón social)."""
+    return entidad
+
+def promedio(cuenta):
+    """Promedio entre el diciembre anterior y el saldo del mes."""
+    return (P(cuenta) + C(cuenta)) / 2
+
+ACTIVO = C("100000")
+MERCADEO = C("511018")
+GOBERNABILIDAD = C("511020", "511021", "511022")
+DEPRECIACIONES = C("512000", "512500")
+
+FORMULAS_FINANCIEROS = {
+    "indicadorCartera": div(C("140000"), ACTIVO),
+    "indicadorDeposito": div(C("210000"), ACTIVO),
+    "indicadorObligaciones": div(C("230000"), ACTIVO),
+    "indicadorCapSocial": div(C("310000"), ACTIVO),
+    "indicadorCapInst": div(C("311010", "320000", "330500", "340500"), ACTIVO),
+    "indicadorRoe": div(C("350000"), promedio("300000")),
+    "indicadorRoa": div(C("350000"), promedio("100000")),
+    "indicadorIngCartera": div(C("415000"), promedio("140000")),
+    "indicadorCostDeposito": div(C("615005", "615010", "615015", "615020"), promedio("210000")),
+    "indicadorCredBanco": div(C("615035"), promedio("230000")),
+    "indicadorDisponible": div(C("110000", "120000"), ACTIVO),
+    "indicadorActivoImpro": div(C("150000", "160000", "170000", "180000", "190000"), ACTIVO),
+    "DeterioroGastosOperativos": div(C("511500"), promedio("100000")),
+    # gastos opetativos
+    "indicadorPersonal": div(C("510500"), promedio("100000")),
+    "indicadorGenerales": div(C("511000") - MERCADEO - GOBERNABILIDAD, promedio("100000")),
+    "indicadorMercadeo": div(MERCADEO, promedio("100000")),
+    "indicadorGobernabilidad": div(GOBERNABILIDAD, promedio("100000")),
+    "indicadorDepreciacionesAmort": div(DEPRECIACIONES, promedio("100000")),
+    "indicadorTotalGastonOperativos": div(C("510500", "511000") + MERCADEO + GOBERNABILIDAD + DEPRECIACIONES, promedio("100000")),
+}
+
+# Modalidades de cartera en el orden de la respuesta: calificaciones A-E,
+# intereses, otros conceptos y deterioro.
+MODALIDADES = {
+    "consumo": ([C("141105", "141205", "144105", "144205"), C("141110", "141210", "144110", "144210"), C("141115", "141215", "144115", "144215"), C("141120", "141220", "144120", "144220"), C("141125", "141225", "144125", "144225")], C("144300"), C("144400"), C("144500", "144600", "144700")),
+    "microcredito": ([C("144805", "145505", "145405"), C("144810", "145410", "145510"), C("144815", "145515", "145415"), C("144820", "145520", "145420"), C("144825", "145425", "145525")], C("144900", "145600"), C("145000", "145700"), C("145100", "145200", "145300", "145800", "145900", "146000")),
+    "producto": ([C("147605"), C("147610"), C("147615"), C("147620"), C("147625")], C("147700"), C("147800"), C("147900", "148000", "148100")),
+    "comercial": ([C("146105", "146205"), C("146110", "146210"), C("146115", "146215"), C("146120", "146220"), C("146125", "146225")], C("146300"), C("146400"), C("146500", "146600", "146700")),
+    "vivienda": ([C("140405", "140505"), C("140410", "140510"), C("140415", "140515"), C("140420", "140520"), C("140425", "140525")], C("140600"), C("140700"), C("140800", "140900", "141000")),
+    "empleados": ([C("146905", "146930"), C("146910", "146935"), C("146915", "146940"), C("146920", "146945"), C("146925", "146950")], C("147000"), C("147400"), C("147100", "147200", "147500")),
+}
+# Los totales suman productos al final.
+ORDEN_TOTALES = ["consumo", "microcredito", "comercial", "vivienda", "empleados", "producto"]
+# La respuesta histórica usa "empladosInteres".
+NOMBRE_INTERES = {"empleados": "empladosInteres"}
+DETERIORO_INDIVIDUAL = C("144500", "144600", "144700", "145100", "145200", "145300", "145800", "145900", "146000", "147900", "148000", "148100", "146500", "146600", "146700", "140800", "140900", "141000", "147100", "147200", "147500")
+DEPOSITOS = [
+    ("Ahorro", "210500"),
+    ("AhorroTermino", "211000"),
+    ("AhorroContractual", "212500"),
+    ("AhorroPermanente", "213000"),
+]
+
+def formulas_cartera():
+    formulas = {}
+    for nombre, (calificaciones, interes, conceptos, deterioro) in MODALIDADES.items():
+        a, b, c, d, e = calificaciones
+        total = a + b + c + d + e
+        formulas.update({
+            f"{nombre}A": a,
+            f"{nombre}B": b,
+            f"{nombre}C": c,
+            f"{nombre}D": d,
+            f"{nombre}E": e,
+            f"{nombre}Total": total,
+            NOMBRE_INTERES.get(nombre, f"{nombre}Interes"): interes,
+            f"{nombre}Conceptos": conceptos,
+            f"{nombre}Contable": total + interes + conceptos,
+            f"{nombre}IndMora": div(b + c + d + e, total),
+            f"{nombre}CartImprod": div(c + d + e, total),
+            f"{nombre}Deterioro": deterioro,
+            f"{nombre}PorcCobertura": div(deterioro, b + c + d + e),
+        })
+
+    total_a, total_b, total_c, total_d, total_e = (
+        suma(MODALIDADES[nombre][0][k] for nombre in ORDEN_TOTALES) for k in range(5)
+    )
+    total_total = total_a + total_b + total_c + total_d + total_e
+    total_interes = suma(MODALIDADES[nombre][1] for nombre in ORDEN_TOTALES)
+    total_conceptos = suma(MODALIDADES[nombre][2] for nombre in ORDEN_TOTALES)
+    total_convenios = C("147300")
+    total_deterioro = DETERIORO_INDIVIDUAL + C("146800")
+    formulas.update({
+        "totalA": total_a,
+        "totalB": total_b,
+        "totalC": total_c,
+        "totalD": total_d,
+        "totalE": total_e,
+        "totalTotal": total_total,
+        "totalInteres": total_interes,
+        "totalConceptos": total_conceptos,
+        "totalConvenios": total_convenios,
+        "totalContable": total_total + total_interes + total_conceptos + total_convenios - total_deterioro,
+        "totalCastigos": C("831000"),
+        "totalIndMora": div(total_b + total_c + total_d + total_e, total_a + total_b + total_c + total_d + total_e),
+        "totalCartImpro": div(total_c + total_d + total_e, total_a + total_b + total_c + total_d + total_e),
+        "totalDeterioroInd": DETERIORO_INDIVIDUAL,
+        "totalDeterioroGen": C("146800"),
+        "totalDeterioro": total_deterioro,
+        "totalPorcCobertura": div(total_deterioro, total_b + total_c + total_d + total_e),
+    })
+
+    deposito = C("210000")
+    formulas["deposito"] = deposito
+    particiones = []
+    for nombre, cuenta in DEPOSITOS:
+        particion = div(C(cuenta), deposito)
+        formulas[f"deposito{nombre}"] = C(cuenta)
+        formulas[f"particion{nombre}"] = particion
+        particiones.append(particion)
+    formulas["depositoPorcentajeTotal"] = suma(particiones)
+    return formulas
+
+FORMULAS_CARTERA = formulas_cartera()
+
+INDICADORES_FINANCIEROS = registrar("balCoop.financieros", FORMULAS_FINANCIEROS)
+INDICADORES_CARTERA = registrar("balCoop.cartera", FORMULAS_CARTERA)
+
+# Cuentas que leen las fórmulas: del mes y del diciembre anterior.
+PUC_INDICADOR_ACTUAL = INDICADORES_FINANCIEROS.cuentas()
+PUC_INDICADOR_ANTERIOR = INDICADORES_FINANCIEROS.cuentas(anterior=True)
+PUC_CARTERA = INDICADORES_CARTERA.cuentas()
+
+def saldos_mes(periodo, mes, cuentas):
+    """Saldos del mes desde el espejo de bal_coop, con la misma forma que
+    obtener_saldos, y el nit de cada razón social (None para entidades sólo
+    cargadas a mano). None si el corte no está sincronizado: con sólo las cargas,
+    lo guardado ocultaría los saldos por nit de datos.gov.co."""
+    registros = obtener_registros_locales(periodo, mes, cuentas)
+    if registros is None:
+        return None
+    saldos = defaultdict(lambda: defaultdict(Decimal))
+    entidades = {}
+    for result in registros:
+        saldos[result["nit"] or result["entidad_RS"]][result["cuenta"]] += result["valor"]
+        entidades[result["entidad_RS"]] = result["nit"] or entidades.get(result["entidad_RS"])
+    return saldos, entidades
+
+def a_json(indicadores):
+    return {nombre: float(valor) for nombre, valor in indicadores.items()}
+
+def materializar_cartera(periodo, mes):
+    """Recalcula y reemplaza los indicadores de cartera de todas las entidades de un
+    mes sincronizado."""
+    saldos = saldos_mes(periodo, mes, PUC_CARTERA)
+    if saldos is None:
+        print(f"CARTERA COOP {periodo}-{mes:02d}: corte sin sincronizar, no se materializa")
+        return 0
+    saldos_current, entidades = saldos
+    lista_entidades = [(nit, razon_social) for razon_social, nit in entidades.items()]
+    calculados = INDICADORES_CARTERA.calcular(lista_entidades, {(periodo, mes): (saldos_current, None)}, claves=claves_entidad)
+    filas = [
+        IndicadorCarteraCoopModel(
+            periodo=periodo,
+            mes=mes,
+            entidad_RS=razon_social,
+            nit=nit,
+            indicadores=calculados[((nit, razon_social), (periodo, mes))],
+        )
+        for nit, razon_social in lista_entidades
+    ]
+    with transaction.atomic():
+        IndicadorCarteraCoopModel.objects.filter(periodo=periodo, mes=mes).delete()
+        IndicadorCarteraCoopModel.objects.bulk_create(filas)
+    print(f"CARTERA COOP {periodo}-{mes:02d}: {len(filas)} entidades")
+    return len(filas)
+
+def invalidar_cartera(periodo, mes, entidades):
+    """Borra la cartera guardada de las entidades cargadas a mano en el mes, para que
+    la próxima solicitud la calcule en línea con los saldos nuevos."""
+    IndicadorCarteraCoopModel.objects.filter(periodo=periodo, mes=mes, entidad_RS__in=entidades).delete()
+
+class ActualizacionCartera:
+    """Recálculo tras una carga manual, encolado como trabajo (ver balCoop/reportes.py)
+    para que no lo haga la solicitud de la carga."""
+
+    def calcular(self, datos):
+        return [
+            {"periodo": int(item["periodo"]), "mes": int(item["mes"]), "filas": materializar_cartera(int(item["periodo"]), int(item["mes"]))}
+            for item in datos
+        ]
+
+def guardar_cartera(resultados, nit_por_razon_social):
+    """Guarda los indicadores calculados en línea para entidades que aún no estaban
+    materializadas. Las filas en cero no se guardan: suelen venir de una consulta
+    fallida a la API y la siguiente solicitud debe reintentarla."""
+    filas = [
+        IndicadorCarteraCoopModel(
+            periodo=resultado["periodo"],
+            mes=resultado["mes"],
+            entidad_RS=resultado["entidad_RS"],
+            nit=nit_por_razon_social.get(resultado["entidad_RS"]),
+            indicadores=a_json({
+                nombre: valor for nombre, valor in resultado.items()
+                if nombre not in ("entidad_RS", "sigla", "periodo", "mes")
+            }),
+        )
+        for resultado in resultados
+    ]
+    filas = [fila for fila in filas if any(fila.indicadores.values())]
+    if filas:
+        IndicadorCarteraCoopModel.objects.bulk_create(
+            filas,
+            update_conflicts=True,
+            unique_fields=["periodo", "mes", "entidad_RS"] if connection.features.supports_update_conflicts_with_target else None,
+            update_fields=["nit", "indicadores", "updated_at"],
+        )
+
+def leer_cartera(periodos, nits, razones_sociales):
+    """{(nit o razón social, periodo, mes): indicadores} en una sola consulta indexada."""
+    q_periodos = {(int(periodo), int(mes)) for periodo, mes in periodos}
+    if not q_periodos or not (nits or razones_sociales):
+        return {}
+    query_results = IndicadorCarteraCoopModel.objects.filter(
+        Q(nit__in=nits) | Q(entidad_RS__in=razones_sociales),
+        periodo__in={periodo for periodo, _ in q_periodos},
+        mes__in={mes for _, mes in q_periodos},
+    ).values_list("nit", "entidad_RS", "periodo", "mes", "indicadores")
+    materializados = {}
+    for nit, razon_social, periodo, mes, indicadores in query_results:
+        if (periodo, mes) not in q_periodos:
+            continue
+        materializados[(razon_social, periodo, mes)] = indicadores
+        if nit:
+            materializados[(nit, periodo, mes)] = indicadores
+    return materializados
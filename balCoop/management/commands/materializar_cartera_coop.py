@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from balCoop.indicadores import materializar_cartera
+from balCoop.models import BalCoopModel
+
+class Command(BaseCommand):
+    help = "Recalcula la tabla indicador_cartera_coop a partir de bal_coop."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--periodo", type=int, help="Año a recalcular.")
+        parser.add_argument("--mes", type=int, help="Mes a recalcular (requiere --periodo).")
+
+    def handle(self, *args, **options):
+        periodo = options.get("periodo")
+        mes = options.get("mes")
+        if mes and not periodo:
+            raise CommandError("--mes requiere --periodo.")
+
+        meses = BalCoopModel.objects.order_by().values_list("periodo", "mes").distinct()
+        if periodo:
+            meses = meses.filter(periodo=periodo)
+        if mes:
+            meses = meses.filter(mes=mes)
+
+        total = 0
+        for periodo, mes in sorted(meses):
+            total += materializar_cartera(periodo, mes)
+        self.stdout.write(self.style.SUCCESS(f"{total} filas de cartera materializadas"))
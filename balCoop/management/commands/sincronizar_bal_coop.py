@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from balCoop.indicadores import materializar_cartera
+from balCoop.sync import sincronizar_corte, sincronizar_incremental
+
+class Command(BaseCommand):
+    help = "Sincroniza bal_coop con los datasets de la Supersolidaria en datos.gov.co (78xz-k3hv, irgu-au8v, tic6-rbue)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--periodo", type=int, help="Año del corte a descargar de nuevo.")
+        parser.add_argument("--mes", type=int, help="Mes del corte a descargar de nuevo.")
+
+    def handle(self, *args, **options):
+        periodo = options.get("periodo")
+        mes = options.get("mes")
+        if periodo or mes:
+            if not (periodo and mes):
+                raise CommandError("Debe indicar --periodo y --mes juntos.")
+            registros = sincronizar_corte(periodo, mes)
+            materializar_cartera(periodo, mes)
+            self.stdout.write(self.style.SUCCESS(f"{periodo}-{mes:02d}: {registros} registros"))
+            return
+
+        sincronizados = sincronizar_incremental()
+        for periodo, mes, registros in sincronizados:
+            materializar_cartera(periodo, mes)
+            self.stdout.write(f"{periodo}-{mes:02d}: {registros} registros")
+        self.stdout.write(self.style.SUCCESS(f"{len(sincronizados)} cortes sincronizados"))
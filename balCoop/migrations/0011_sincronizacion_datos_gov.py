@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('balCoop', '0010_alter_balcoopmodel_entidad_rs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='balcoopmodel',
+            name='nit',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='balcoopmodel',
+            name='origen',
+            field=models.CharField(default='carga', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='BalCoopCorteModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.SmallIntegerField()),
+                ('mes', models.SmallIntegerField()),
+                ('dataset', models.CharField(max_length=20)),
+                ('registros', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'bal_coop_corte',
+                'ordering': ['-periodo', '-mes'],
+                'unique_together': {('periodo', 'mes')},
+            },
+        ),
+    ]
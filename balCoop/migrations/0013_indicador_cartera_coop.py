@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 09:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('balCoop', '0012_indices_y_particiones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicadorCarteraCoopModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.SmallIntegerField()),
+                ('mes', models.SmallIntegerField()),
+                ('entidad_RS', models.CharField(max_length=150)),
+                ('nit', models.CharField(blank=True, max_length=20, null=True)),
+                ('indicadores', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'indicador_cartera_coop',
+                'indexes': [models.Index(fields=['nit', 'periodo', 'mes'], name='indicador_cartera_coop_nit_idx')],
+                'unique_together': {('periodo', 'mes', 'entidad_RS')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 10:16
+
+from django.db import migrations, models
+
+# Los índices nuevos se crean antes de borrar los anteriores para que las
+# consultas no queden sin índice mientras se reconstruyen.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('balCoop', '0013_indicador_cartera_coop'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='balcoopmodel',
+            index=models.Index(fields=['periodo', 'mes', 'puc_codigo', 'entidad_RS', 'nit', 'origen', 'saldo'], name='bal_coop_corte_cubriente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='balcoopmodel',
+            index=models.Index(fields=['entidad_RS', 'periodo', 'mes', 'puc_codigo', 'nit', 'origen', 'saldo'], name='bal_coop_entidad_cubriente_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='balcoopmodel',
+            name='bal_coop_periodo_mes_puc_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='balcoopmodel',
+            name='bal_coop_entidad_periodo_idx',
+        ),
+    ]
@@ -1,14 +1,54 @@
 from django.db import models
- 
+
+ORIGEN_CARGA = 'carga'
+ORIGEN_DATOS_GOV = 'datos_gov'
+
 class BalCoopModel(models.Model):
     periodo = models.SmallIntegerField()
     mes = models.SmallIntegerField()
     entidad_RS = models.CharField(max_length=150)
+    nit = models.CharField(max_length=20, null=True, blank=True)
     puc_codigo = models.CharField(max_length=128)
     saldo = models.DecimalField(max_digits=18, decimal_places=2)
+    origen = models.CharField(max_length=20, default=ORIGEN_CARGA)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = "bal_coop"
-        ordering = ['-created_at']
+        # Índices cubrientes para las consultas por corte (periodo, mes, cuenta) y por
+        # entidad; incluyen nit, origen y saldo, que también filtran o leen las
+        # consultas, para que la lectura no tenga que ir a la tabla.
+        indexes = [
+            models.Index(fields=['periodo', 'mes', 'puc_codigo', 'entidad_RS', 'nit', 'origen', 'saldo'], name='bal_coop_corte_cubriente_idx'),
+            models.Index(fields=['entidad_RS', 'periodo', 'mes', 'puc_codigo', 'nit', 'origen', 'saldo'], name='bal_coop_entidad_cubriente_idx'),
+        ]
+
+class BalCoopCorteModel(models.Model):
+    periodo = models.SmallIntegerField()
+    mes = models.SmallIntegerField()
+    dataset = models.CharField(max_length=20)
+    registros = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "bal_coop_corte"
+        ordering = ['-periodo', '-mes']
+        unique_together = ('periodo', 'mes')
+
+class IndicadorCarteraCoopModel(models.Model):
+    periodo = models.SmallIntegerField()
+    mes = models.SmallIntegerField()
+    entidad_RS = models.CharField(max_length=150)
+    nit = models.CharField(max_length=20, null=True, blank=True)
+    indicadores = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "indicador_cartera_coop"
+        unique_together = ('periodo', 'mes', 'entidad_RS')
+        indexes = [
+            models.Index(fields=['nit', 'periodo', 'mes'], name='indicador_cartera_coop_nit_idx'),
+        ]
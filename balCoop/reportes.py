@@ -0,0 +1,7 @@
+from trabajos.registro import registrar
+from balCoop.indicadores import ActualizacionCartera
+from balCoop.views import BalCoopApiViewIndicador, BalCoopApiViewIndicadorC
+
+registrar("bal_coop/indicador_financiero", BalCoopApiViewIndicador)
+registrar("bal_coop/indicador_cartera", BalCoopApiViewIndicadorC)
+registrar("bal_coop/actualizar_cartera", ActualizacionCartera, publico=False)
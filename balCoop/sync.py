@@ -0,0 +1,326 @@
+import requests
+import threading
+
+from time import sleep
+from decimal import Decimal, InvalidOperation
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from balCoop.models import BalCoopModel, BalCoopCorteModel, ORIGEN_CARGA, ORIGEN_DATOS_GOV
+from entidad.models import EntidadModel
+from datosGov import motor
+from datosGov.socrata import agregar_json_en_bloques, paginar
+from datosGov.soql import ConsultaSoQL
+
+# Espejo local de los tres datasets de la Supersolidaria. Cada año se publica en
+# un dataset distinto y 2020 usa codcuenta en lugar de codrenglon; este módulo es
+# el único lugar que conoce esa división.
+
+DATASET_2020 = "78xz-k3hv"
+DATASET_2021 = "irgu-au8v"
+DATASET_ACTUAL = "tic6-rbue"
+BASE_URL_DATASET = "https://www.datos.gov.co/resource/{}.json"
+
+MESES = [
+    "ENERO", "FEBRERO", "MARZO", "ABRIL",
+    "MAYO", "JUNIO", "JULIO", "AGOSTO",
+    "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"
+]
+
+TAMANO_PAGINA = 50000
+TAMANO_LOTE = 5000
+MAX_REINTENTOS = 3
+ESPERA_REINTENTO = 2
+
+def format_nit_dv(nit, dv):
+    nit_str = str(nit).zfill(9)
+    dv_str = str(dv).zfill(1)
+
+    formatted_nit_dv = f"{nit_str[:3]}-{nit_str[3:6]}-{nit_str[6:]}-{dv_str}"
+    return formatted_nit_dv
+
+def get_month_name(month_number):
+    if 1 <= month_number <= 12:
+        return MESES[month_number - 1]
+    else:
+        raise ValueError("Número de mes inválido. Debe estar entre 1 y 12.")
+
+def clean_currency_value_Decimal(value):
+    try:
+        cleaned_value = value.replace('$', '').replace(',', '').strip()
+
+        if cleaned_value.startswith('-'):
+            cleaned_value = '-' + cleaned_value[1:].replace(' ', '')
+        else:
+            cleaned_value = cleaned_value.replace(' ', '')
+
+        return Decimal(cleaned_value)
+    except InvalidOperation:
+        return Decimal(0)
+
+def get_dataset_solidaria(periodo):
+    """Devuelve (id del dataset, campo de la cuenta) para el año consultado."""
+    if periodo == 2020:
+        return (DATASET_2020, 'codcuenta')
+    elif periodo == 2021:
+        return (DATASET_2021, 'codrenglon')
+    else:
+        return (DATASET_ACTUAL, 'codrenglon')
+
+def get_api_details(periodo, limit=100000):
+    dataset, campo_cuenta = get_dataset_solidaria(periodo)
+    return (f"{BASE_URL_DATASET.format(dataset)}?$limit={limit}", campo_cuenta)
+
+def consultar_api(dataset, params):
+    url = BASE_URL_DATASET.format(dataset)
+    for attempt in range(MAX_REINTENTOS):
+        try:
+            return motor.get(url, params=params, timeout=(10, 120)).json()
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            print(f"SYNC COOP Timeout/Conectividad en intento {attempt + 1}/{MAX_REINTENTOS}: {e}")
+            if attempt < MAX_REINTENTOS - 1:
+                sleep(ESPERA_REINTENTO)
+    raise requests.exceptions.ConnectionError("No fue posible consultar datos.gov.co")
+
+# Sincronización
+
+def consultar_cortes_disponibles(desde_periodo=None):
+    """Lista los (periodo, mes) publicados en los tres datasets."""
+    cortes = set()
+    for dataset in (DATASET_2020, DATASET_2021, DATASET_ACTUAL):
+        consulta = ConsultaSoQL().select("a_o", "mes").group("a_o", "mes")
+        for row in consultar_api(dataset, consulta.params()):
+            try:
+                periodo = int(row.get("a_o"))
+                mes = MESES.index(str(row.get("mes", "")).upper()) + 1
+            except (TypeError, ValueError):
+                continue
+            if get_dataset_solidaria(periodo)[0] != dataset:
+                continue
+            if desde_periodo is None or periodo >= desde_periodo:
+                cortes.add((periodo, mes))
+    return sorted(cortes)
+
+def descargar_corte(periodo, mes):
+    dataset, campo_cuenta = get_dataset_solidaria(periodo)
+    consulta = (
+        ConsultaSoQL()
+        .select("nit", campo_cuenta, "valor_en_pesos")
+        .igual("a_o", periodo)
+        .igual("mes", get_month_name(mes))
+        .order(":id")
+    )
+    for pagina in paginar(BASE_URL_DATASET.format(dataset), consulta.params(), TAMANO_PAGINA, timeout=(10, 120)):
+        yield [
+            (result.get("nit"), result.get(campo_cuenta), clean_currency_value_Decimal(result.get("valor_en_pesos", "0")))
+            for result in pagina
+        ]
+
+def razones_sociales_por_nit():
+    return {
+        format_nit_dv(entidad["Nit"], entidad["Dv"]): entidad["RazonSocial"]
+        for entidad in EntidadModel.objects.filter(Dv__isnull=False).values("Nit", "Dv", "RazonSocial")
+        if entidad["RazonSocial"]
+    }
+
+def sincronizar_corte(periodo, mes):
+    """Reemplaza en bal_coop las filas espejo de un mes. Las cargas manuales no se tocan."""
+    nit_a_razon_social = razones_sociales_por_nit()
+    registros = 0
+    with transaction.atomic():
+        BalCoopModel.objects.filter(periodo=periodo, mes=mes, origen=ORIGEN_DATOS_GOV).delete()
+        for pagina in descargar_corte(periodo, mes):
+            nuevas = [
+                BalCoopModel(
+                    periodo=periodo,
+                    mes=mes,
+                    entidad_RS=nit_a_razon_social.get(nit, nit or "")[:150],
+                    nit=nit,
+                    puc_codigo=cuenta or "",
+                    saldo=valor,
+                    origen=ORIGEN_DATOS_GOV,
+                )
+                for nit, cuenta, valor in pagina
+            ]
+            BalCoopModel.objects.bulk_create(nuevas, batch_size=TAMANO_LOTE)
+            registros += len(nuevas)
+        if registros:
+            BalCoopCorteModel.objects.update_or_create(
+                periodo=periodo,
+                mes=mes,
+                defaults={"dataset": get_dataset_solidaria(periodo)[0], "registros": registros},
+            )
+    print(f"SYNC COOP {periodo}-{mes:02d}: {registros} registros")
+    return registros
+
+def sincronizar_incremental():
+    """Sincroniza los meses publicados desde el último periodo local, volviendo a
+    descargar el último mes sincronizado porque las entidades reportan tarde."""
+    ultimo = BalCoopCorteModel.objects.order_by('-periodo', '-mes').first()
+    cortes = consultar_cortes_disponibles(ultimo.periodo if ultimo else None)
+    if ultimo:
+        cortes = [corte for corte in cortes if corte >= (ultimo.periodo, ultimo.mes)]
+    return [(periodo, mes, sincronizar_corte(periodo, mes)) for periodo, mes in cortes]
+
+# Lectura
+
+def periodo_sincronizado(periodo, mes):
+    return BalCoopCorteModel.objects.filter(periodo=periodo, mes=mes).exists()
+
+def obtener_registros_locales(periodo, mes, cuentas=None, nits=None):
+    """Devuelve las filas del mes (nit, entidad_RS, cuenta, valor) o None si el corte
+    aún no se ha sincronizado. Las cargas manuales no tienen nit y siempre se
+    incluyen; si chocan con una fila de datos.gov.co prevalece esta última, y entre
+    varias cargas del mismo saldo, la más reciente."""
+    if not periodo_sincronizado(periodo, mes):
+        return None
+    q_periodo = Q(periodo=periodo, mes=mes)
+    if cuentas:
+        q_periodo &= Q(puc_codigo__in=[str(cuenta) for cuenta in cuentas])
+    if nits:
+        q_periodo &= Q(nit__in=nits) | Q(origen=ORIGEN_CARGA)
+    registros = {}
+    query_results = BalCoopModel.objects.filter(q_periodo).order_by("id").values_list("nit", "entidad_RS", "puc_codigo", "saldo", "origen")
+    for nit, razon_social, cuenta, saldo, origen in query_results:
+        key = (razon_social, cuenta)
+        if origen == ORIGEN_CARGA and registros.get(key, (None,))[0] == ORIGEN_DATOS_GOV:
+            continue
+        registros[key] = (origen, nit, saldo)
+    return [
+        {"nit": nit, "entidad_RS": razon_social, "cuenta": cuenta, "valor": saldo}
+        for (razon_social, cuenta), (_, nit, saldo) in registros.items()
+    ]
+
+def obtener_saldos_locales(periodo, mes, cuentas=None, nits=None):
+    """{nit o razón social: {cuenta: saldo}} con la misma forma que devuelve la API."""
+    registros = obtener_registros_locales(periodo, mes, cuentas, nits)
+    if registros is None:
+        return None
+    saldos = defaultdict(lambda: defaultdict(Decimal))
+    for result in registros:
+        saldos[result["nit"] or result["entidad_RS"]][result["cuenta"]] += result["valor"]
+    return saldos
+
+def indice_saldos_db(periodo, mes, cuentas=None):
+    """{entidad_RS: {puc_codigo: saldo}} del mes en una sola pasada sobre la tabla, sin
+    importar si el corte está sincronizado (incluye las cargas manuales). Si una
+    entidad tiene el mismo saldo cargado a mano y desde datos.gov.co, prevalece el
+    de datos.gov.co; entre varias cargas del mismo saldo, la última."""
+    q_periodo = Q(periodo=periodo, mes=mes)
+    if cuentas:
+        q_periodo &= Q(puc_codigo__in=[str(cuenta) for cuenta in cuentas])
+    indice = defaultdict(dict)
+    de_datos_gov = set()
+    query_results = BalCoopModel.objects.filter(q_periodo).order_by("id").values_list("entidad_RS", "puc_codigo", "saldo", "origen")
+    for razon_social, cuenta, saldo, origen in query_results:
+        if origen == ORIGEN_CARGA and (razon_social, cuenta) in de_datos_gov:
+            continue
+        if origen == ORIGEN_DATOS_GOV:
+            de_datos_gov.add((razon_social, cuenta))
+        indice[razon_social][cuenta] = saldo
+    return indice
+
+class SaldosDB:
+    """Índices de indice_saldos_db reutilizados por los bloques de una misma solicitud,
+    en lugar de volver a consultar el mes en cada entidad."""
+
+    def __init__(self):
+        self.indices = {}
+        self.lock = threading.Lock()
+
+    def get(self, periodo, mes, cuentas=None):
+        clave = (int(periodo), int(mes), tuple(cuentas or ()))
+        with self.lock:
+            indice = self.indices.get(clave)
+        if indice is None:
+            indice = indice_saldos_db(int(periodo), int(mes), cuentas)
+            with self.lock:
+                indice = self.indices.setdefault(clave, indice)
+        return indice
+
+    def saldos_entidad(self, razon_social, periodo, mes, cuentas=None):
+        return self.get(periodo, mes, cuentas).get(razon_social, {})
+
+def agregar_por_campo(registros, campo_cuenta):
+    saldos = {}
+    for result in registros:
+        cuentas = saldos.setdefault(result.get("nit"), {})
+        cuenta = result.get(campo_cuenta)
+        cuentas[cuenta] = cuentas.get(cuenta, Decimal(0)) + clean_currency_value_Decimal(result.get("valor_en_pesos", "0"))
+    return saldos
+
+def agregar_saldos(registros):
+    """Reductor de consultar_saldos_api: {nit: {cuenta: saldo}} acumulado registro a registro."""
+    return agregar_por_campo(registros, "codrenglon")
+
+def agregar_saldos_2020(registros):
+    return agregar_por_campo(registros, "codcuenta")
+
+class SaldosAPI(defaultdict):
+    """{nit: {cuenta: saldo}} leído de datos.gov.co. completo es False si algún bloque
+    de la consulta falló y se omitió: sus entidades traen sólo parte de las cuentas,
+    así que el resultado sirve para responder pero no para guardarse."""
+
+    def __init__(self, completo=True):
+        super().__init__(lambda: defaultdict(Decimal))
+        self.completo = completo
+
+def saldos_completos(saldos):
+    """False si los saldos vienen de una consulta a la API con bloques omitidos."""
+    return getattr(saldos, "completo", True)
+
+def consultar_saldos_api(periodo, mes, cuentas, nits):
+    """Consulta datos.gov.co escondiendo el dataset y el campo de cuenta de cada año.
+    Con cuentas None trae todas las cuentas de los nits. Los bloques que fallan se
+    omiten y marcan el resultado como incompleto."""
+    dataset, campo_cuenta = get_dataset_solidaria(periodo)
+    cuentas = [str(cuenta) for cuenta in cuentas] if cuentas is not None else None
+    saldos = SaldosAPI()
+    if cuentas == [] or not nits:
+        return saldos
+
+    def construir(listas):
+        consulta = (
+            ConsultaSoQL()
+            .select("nit", campo_cuenta, "valor_en_pesos")
+            .igual("a_o", periodo)
+            .igual("mes", get_month_name(mes))
+            .en("nit", listas["nit"])
+        )
+        if "cuenta" in listas:
+            consulta.en(campo_cuenta, listas["cuenta"])
+        return consulta.limit(100000)
+
+    listas = {"nit": nits}
+    if cuentas is not None:
+        listas["cuenta"] = cuentas
+
+    reductor = agregar_saldos_2020 if campo_cuenta == "codcuenta" else agregar_saldos
+    bloques = agregar_json_en_bloques(
+        BASE_URL_DATASET.format(dataset),
+        construir,
+        listas,
+        reductor,
+        timeout=(10, 120),
+        paginado=True,
+        omitir_errores=True,
+    )
+    saldos.completo = all(agregados is not None for agregados in bloques)
+    for agregados in bloques:
+        if agregados is None:
+            continue
+        for nit, saldos_nit in agregados.items():
+            for cuenta, saldo in saldos_nit.items():
+                if cuentas is None or cuenta in cuentas:
+                    saldos[nit][cuenta] += saldo
+    return saldos
+
+def obtener_saldos(periodo, mes, cuentas, nits):
+    """Punto de lectura único: el espejo local si el mes está sincronizado, si no la
+    API. Con cuentas None se leen todas las cuentas."""
+    saldos = obtener_saldos_locales(periodo, mes, cuentas, nits)
+    if saldos is None:
+        saldos = consultar_saldos_api(periodo, mes, cuentas, nits)
+    return saldos
@@ -1,3 +1,161 @@
+from decimal import Decimal
+from unittest import mock
+
 from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from balCoop import sync, views
+from balCoop.indicadores import PUC_CARTERA, ActualizacionCartera
+from balCoop.models import BalCoopCorteModel, BalCoopModel, IndicadorCarteraCoopModel, ORIGEN_CARGA, ORIGEN_DATOS_GOV
+from entidad.models import EntidadModel
+from trabajos.models import TrabajoModel
+from balCoop.sync import SaldosAPI, consultar_saldos_api, indice_saldos_db, obtener_registros_locales, saldos_completos
+
+ENTIDADES = [(1000 + i, i % 10, f"COOP {i}") for i in range(3)]
+DATOS = [{
+    "periodo": 2023,
+    "mes": 6,
+    "nit": {"solidaria": [{"nit": nit, "dv": dv, "RazonSocial": rs, "sigla": rs} for nit, dv, rs in ENTIDADES]},
+}]
+
+
+class ConsultarSaldosApiTests(TestCase):
+    def consultar(self, bloques):
+        with mock.patch("balCoop.sync.agregar_json_en_bloques", return_value=bloques) as agregar:
+            saldos = consultar_saldos_api(2023, 6, ["100000", "140000"], ["1000-0", "1001-1"])
+        self.assertTrue(agregar.call_args.kwargs["omitir_errores"])
+        return saldos
+
+    def test_todos_los_bloques(self):
+        saldos = self.consultar([
+            {"1000-0": {"100000": Decimal(5)}},
+            {"1000-0": {"100000": Decimal(2)}, "1001-1": {"140000": Decimal(3), "999999": Decimal(1)}},
+        ])
+        self.assertTrue(saldos_completos(saldos))
+        self.assertEqual(saldos["1000-0"]["100000"], Decimal(7))
+        self.assertEqual(dict(saldos["1001-1"]), {"140000": Decimal(3)})
+
+    def test_bloque_omitido_marca_incompleto(self):
+        saldos = self.consultar([{"1000-0": {"100000": Decimal(5)}}, None])
+        self.assertFalse(saldos_completos(saldos))
+        self.assertEqual(saldos["1000-0"]["100000"], Decimal(5))
+
+    def test_saldos_locales_son_completos(self):
+        self.assertTrue(saldos_completos({}))
+
+
+class IndicadorCarteraTests(TestCase):
+    def calcular(self, completo):
+        def obtener_saldos(periodo, mes, cuentas, nits):
+            saldos = SaldosAPI(completo=completo)
+            for nit in nits:
+                saldos[nit].update({cuenta: Decimal(10) for cuenta in cuentas})
+            return saldos
+
+        with mock.patch.object(views, "obtener_saldos", obtener_saldos):
+            return views.BalCoopApiViewIndicadorC().calcular(DATOS)
+
+    def test_consulta_incompleta_no_se_guarda(self):
+        resultados = self.calcular(completo=False)
+        self.assertEqual(len(resultados), len(ENTIDADES))
+        self.assertFalse(IndicadorCarteraCoopModel.objects.exists())
+
+    def test_consulta_completa_se_guarda(self):
+        resultados = self.calcular(completo=True)
+        self.assertEqual(IndicadorCarteraCoopModel.objects.count(), len(ENTIDADES))
+        with mock.patch.object(views, "obtener_saldos", side_effect=AssertionError("ya estaba materializada")):
+            self.assertEqual(views.BalCoopApiViewIndicadorC().calcular(DATOS), resultados)
+
+
+class CargaManualTests(TestCase):
+    fila = {"periodo": 2024, "mes": 3, "entidad_RS": "COOP CARGADA", "puc_codigo": PUC_CARTERA[0], "saldo": "700.00"}
+
+    def setUp(self):
+        IndicadorCarteraCoopModel.objects.create(periodo=2024, mes=3, entidad_RS="COOP CARGADA", nit="1000-0", indicadores={"x": 1.0})
+        IndicadorCarteraCoopModel.objects.create(periodo=2024, mes=3, entidad_RS="COOP API", nit="1001-1", indicadores={"x": 1.0})
+
+    def cargar(self):
+        request = APIRequestFactory().post("/v1/bal_coop", {"extractedData": [self.fila], "isStaff": True}, format="json")
+        return views.BalCoopApiView.as_view()(request)
+
+    def test_mes_sin_sincronizar_solo_invalida_las_entidades_cargadas(self):
+        self.assertEqual(self.cargar().status_code, 200)
+        self.assertEqual(list(IndicadorCarteraCoopModel.objects.values_list("entidad_RS", flat=True)), ["COOP API"])
+        self.assertFalse(TrabajoModel.objects.exists())
+        self.assertEqual(ActualizacionCartera().calcular([{"periodo": 2024, "mes": 3}]), [{"periodo": 2024, "mes": 3, "filas": 0}])
+
+    def test_mes_sincronizado_se_recalcula_en_la_cola(self):
+        BalCoopCorteModel.objects.create(periodo=2024, mes=3, dataset="prueba", registros=1)
+        BalCoopModel.objects.create(periodo=2024, mes=3, entidad_RS="COOP API", nit="1001-1", puc_codigo=PUC_CARTERA[0], saldo=Decimal(900), origen=ORIGEN_DATOS_GOV)
+        self.cargar()
+        trabajo = TrabajoModel.objects.get()
+        self.assertEqual((trabajo.reporte, trabajo.parametros["datos"]), ("bal_coop/actualizar_cartera", [{"periodo": 2024, "mes": 3}]))
+        ActualizacionCartera().calcular(trabajo.parametros["datos"])
+        self.assertEqual(
+            sorted(IndicadorCarteraCoopModel.objects.values_list("entidad_RS", "nit")),
+            [("COOP API", "1001-1"), ("COOP CARGADA", None)],
+        )
+
+
+class CargaRepetidaTests(TestCase):
+    fila = {"periodo": 2024, "mes": 3, "entidad_RS": "COOP CARGADA", "nit": "1000-0", "puc_codigo": "100000"}
+
+    def setUp(self):
+        BalCoopCorteModel.objects.create(periodo=2024, mes=3, dataset="prueba", registros=1)
+
+    def cargar(self, *saldos, origen=ORIGEN_CARGA):
+        for saldo in saldos:
+            BalCoopModel.objects.create(**self.fila, saldo=Decimal(saldo), origen=origen)
+
+    def leer(self):
+        registros = obtener_registros_locales(2024, 3)
+        return [registro["valor"] for registro in registros], indice_saldos_db(2024, 3)["COOP CARGADA"]["100000"]
+
+    def test_prevalece_la_ultima_carga(self):
+        self.cargar("500", "700")
+        self.assertEqual(self.leer(), ([Decimal(700)], Decimal(700)))
+
+    def test_prevalece_datos_gov_sobre_la_carga(self):
+        self.cargar("500")
+        self.cargar("900", origen=ORIGEN_DATOS_GOV)
+        self.cargar("700")
+        self.assertEqual(self.leer(), ([Decimal(900)], Decimal(900)))
+
+
+class SincronizacionTests(TestCase):
+    def test_cortes_por_dataset_del_periodo(self):
+        filas = {
+            sync.DATASET_2020: [{"a_o": "2020", "mes": "DICIEMBRE"}, {"a_o": "2021", "mes": "ENERO"}],
+            sync.DATASET_2021: [{"a_o": "2021", "mes": "ENERO"}],
+            sync.DATASET_ACTUAL: [{"a_o": "2024", "mes": "marzo"}, {"a_o": None, "mes": "ENERO"}],
+        }
+        with mock.patch.object(sync, "consultar_api", side_effect=lambda dataset, params: filas[dataset]):
+            self.assertEqual(sync.consultar_cortes_disponibles(), [(2020, 12), (2021, 1), (2024, 3)])
+            self.assertEqual(sync.consultar_cortes_disponibles(2021), [(2021, 1), (2024, 3)])
+
+    def test_2020_usa_codcuenta(self):
+        pagina = [{"nit": "1000-0", "codcuenta": "100000", "valor_en_pesos": "$1,500.50"}]
+        with mock.patch.object(sync, "paginar", return_value=iter([pagina])) as paginar:
+            self.assertEqual(list(sync.descargar_corte(2020, 6)), [[("1000-0", "100000", Decimal("1500.50"))]])
+        url, params = paginar.call_args.args[:2]
+        self.assertEqual(url, sync.BASE_URL_DATASET.format(sync.DATASET_2020))
+        self.assertIn("codcuenta", params["$select"])
+        self.assertIn("JUNIO", params["$where"])
 
-# Create your tests here.
+    def test_sincroniza_con_razon_social_y_conserva_las_cargas(self):
+        EntidadModel.objects.create(Nit=1000, Dv=0, RazonSocial="COOP API", TipoEntidad=2)
+        BalCoopModel.objects.create(periodo=2024, mes=3, entidad_RS="COOP CARGADA", puc_codigo="100000", saldo=Decimal(5))
+        nit = sync.format_nit_dv(1000, 0)
+        paginas = [[(nit, "100000", Decimal(900)), ("999-1", "100000", Decimal(1))]]
+        self.assertIsNone(obtener_registros_locales(2024, 3))
+        for _ in range(2):
+            with mock.patch.object(sync, "descargar_corte", return_value=iter(paginas)):
+                self.assertEqual(sync.sincronizar_corte(2024, 3), 2)
+        self.assertEqual(BalCoopCorteModel.objects.get(periodo=2024, mes=3).dataset, sync.DATASET_ACTUAL)
+        self.assertEqual(BalCoopModel.objects.get(nit=nit).entidad_RS, "COOP API")
+        saldos = sync.obtener_saldos_locales(2024, 3, nits=[nit])
+        self.assertEqual({entidad: dict(cuentas) for entidad, cuentas in saldos.items()}, {
+            nit: {"100000": Decimal(900)},
+            "COOP CARGADA": {"100000": Decimal(5)},
+        })
+        self.assertEqual(indice_saldos_db(2024, 3)["999-1"], {"100000": Decimal(1)})
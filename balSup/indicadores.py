@@ -0,0 +1,333 @@
+import requests
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from balSup.models import BalSupModel, IndicadorCarteraSupModel, IndicadorFinancieroSupModel
+from balSup.sync import consultar_saldos_api, indice_saldos_db, obtener_saldos_locales
+from indicadores.motor import MES, C, P, div, suma
+from indicadores.registro import registrar
+
+# Indicadores materializados. Las entradas de un mes sólo cambian cuando se
+# publica o se carga un corte, así que se calculan una vez por (entidad,
+# periodo, mes): BalSupApiViewIndicador lee indicador_financiero_sup y
+# BalSupApiViewIndicadorC lee indicador_cartera_sup.
+# Las fórmulas son declarativas (indicadores.motor) y se evalúan para todas las
+# entidades y meses de una solicitud a la vez.
+
+def promedio_anualizado(cuenta):
+    """Promedio entre el diciembre anterior y el saldo del mes llevado a 12 meses."""
+    return (P(cuenta) + (C(cuenta) / MES) * 12) / 2
+
+ACTIVO = C("100000")
+ADMINISTRATIVOS = C("511800", "513025", "513030", "514500", "516000", "516500", "519005", "519010", "519020", "519025", "519030", "519035", "519040", "519045", "519065", "519070", "519095")
+TOTAL_GASTOS_OPERATIVOS = (
+    C("512000", "517240") + ADMINISTRATIVOS + C("519015") + C("513010") + C("513015") + C("517500") + C("517800") + C("518000")
+)
+
+FORMULAS_FINANCIEROS = {
+    "indicadorCartera": div(C("140000"), ACTIVO),
+    "indicadorDeposito": div(C("210000"), ACTIVO),
+    "indicadorObligaciones": div(C("240000"), ACTIVO),
+    "indicadorCapSocial": div(C("310000"), ACTIVO),
+    "indicadorCapInst": div(C("320000", "370500"), ACTIVO),
+    "indicadorRoe": div(C("391500"), promedio_anualizado("300000")),
+    "indicadorRoa": div(C("391500"), promedio_anualizado("100000")),
+    "indicadorIngCartera": div(C("410200"), promedio_anualizado("140000")),
+    "indicadorCostDeposito": div(C("510200"), promedio_anualizado("210000")),
+    "indicadorCredBanco": div(C("510300"), promedio_anualizado("240000")),
+    "indicadorDisponible": div(C("110000", "120000"), ACTIVO),
+    "indicadorActivoImpro": div(C("150000", "160000", "170000", "180000", "190000"), ACTIVO),
+    "DeterioroGastosOperativos": div(C("517005"), ACTIVO),
+    # Gastos Operativos
+    "indicadorPersonal": div(C("512000", "517240"), ACTIVO),
+    "indicadorGenerales": div(ADMINISTRATIVOS - C("519015") - C("513010") - C("513015"), ACTIVO),
+    "indicadorMercadeo": div(C("519015"), ACTIVO),
+    "indicadorGobernabilidad": div(C("513010", "513015"), ACTIVO),
+    "indicadorDepreciacionesAmort": div(C("517500", "517800", "518000"), ACTIVO),
+    "indicadorTotalGastonOperativos": div(TOTAL_GASTOS_OPERATIVOS, ACTIVO),
+}
+
+# Modalidades de cartera: calificaciones A-E, total, deterioro.
+MODALIDADES = {
+    "consumo": ([C("140805"), C("140810"), C("140815"), C("140820"), C("140825")], C("140800"), C("149100")),
+    "microcredito": ([C("141205"), C("141210"), C("141215"), C("141220"), C("141225")], C("141200"), C("149300")),
+    "comercial": ([C("141005"), C("141010"), C("141015"), C("141020"), C("141025")], C("141000"), C("149500")),
+    "vivienda": ([C("140405", "140410"), C("140415", "140420"), C("140425", "140430"), C("140435", "140440"), C("140445", "140450")], C("140400"), C("148900")),
+    "empleados": ([C("141405", "141430", "141460"), C("141410", "141435", "141465"), C("141415", "141440", "141470"), C("141420", "141445", "141475"), C("141425", "141450", "141480")], C("141400"), C("148800")),
+}
+
+# Depósitos en el orden del PUC: (nombre, cuenta).
+DEPOSITOS = [
+    ("CuentaCorriente", "210500"),
+    ("Simple", "210600"),
+    ("AhorroTermino", "210700"),
+    ("Ahorro", "210800"),
+    ("CuentaAhorroEspecial", "210900"),
+    ("CertificadoAhorroValorReal", "211000"),
+    ("DocumentoPagar", "211100"),
+    ("CuentaCentralizada", "211200"),
+    ("FondosCuentas", "211300"),
+    ("CesantiasFondoNacional", "211400"),
+    ("BancosCorresponsales", "211500"),
+    ("Especiales", "211600"),
+    ("ExigibilidadServico", "211700"),
+    ("Recaudo", "211800"),
+    ("EstablecimientosAfiliados", "211900"),
+    ("Electronicos", "212000"),
+    ("FondosInterbancarios", "212200"),
+    ("FondosInterasociadas", "212300"),
+    ("OperacionesReporto", "212400"),
+    ("OperacionesSimultaneas", "212500"),
+    ("OperacionesTransferencia", "212600"),
+    ("BilletesCirculacion", "212700"),
+    ("PagosInternacionales", "212800"),
+    ("Compromisos", "212900"),
+    ("TitulosInversion", "213000"),
+    ("TituloRegulacionBanco", "213200"),
+    ("TituloRegulacion", "214600"),
+    ("OperacionesCreditoInternasCorto", "214700"),
+    ("OperacionesCreditoInternasLargo", "214800"),
+    ("OperacionesCreditoExternasCorto", "214900"),
+    ("OperacionesCreditoExternasLargo", "215000"),
+    ("OperacionesFinancieraInternasCorto", "215100"),
+    ("OperacionesFinancieraInternasLargo", "215200"),
+    ("OperacionesFinancieraExternasCorto", "215300"),
+    ("OperacionesFinancieraExternasLargo", "215400"),
+    ("OperacionesConjuntas", "215500"),
+    ("CuentasCanceladas", "215600"),
+    ("OperacionesContratacion", "215700"),
+    ("PasivosArrendamientos", "218000"),
+]
+# Ahorro (2108) y ahorro a término (2107) encabezan la respuesta.
+DEPOSITOS_PRINCIPALES = ["Ahorro", "AhorroTermino"]
+
+def formulas_cartera():
+    formulas = {}
+    for nombre, (calificaciones, total, deterioro) in MODALIDADES.items():
+        a, b, c, d, e = calificaciones
+        formulas.update({
+            f"{nombre}A": a,
+            f"{nombre}B": b,
+            f"{nombre}C": c,
+            f"{nombre}D": d,
+            f"{nombre}E": e,
+            f"{nombre}Total": total,
+            f"{nombre}IndMora": div(b + c + d + e, a + b + c + d + e),
+            f"{nombre}CartImprod": div(c + d + e, a + b + c + d + e),
+            f"{nombre}Deterioro": deterioro,
+            f"{nombre}PorcCobertura": div(deterioro, b + c + d + e),
+        })
+
+    total_a, total_b, total_c, total_d, total_e = (
+        suma(calificaciones[k] for calificaciones, _, _ in MODALIDADES.values()) for k in range(5)
+    )
+    total_deterioro_ind = suma(deterioro for _, _, deterioro in MODALIDADES.values())
+    total_deterioro = total_deterioro_ind + C("149800")
+    total_total = suma(total for _, total, _ in MODALIDADES.values())
+    formulas.update({
+        "totalA": total_a,
+        "totalB": total_b,
+        "totalC": total_c,
+        "totalD": total_d,
+        "totalE": total_e,
+        "totalTotal": total_total,
+        "totalCastigos": C("812000"),
+        "totalIndMora": div(total_b + total_c + total_d + total_e, total_a + total_b + total_c + total_d + total_e),
+        "totalCartImpro": div(total_c + total_d + total_e, total_a + total_b + total_c + total_d + total_e),
+        "totalContable": total_total - total_deterioro,
+        "totalDeterioroInd": total_deterioro_ind,
+        "totalDeterioroGen": C("149800"),
+        "totalDeterioro": total_deterioro,
+        "totalPorcCobertura": div(total_deterioro, total_b + total_c + total_d + total_e),
+    })
+
+    deposito = C("210000")
+    particiones = {nombre: div(C(cuenta), deposito) for nombre, cuenta in DEPOSITOS}
+    formulas["deposito"] = deposito
+    orden = DEPOSITOS_PRINCIPALES + [nombre for nombre, _ in DEPOSITOS if nombre not in DEPOSITOS_PRINCIPALES]
+    for nombre in orden:
+        formulas[f"deposito{nombre}"] = C(dict(DEPOSITOS)[nombre])
+        formulas[f"particion{nombre}"] = particiones[nombre]
+    formulas["depositoPorcentajeTotal"] = suma(particiones.values())
+    return formulas
+
+FORMULAS_CARTERA = formulas_cartera()
+
+INDICADORES_FINANCIEROS = registrar("balSup.financieros", FORMULAS_FINANCIEROS)
+INDICADORES_CARTERA = registrar("balSup.cartera", FORMULAS_CARTERA)
+
+# Cuentas que leen las fórmulas: del mes y del diciembre anterior.
+PUC_INDICADOR_ACTUAL = INDICADORES_FINANCIEROS.cuentas()
+PUC_INDICADOR_ANTERIOR = INDICADORES_FINANCIEROS.cuentas(anterior=True)
+PUC_CARTERA = INDICADORES_CARTERA.cuentas()
+
+def saldos_mes(periodo, mes, cuentas):
+    """Saldos del mes desde el espejo de bal_sup (con las cargas manuales de las
+    entidades que no están en datos.gov.co), o None si el corte no está
+    sincronizado: con sólo las cargas, lo guardado ocultaría los saldos de
+    datos.gov.co que la vista en línea prefiere."""
+    return obtener_saldos_locales(periodo, mes, cuentas)
+
+def saldos_diciembre_anterior(periodo, entidades):
+    """Saldos del diciembre anterior leídos como en la vista: el espejo o, si no está
+    sincronizado, datos.gov.co, completando con las cargas manuales las entidades
+    sin saldos. None si no se pudieron leer o no hay ninguno."""
+    periodo_anterior = periodo - 1
+    saldos = obtener_saldos_locales(periodo_anterior, 12, PUC_INDICADOR_ANTERIOR)
+    if saldos is None:
+        try:
+            saldos = consultar_saldos_api([(periodo_anterior, 12)], PUC_INDICADOR_ANTERIOR, entidades)[(periodo_anterior, 12)]
+        except requests.RequestException as e:
+            print(f"Error al obtener saldos de diciembre {periodo_anterior}: {e}")
+            return None
+    cargas = indice_saldos_db(periodo_anterior, 12, PUC_INDICADOR_ANTERIOR)
+    for razon_social in entidades:
+        if not any(saldos[razon_social].values()):
+            saldos[razon_social].update(cargas.get(razon_social, {}))
+    if not any(any(saldos_entidad.values()) for saldos_entidad in saldos.values()):
+        return None
+    return saldos
+
+def materializar_indicadores(periodo, mes):
+    """Recalcula y reemplaza los indicadores de todas las entidades de un mes. Si el
+    diciembre anterior no está disponible no toca el mes: ROE, ROA y los demás
+    promedios anualizados quedarían con una base en cero. Los meses sin sincronizar
+    tampoco se tocan (ver saldos_mes)."""
+    saldos_current = saldos_mes(periodo, mes, PUC_INDICADOR_ACTUAL)
+    if saldos_current is None:
+        print(f"INDICADORES SUP {periodo}-{mes:02d}: corte sin sincronizar, no se materializa")
+        return 0
+    entidades = [razon_social for razon_social in saldos_current if any(saldos_current[razon_social].values())]
+    saldos_previous = saldos_diciembre_anterior(periodo, entidades) if entidades else {}
+    if saldos_previous is None:
+        print(f"INDICADORES SUP {periodo}-{mes:02d}: sin saldos de diciembre {periodo - 1}, no se materializa")
+        return 0
+    calculados = INDICADORES_FINANCIEROS.calcular(entidades, {(periodo, mes): (saldos_current, saldos_previous)})
+    filas = [
+        IndicadorFinancieroSupModel(
+            periodo=periodo,
+            mes=mes,
+            entidad_RS=razon_social,
+            indicadores=calculados[(razon_social, (periodo, mes))],
+        )
+        for razon_social in entidades
+    ]
+    reemplazar_mes(IndicadorFinancieroSupModel, periodo, mes, filas)
+    print(f"INDICADORES SUP {periodo}-{mes:02d}: {len(filas)} entidades")
+    return len(filas)
+
+def materializar_cartera(periodo, mes):
+    """Recalcula la calidad de cartera y los depósitos de todas las entidades de un
+    mes sincronizado."""
+    saldos_current = saldos_mes(periodo, mes, PUC_CARTERA)
+    if saldos_current is None:
+        print(f"CARTERA SUP {periodo}-{mes:02d}: corte sin sincronizar, no se materializa")
+        return 0
+    entidades = [razon_social for razon_social in saldos_current if any(saldos_current[razon_social].values())]
+    calculados = INDICADORES_CARTERA.calcular(entidades, {(periodo, mes): (saldos_current, None)})
+    filas = [
+        IndicadorCarteraSupModel(
+            periodo=periodo,
+            mes=mes,
+            entidad_RS=razon_social,
+            indicadores=calculados[(razon_social, (periodo, mes))],
+        )
+        for razon_social in entidades
+    ]
+    reemplazar_mes(IndicadorCarteraSupModel, periodo, mes, filas)
+    print(f"CARTERA SUP {periodo}-{mes:02d}: {len(filas)} entidades")
+    return len(filas)
+
+def a_json(indicadores):
+    return {nombre: float(valor) for nombre, valor in indicadores.items()}
+
+def reemplazar_mes(modelo, periodo, mes, filas):
+    with transaction.atomic():
+        modelo.objects.filter(periodo=periodo, mes=mes).delete()
+        modelo.objects.bulk_create(filas)
+
+def guardar_cartera(resultados):
+    """Guarda los indicadores de cartera calculados en línea para entidades que aún
+    no estaban materializadas. Las filas en cero no se guardan: suelen venir de
+    una consulta fallida a la API y la siguiente solicitud debe reintentarla."""
+    filas = [
+        IndicadorCarteraSupModel(
+            periodo=resultado["periodo"],
+            mes=resultado["mes"],
+            entidad_RS=resultado["entidad_RS"],
+            indicadores=a_json({
+                nombre: valor for nombre, valor in resultado.items()
+                if nombre not in ("entidad_RS", "sigla", "periodo", "mes")
+            }),
+        )
+        for resultado in resultados
+    ]
+    filas = [fila for fila in filas if any(fila.indicadores.values())]
+    if filas:
+        IndicadorCarteraSupModel.objects.bulk_create(
+            filas,
+            update_conflicts=True,
+            unique_fields=["periodo", "mes", "entidad_RS"] if connection.features.supports_update_conflicts_with_target else None,
+            update_fields=["indicadores", "updated_at"],
+        )
+
+def meses_afectados(periodo, mes):
+    """Meses cuyos indicadores financieros dependen del mes: él mismo y, si es
+    diciembre, los del año siguiente (base del ROE/ROA)."""
+    meses = [(periodo, mes)]
+    if mes == 12:
+        siguientes = BalSupModel.objects.filter(periodo=periodo + 1).order_by().values_list("mes", flat=True).distinct()
+        meses += [(periodo + 1, mes_siguiente) for mes_siguiente in sorted(siguientes)]
+    return meses
+
+def invalidar_indicadores(periodo, mes, entidades):
+    """Borra lo guardado de las entidades cargadas a mano en el mes (y, si es
+    diciembre, sus indicadores financieros del año siguiente), para que la
+    próxima solicitud los calcule en línea con los saldos nuevos."""
+    q_meses = Q()
+    for periodo_afectado, mes_afectado in meses_afectados(periodo, mes):
+        q_meses |= Q(periodo=periodo_afectado, mes=mes_afectado)
+    with transaction.atomic():
+        IndicadorCarteraSupModel.objects.filter(periodo=periodo, mes=mes, entidad_RS__in=entidades).delete()
+        IndicadorFinancieroSupModel.objects.filter(q_meses, entidad_RS__in=entidades).delete()
+
+def actualizar_indicadores(periodo, mes):
+    """Materializa un mes sincronizado tras una sincronización o una carga. La
+    cartera sólo depende del mes; los indicadores financieros toman diciembre como
+    base del ROE/ROA del año siguiente, así que un cambio en diciembre recalcula
+    también esos meses."""
+    materializar_cartera(periodo, mes)
+    return sum(materializar_indicadores(p, m) for p, m in meses_afectados(periodo, mes))
+
+class ActualizacionIndicadores:
+    """Recálculo tras una carga manual, encolado como trabajo (ver balSup/reportes.py)
+    para que no lo haga la solicitud de la carga."""
+
+    def calcular(self, datos):
+        return [
+            {"periodo": int(item["periodo"]), "mes": int(item["mes"]), "filas": actualizar_indicadores(int(item["periodo"]), int(item["mes"]))}
+            for item in datos
+        ]
+
+def leer_materializados(modelo, periodos, razones_sociales):
+    """{(razón social, periodo, mes): indicadores} en una sola consulta indexada."""
+    q_periodos = {(int(periodo), int(mes)) for periodo, mes in periodos}
+    if not q_periodos or not razones_sociales:
+        return {}
+    query_results = modelo.objects.filter(
+        periodo__in={periodo for periodo, _ in q_periodos},
+        mes__in={mes for _, mes in q_periodos},
+        entidad_RS__in=razones_sociales,
+    ).values_list("entidad_RS", "periodo", "mes", "indicadores")
+    return {
+        (razon_social, periodo, mes): indicadores
+        for razon_social, periodo, mes, indicadores in query_results
+        if (periodo, mes) in q_periodos
+    }
+
+def leer_indicadores(periodos, razones_sociales):
+    return leer_materializados(IndicadorFinancieroSupModel, periodos, razones_sociales)
+
+def leer_cartera(periodos, razones_sociales):
+    return leer_materializados(IndicadorCarteraSupModel, periodos, razones_sociales)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from balSup.indicadores import materializar_cartera, materializar_indicadores
+from balSup.models import BalSupModel
+
+class Command(BaseCommand):
+    help = "Recalcula las tablas indicador_financiero_sup e indicador_cartera_sup a partir de bal_sup."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--periodo", type=int, help="Año a recalcular.")
+        parser.add_argument("--mes", type=int, help="Mes a recalcular (requiere --periodo).")
+
+    def handle(self, *args, **options):
+        periodo = options.get("periodo")
+        mes = options.get("mes")
+        if mes and not periodo:
+            raise CommandError("--mes requiere --periodo.")
+
+        meses = BalSupModel.objects.order_by().values_list("periodo", "mes").distinct()
+        if periodo:
+            meses = meses.filter(periodo=periodo)
+        if mes:
+            meses = meses.filter(mes=mes)
+
+        total = 0
+        for periodo, mes in sorted(meses):
+            total += materializar_indicadores(periodo, mes)
+            materializar_cartera(periodo, mes)
+        self.stdout.write(self.style.SUCCESS(f"{total} filas de indicadores materializadas"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from balSup.indicadores import actualizar_indicadores
+from balSup.sync import sincronizar_corte, sincronizar_incremental
+
+class Command(BaseCommand):
+    help = "Sincroniza bal_sup con el dataset de la Superfinanciera en datos.gov.co (mxk5-ce6w)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--periodo", type=int, help="Año del corte a descargar de nuevo.")
+        parser.add_argument("--mes", type=int, help="Mes del corte a descargar de nuevo.")
+
+    def handle(self, *args, **options):
+        periodo = options.get("periodo")
+        mes = options.get("mes")
+        if periodo or mes:
+            if not (periodo and mes):
+                raise CommandError("Debe indicar --periodo y --mes juntos.")
+            registros = sincronizar_corte(periodo, mes)
+            actualizar_indicadores(periodo, mes)
+            self.stdout.write(self.style.SUCCESS(f"{periodo}-{mes:02d}: {registros} registros"))
+            return
+
+        sincronizados = sincronizar_incremental()
+        for periodo, mes, registros in sincronizados:
+            actualizar_indicadores(periodo, mes)
+            self.stdout.write(f"{periodo}-{mes:02d}: {registros} registros")
+        self.stdout.write(self.style.SUCCESS(f"{len(sincronizados)} cortes sincronizados"))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('balSup', '0003_alter_balsupmodel_entidad_rs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='balsupmodel',
+            name='origen',
+            field=models.CharField(default='carga', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='BalSupCorteModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.SmallIntegerField()),
+                ('mes', models.SmallIntegerField()),
+                ('fecha_corte', models.DateField()),
+                ('registros', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'bal_sup_corte',
+                'ordering': ['-periodo', '-mes'],
+                'unique_together': {('periodo', 'mes')},
+            },
+        ),
+    ]
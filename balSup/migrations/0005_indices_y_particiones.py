@@ -0,0 +1,54 @@
+# Generated by Django 5.2 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+# Particiones por año: MySQL exige que la columna de partición forme parte de
+# toda clave única, así que la llave primaria pasa a ser (id, periodo). Los años
+# posteriores al último rango caen en p_futuro hasta que se reorganice.
+PRIMER_PERIODO = 2015
+ULTIMO_PERIODO = 2035
+
+
+def particionar(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    particiones = ", ".join(
+        f"PARTITION p{anio} VALUES LESS THAN ({anio + 1})"
+        for anio in range(PRIMER_PERIODO, ULTIMO_PERIODO + 1)
+    )
+    schema_editor.execute("ALTER TABLE bal_sup DROP PRIMARY KEY, ADD PRIMARY KEY (id, periodo)")
+    schema_editor.execute(
+        f"ALTER TABLE bal_sup PARTITION BY RANGE (periodo) "
+        f"(PARTITION p_anterior VALUES LESS THAN ({PRIMER_PERIODO}), {particiones}, "
+        f"PARTITION p_futuro VALUES LESS THAN MAXVALUE)"
+    )
+
+
+def quitar_particiones(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute("ALTER TABLE bal_sup REMOVE PARTITIONING")
+    schema_editor.execute("ALTER TABLE bal_sup DROP PRIMARY KEY, ADD PRIMARY KEY (id)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('balSup', '0004_sincronizacion_datos_gov'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='balsupmodel',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='balsupmodel',
+            index=models.Index(fields=['periodo', 'mes', 'puc_codigo', 'entidad_RS', 'saldo'], name='bal_sup_periodo_mes_puc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='balsupmodel',
+            index=models.Index(fields=['entidad_RS', 'periodo', 'mes', 'puc_codigo', 'saldo'], name='bal_sup_entidad_periodo_idx'),
+        ),
+        migrations.RunPython(particionar, quitar_particiones),
+    ]
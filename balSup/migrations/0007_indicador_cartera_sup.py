@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 09:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('balSup', '0006_indicador_financiero_sup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicadorCarteraSupModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.SmallIntegerField()),
+                ('mes', models.SmallIntegerField()),
+                ('entidad_RS', models.CharField(max_length=150)),
+                ('indicadores', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'indicador_cartera_sup',
+                'unique_together': {('periodo', 'mes', 'entidad_RS')},
+            },
+        ),
+    ]
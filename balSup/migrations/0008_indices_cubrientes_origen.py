@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 10:16
+
+from django.db import migrations, models
+
+# Los índices nuevos se crean antes de borrar los anteriores para que las
+# consultas no queden sin índice mientras se reconstruyen.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('balSup', '0007_indicador_cartera_sup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='balsupmodel',
+            index=models.Index(fields=['periodo', 'mes', 'puc_codigo', 'entidad_RS', 'origen', 'saldo'], name='bal_sup_corte_cubriente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='balsupmodel',
+            index=models.Index(fields=['entidad_RS', 'periodo', 'mes', 'puc_codigo', 'origen', 'saldo'], name='bal_sup_entidad_cubriente_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='balsupmodel',
+            name='bal_sup_periodo_mes_puc_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='balsupmodel',
+            name='bal_sup_entidad_periodo_idx',
+        ),
+    ]
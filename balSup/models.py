@@ -1,14 +1,61 @@
 from django.db import models
- 
+
+ORIGEN_CARGA = 'carga'
+ORIGEN_DATOS_GOV = 'datos_gov'
+
 class BalSupModel(models.Model):
     periodo = models.SmallIntegerField()
     mes = models.SmallIntegerField()
     entidad_RS = models.CharField(max_length=150)
     puc_codigo = models.CharField(max_length=128)
     saldo = models.DecimalField(max_digits=18, decimal_places=2)
+    origen = models.CharField(max_length=20, default=ORIGEN_CARGA)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = "bal_sup"
-        ordering = ['-created_at']
\ No newline at end of file
+        # Índices cubrientes para las consultas por corte (periodo, mes, cuenta) y por
+        # entidad; incluyen origen y saldo, que también filtran o leen las
+        # consultas, para que la lectura no tenga que ir a la tabla.
+        indexes = [
+            models.Index(fields=['periodo', 'mes', 'puc_codigo', 'entidad_RS', 'origen', 'saldo'], name='bal_sup_corte_cubriente_idx'),
+            models.Index(fields=['entidad_RS', 'periodo', 'mes', 'puc_codigo', 'origen', 'saldo'], name='bal_sup_entidad_cubriente_idx'),
+        ]
+
+class BalSupCorteModel(models.Model):
+    periodo = models.SmallIntegerField()
+    mes = models.SmallIntegerField()
+    fecha_corte = models.DateField()
+    registros = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "bal_sup_corte"
+        ordering = ['-periodo', '-mes']
+        unique_together = ('periodo', 'mes')
+
+class IndicadorFinancieroSupModel(models.Model):
+    periodo = models.SmallIntegerField()
+    mes = models.SmallIntegerField()
+    entidad_RS = models.CharField(max_length=150)
+    indicadores = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "indicador_financiero_sup"
+        unique_together = ('periodo', 'mes', 'entidad_RS')
+
+class IndicadorCarteraSupModel(models.Model):
+    periodo = models.SmallIntegerField()
+    mes = models.SmallIntegerField()
+    entidad_RS = models.CharField(max_length=150)
+    indicadores = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "indicador_cartera_sup"
+        unique_together = ('periodo', 'mes', 'entidad_RS')
@@ -0,0 +1,11 @@
+from trabajos.registro import registrar
+from balSup.indicadores import INDICADORES_CARTERA, ActualizacionIndicadores
+from balSup.views import BalSupApiViewIndicador, BalSupApiViewIndicadorC, indicadores_solicitados
+
+def opciones_cartera(request):
+    indicadores = indicadores_solicitados(request, INDICADORES_CARTERA)
+    return {"indicadores": sorted(indicadores) if indicadores is not None else None}
+
+registrar("bal_sup/indicador_financiero", BalSupApiViewIndicador)
+registrar("bal_sup/indicador_cartera", BalSupApiViewIndicadorC, opciones_cartera)
+registrar("bal_sup/actualizar_indicadores", ActualizacionIndicadores, publico=False)
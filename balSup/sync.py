@@ -0,0 +1,250 @@
+import requests
+import threading
+
+from time import sleep
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from balSup.models import BalSupModel, BalSupCorteModel, ORIGEN_CARGA, ORIGEN_DATOS_GOV
+from datosGov import motor
+from datosGov.socrata import agregar_json_en_bloques, paginar
+from datosGov.soql import ConsultaSoQL, literal
+
+# Espejo local del dataset de la Superfinanciera (mxk5-ce6w). Un comando de
+# gestión descarga cada corte mensual a bal_sup y las vistas leen de la base
+# de datos antes de ir a datos.gov.co.
+
+BASE_URL_FINANCIERA = "https://www.datos.gov.co/resource/mxk5-ce6w.json"
+TAMANO_PAGINA = 50000
+TAMANO_LOTE = 5000
+MAX_REINTENTOS = 5
+ESPERA_REINTENTO = 2
+
+def build_dates(periodo, mes):
+    fecha1 = datetime(periodo, mes, 1)
+    fecha2 = (fecha1 + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    return fecha1.strftime("%Y-%m-%dT00:00:00"), fecha2.strftime("%Y-%m-%dT23:59:59")
+
+def consultar_api(params):
+    for attempt in range(MAX_REINTENTOS):
+        try:
+            return motor.get(BASE_URL_FINANCIERA, params=params, timeout=(10, 120)).json()
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            print(f"SYNC SUP Timeout/Conectividad en intento {attempt + 1}/{MAX_REINTENTOS}: {e}")
+            if attempt < MAX_REINTENTOS - 1:
+                sleep(ESPERA_REINTENTO)
+    raise requests.exceptions.ConnectionError("No fue posible consultar datos.gov.co")
+
+def parse_fecha_corte(fecha_corte):
+    return datetime.strptime(fecha_corte[:10], "%Y-%m-%d").date()
+
+def consultar_cortes_disponibles(desde=None):
+    """Lista las fechas de corte publicadas, opcionalmente desde una fecha (inclusive)."""
+    consulta = ConsultaSoQL().select("fecha_corte").igual("moneda", "0").group("fecha_corte").order("fecha_corte")
+    if desde:
+        consulta.where(f"fecha_corte >= {literal(desde)}")
+    return [parse_fecha_corte(row["fecha_corte"]) for row in consultar_api(consulta.params()) if row.get("fecha_corte")]
+
+def descargar_corte(periodo, mes):
+    """Descarga por páginas, en paralelo, todas las cuentas en moneda total de un corte mensual."""
+    fecha1_str, fecha2_str = build_dates(periodo, mes)
+    consulta = (
+        ConsultaSoQL()
+        .select("fecha_corte", "nombre_entidad", "cuenta", "valor")
+        .entre("fecha_corte", fecha1_str, fecha2_str)
+        .igual("moneda", "0")
+        .order(":id")
+    )
+    yield from paginar(BASE_URL_FINANCIERA, consulta.params(), TAMANO_PAGINA, timeout=(10, 120))
+
+def sincronizar_corte(periodo, mes):
+    """Reemplaza en bal_sup las filas espejo de un mes. Las cargas manuales no se tocan."""
+    registros = 0
+    fecha_corte = None
+    with transaction.atomic():
+        BalSupModel.objects.filter(periodo=periodo, mes=mes, origen=ORIGEN_DATOS_GOV).delete()
+        for pagina in descargar_corte(periodo, mes):
+            nuevas = []
+            for result in pagina:
+                try:
+                    saldo = Decimal(result.get("valor", 0))
+                except InvalidOperation:
+                    saldo = Decimal(0)
+                fecha_corte = parse_fecha_corte(result["fecha_corte"])
+                nuevas.append(BalSupModel(
+                    periodo=periodo,
+                    mes=mes,
+                    entidad_RS=result.get("nombre_entidad", "")[:150],
+                    puc_codigo=result.get("cuenta", ""),
+                    saldo=saldo,
+                    origen=ORIGEN_DATOS_GOV,
+                ))
+            BalSupModel.objects.bulk_create(nuevas, batch_size=TAMANO_LOTE)
+            registros += len(nuevas)
+        if registros:
+            BalSupCorteModel.objects.update_or_create(
+                periodo=periodo,
+                mes=mes,
+                defaults={"fecha_corte": fecha_corte, "registros": registros},
+            )
+    print(f"SYNC SUP {periodo}-{mes:02d}: {registros} registros")
+    return registros
+
+def sincronizar_incremental():
+    """Sincroniza los cortes publicados desde el último corte local (que se vuelve a
+    descargar porque las entidades reportan tarde)."""
+    ultimo = BalSupCorteModel.objects.order_by('-fecha_corte').first()
+    desde = ultimo.fecha_corte.replace(day=1) if ultimo else None
+    meses = sorted({(fecha.year, fecha.month) for fecha in consultar_cortes_disponibles(desde)})
+    return [(periodo, mes, sincronizar_corte(periodo, mes)) for periodo, mes in meses]
+
+def periodo_sincronizado(periodo, mes):
+    return BalSupCorteModel.objects.filter(periodo=periodo, mes=mes).exists()
+
+def obtener_registros_locales(periodo, mes, cuentas=None, entidades=None):
+    """Devuelve las filas del mes con la forma de la API (nombre_entidad, cuenta, valor),
+    o None si el corte aún no se ha sincronizado. Si una entidad tiene el mismo saldo
+    cargado a mano y desde datos.gov.co, prevalece el de datos.gov.co; entre varias
+    cargas del mismo saldo, la última."""
+    if not periodo_sincronizado(periodo, mes):
+        return None
+    q_periodo = Q(periodo=periodo, mes=mes)
+    if cuentas:
+        q_periodo &= Q(puc_codigo__in=cuentas)
+    if entidades:
+        q_periodo &= Q(entidad_RS__in=entidades)
+    registros = {}
+    query_results = BalSupModel.objects.filter(q_periodo).order_by("id").values_list("entidad_RS", "puc_codigo", "saldo", "origen")
+    for razon_social, cuenta, saldo, origen in query_results:
+        key = (razon_social, cuenta)
+        if origen == ORIGEN_CARGA and registros.get(key, (None,))[0] == ORIGEN_DATOS_GOV:
+            continue
+        registros[key] = (origen, saldo)
+    return [
+        {"nombre_entidad": razon_social, "cuenta": cuenta, "valor": saldo}
+        for (razon_social, cuenta), (_, saldo) in registros.items()
+    ]
+
+def obtener_saldos_locales(periodo, mes, cuentas=None, entidades=None):
+    registros = obtener_registros_locales(periodo, mes, cuentas, entidades)
+    if registros is None:
+        return None
+    saldos = defaultdict(lambda: defaultdict(Decimal))
+    for result in registros:
+        saldos[result["nombre_entidad"]][result["cuenta"]] += result["valor"]
+    return saldos
+
+def indice_saldos_db(periodo, mes, cuentas=None):
+    """{entidad_RS: {puc_codigo: saldo}} del mes en una sola pasada sobre la tabla, sin
+    importar si el corte está sincronizado (incluye las cargas manuales). Si una
+    entidad tiene el mismo saldo cargado a mano y desde datos.gov.co, prevalece el
+    de datos.gov.co; entre varias cargas del mismo saldo, la última."""
+    q_periodo = Q(periodo=periodo, mes=mes)
+    if cuentas:
+        q_periodo &= Q(puc_codigo__in=[str(cuenta) for cuenta in cuentas])
+    indice = defaultdict(dict)
+    de_datos_gov = set()
+    query_results = BalSupModel.objects.filter(q_periodo).order_by("id").values_list("entidad_RS", "puc_codigo", "saldo", "origen")
+    for razon_social, cuenta, saldo, origen in query_results:
+        if origen == ORIGEN_CARGA and (razon_social, cuenta) in de_datos_gov:
+            continue
+        if origen == ORIGEN_DATOS_GOV:
+            de_datos_gov.add((razon_social, cuenta))
+        indice[razon_social][cuenta] = saldo
+    return indice
+
+class SaldosDB:
+    """Índices de indice_saldos_db reutilizados por los bloques de una misma solicitud,
+    en lugar de volver a consultar el mes en cada entidad."""
+
+    def __init__(self):
+        self.indices = {}
+        self.lock = threading.Lock()
+
+    def get(self, periodo, mes, cuentas=None):
+        clave = (int(periodo), int(mes), tuple(cuentas or ()))
+        with self.lock:
+            indice = self.indices.get(clave)
+        if indice is None:
+            indice = indice_saldos_db(int(periodo), int(mes), cuentas)
+            with self.lock:
+                indice = self.indices.setdefault(clave, indice)
+        return indice
+
+    def saldos_entidad(self, razon_social, periodo, mes, cuentas=None):
+        return self.get(periodo, mes, cuentas).get(razon_social, {})
+
+def tramos_contiguos(meses):
+    """[(primer mes, último mes)] de cada tramo de meses consecutivos de meses (ordenados)."""
+    tramos = []
+    for periodo, mes in meses:
+        if tramos:
+            ultimo_periodo, ultimo_mes = tramos[-1][1]
+            if (periodo * 12 + mes) - (ultimo_periodo * 12 + ultimo_mes) == 1:
+                tramos[-1] = (tramos[-1][0], (periodo, mes))
+                continue
+        tramos.append(((periodo, mes), (periodo, mes)))
+    return tramos
+
+def consulta_saldos(meses, cuentas, entidades=None):
+    """Saldos por (fecha_corte, entidad, cuenta) agregados en datos.gov.co: sólo viajan
+    las columnas, las entidades y los meses pedidos (un BETWEEN por tramo de meses
+    consecutivos, no todo el intervalo entre el primero y el último)."""
+    rangos = [
+        (build_dates(*desde)[0], build_dates(*hasta)[1])
+        for desde, hasta in tramos_contiguos(meses)
+    ]
+    consulta = (
+        ConsultaSoQL()
+        .select("fecha_corte", "nombre_entidad", "cuenta", "sum(valor) AS saldo")
+        .entre_rangos("fecha_corte", rangos)
+        .en("cuenta", cuentas)
+        .igual("moneda", "0")
+        .group("fecha_corte", "nombre_entidad", "cuenta")
+        .limit(500000)
+    )
+    if entidades:
+        consulta.en("nombre_entidad", entidades)
+    return consulta
+
+def agregar_saldos(registros):
+    """Reductor de la respuesta de consulta_saldos: {(periodo, mes): {entidad: {cuenta:
+    saldo}}} acumulado registro a registro."""
+    saldos = {}
+    for result in registros:
+        fecha_corte = parse_fecha_corte(result["fecha_corte"])
+        try:
+            saldo = Decimal(result.get("saldo", 0))
+        except InvalidOperation:
+            saldo = Decimal(0)
+        cuentas = saldos.setdefault((fecha_corte.year, fecha_corte.month), {}).setdefault(result.get("nombre_entidad"), {})
+        cuentas[result.get("cuenta")] = cuentas.get(result.get("cuenta"), Decimal(0)) + saldo
+    return saldos
+
+def consultar_saldos_api(meses, cuentas, entidades=None):
+    """Una consulta a datos.gov.co para varios meses: fecha_corte BETWEEN por cada tramo
+    de meses consecutivos, cuenta IN y nombre_entidad IN, partida en bloques si las
+    listas no caben en una URL. Devuelve {(periodo, mes): {entidad:
+    {cuenta: saldo}}} sólo para los meses pedidos."""
+    meses = sorted(set(meses))
+    saldos = {mes: defaultdict(lambda: defaultdict(Decimal)) for mes in meses}
+    if not meses or not cuentas:
+        return saldos
+    listas = {"cuentas": cuentas}
+    if entidades:
+        listas["entidades"] = entidades
+    bloques = agregar_json_en_bloques(
+        BASE_URL_FINANCIERA,
+        lambda listas: consulta_saldos(meses, listas["cuentas"], listas.get("entidades")),
+        listas,
+        agregar_saldos,
+    )
+    for agregados in bloques:
+        for mes in meses:
+            for razon_social, saldos_entidad in agregados.get(mes, {}).items():
+                saldos[mes][razon_social].update(saldos_entidad)
+    return saldos
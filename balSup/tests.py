@@ -1,3 +1,235 @@
-from django.test import TestCase
+import json
+import random
+import requests
 
-# Create your tests here.
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIRequestFactory
+
+from balSup.indicadores import INDICADORES_FINANCIEROS, ActualizacionIndicadores
+from balSup.models import BalSupCorteModel, BalSupModel, IndicadorCarteraSupModel, IndicadorFinancieroSupModel, ORIGEN_CARGA, ORIGEN_DATOS_GOV
+from balSup import sync
+from balSup.sync import indice_saldos_db, obtener_registros_locales
+from balSup.views import BalSupApiView, BalSupApiViewIndicador, lineas_stream
+from trabajos.models import TrabajoModel
+from trabajos.views import TrabajoApiViewCrear
+
+
+def calculo_original(s, p, mes_decimal):
+    """BalSupApiViewIndicador.calculate_indicators tal como estaba antes del motor
+    columnar (s: saldos del mes, p: del diciembre anterior, de una entidad)."""
+    def safe_division(numerator, denominator):
+        return (numerator / denominator) if denominator else 0
+
+    def promedio(cuenta):
+        return (p[cuenta] + (s[cuenta] / mes_decimal) * 12) / 2
+
+    administrativos = (
+        s["511800"] + s["513025"] + s["513030"] + s["514500"] + s["516000"] + s["516500"] + s["519005"]
+        + s["519010"] + s["519020"] + s["519025"] + s["519030"] + s["519035"] + s["519040"] + s["519045"]
+        + s["519065"] + s["519070"] + s["519095"]
+    )
+    total_gastos = (
+        s["512000"] + s["517240"] + administrativos + s["519015"] + s["513010"] + s["513015"]
+        + s["517500"] + s["517800"] + s["518000"]
+    )
+    return {
+        "indicadorCartera": safe_division(s["140000"], s["100000"]),
+        "indicadorDeposito": safe_division(s["210000"], s["100000"]),
+        "indicadorObligaciones": safe_division(s["240000"], s["100000"]),
+        "indicadorCapSocial": safe_division(s["310000"], s["100000"]),
+        "indicadorCapInst": safe_division(s["320000"] + s["370500"], s["100000"]),
+        "indicadorRoe": safe_division(s["391500"], promedio("300000")),
+        "indicadorRoa": safe_division(s["391500"], promedio("100000")),
+        "indicadorIngCartera": safe_division(s["410200"], promedio("140000")),
+        "indicadorCostDeposito": safe_division(s["510200"], promedio("210000")),
+        "indicadorCredBanco": safe_division(s["510300"], promedio("240000")),
+        "indicadorDisponible": safe_division((s["110000"] + s["120000"]), s["100000"]),
+        "indicadorActivoImpro": safe_division(s["150000"] + s["160000"] + s["170000"] + s["180000"] + s["190000"], s["100000"]),
+        "DeterioroGastosOperativos": safe_division(s["517005"], s["100000"]),
+        "indicadorPersonal": safe_division(s["512000"] + s["517240"], s["100000"]),
+        "indicadorGenerales": safe_division(administrativos - s["519015"] - s["513010"] - s["513015"], s["100000"]),
+        "indicadorMercadeo": safe_division(s["519015"], s["100000"]),
+        "indicadorGobernabilidad": safe_division(s["513010"] + s["513015"], s["100000"]),
+        "indicadorDepreciacionesAmort": safe_division(s["517500"] + s["517800"] + s["518000"], s["100000"]),
+        "indicadorTotalGastonOperativos": safe_division(total_gastos, s["100000"]),
+    }
+
+
+class IndicadoresFinancierosTests(SimpleTestCase):
+    def saldos(self, generador, cuentas):
+        return defaultdict(Decimal, {
+            cuenta: Decimal(generador.randint(-10**9, 10**11)) / 100 for cuenta in cuentas if generador.random() > 0.1
+        })
+
+    def test_exacto_igual_al_calculo_original(self):
+        generador = random.Random(2024)
+        cuentas = INDICADORES_FINANCIEROS.cuentas()
+        anteriores = INDICADORES_FINANCIEROS.cuentas(anterior=True)
+        entidades = [f"ENTIDAD {i}" for i in range(12)]
+        meses = [(2024, mes) for mes in (1, 6, 11)]
+        saldos = {}
+        for mes in meses:
+            actual = {entidad: self.saldos(generador, cuentas) for entidad in entidades}
+            anterior = {entidad: self.saldos(generador, anteriores) for entidad in entidades}
+            # Una entidad sin activo y otra sin diciembre anterior.
+            actual[entidades[0]]["100000"] = Decimal(0)
+            anterior[entidades[1]] = defaultdict(Decimal)
+            saldos[mes] = (actual, anterior)
+
+        calculados = INDICADORES_FINANCIEROS.calcular(entidades, saldos, exacto=True)
+        for (periodo, mes), (actual, anterior) in saldos.items():
+            for entidad in entidades:
+                with self.subTest(entidad=entidad, mes=mes):
+                    self.assertEqual(
+                        calculados[(entidad, (periodo, mes))],
+                        calculo_original(actual[entidad], anterior[entidad], Decimal(mes)),
+                    )
+
+    def test_solo_los_indicadores_pedidos(self):
+        saldos = {(2024, 3): ({"E": {"100000": Decimal(10), "140000": Decimal(4)}}, None)}
+        calculados = INDICADORES_FINANCIEROS.calcular(["E"], saldos, ["indicadorCartera"], exacto=True)
+        self.assertEqual(calculados, {("E", (2024, 3)): {"indicadorCartera": Decimal("0.4")}})
+
+
+class CargaManualTests(TestCase):
+    fila = {"periodo": 2024, "mes": 3, "entidad_RS": "BANCO CARGADO", "puc_codigo": "140805", "saldo": "700.00"}
+
+    def setUp(self):
+        for entidad in ("BANCO CARGADO", "BANCO API"):
+            IndicadorCarteraSupModel.objects.create(periodo=2024, mes=3, entidad_RS=entidad, indicadores={"x": 1.0})
+            IndicadorFinancieroSupModel.objects.create(periodo=2024, mes=3, entidad_RS=entidad, indicadores={"x": 1.0})
+
+    def cargar(self):
+        request = APIRequestFactory().post("/v1/bal_sup", {"extractedData": [self.fila], "isStaff": True}, format="json")
+        return BalSupApiView.as_view()(request)
+
+    def test_mes_sin_sincronizar_solo_invalida_las_entidades_cargadas(self):
+        self.assertEqual(self.cargar().status_code, 200)
+        for modelo in (IndicadorCarteraSupModel, IndicadorFinancieroSupModel):
+            self.assertEqual(list(modelo.objects.values_list("entidad_RS", flat=True)), ["BANCO API"])
+        self.assertFalse(TrabajoModel.objects.exists())
+        self.assertEqual(ActualizacionIndicadores().calcular([{"periodo": 2024, "mes": 3}]), [{"periodo": 2024, "mes": 3, "filas": 0}])
+        self.assertEqual(IndicadorCarteraSupModel.objects.count(), 1)
+
+    def test_mes_sincronizado_se_recalcula_en_la_cola(self):
+        BalSupCorteModel.objects.create(periodo=2024, mes=3, fecha_corte=date(2024, 3, 31), registros=2)
+        for cuenta in ("100000", "140805"):
+            BalSupModel.objects.create(periodo=2024, mes=3, entidad_RS="BANCO API", puc_codigo=cuenta, saldo=Decimal(900), origen=ORIGEN_DATOS_GOV)
+        self.cargar()
+        trabajo = TrabajoModel.objects.get()
+        self.assertEqual((trabajo.reporte, trabajo.parametros["datos"]), ("bal_sup/actualizar_indicadores", [{"periodo": 2024, "mes": 3}]))
+
+        with mock.patch("balSup.indicadores.consultar_saldos_api", side_effect=requests.ConnectionError("sin red")):
+            ActualizacionIndicadores().calcular(trabajo.parametros["datos"])
+        self.assertEqual(
+            sorted(IndicadorCarteraSupModel.objects.values_list("entidad_RS", flat=True)),
+            ["BANCO API", "BANCO CARGADO"],
+        )
+        # Sin diciembre anterior los financieros no se materializan.
+        self.assertEqual(list(IndicadorFinancieroSupModel.objects.values_list("entidad_RS", flat=True)), ["BANCO API"])
+
+    def test_recalculo_no_se_encola_desde_la_api(self):
+        request = APIRequestFactory().post("/v1/trabajos/bal_sup/actualizar_indicadores", [{"periodo": 2024, "mes": 3}], format="json")
+        respuesta = TrabajoApiViewCrear.as_view()(request, reporte="bal_sup/actualizar_indicadores")
+        self.assertEqual(respuesta.status_code, 404)
+
+
+class CargaRepetidaTests(TestCase):
+    fila = {"periodo": 2024, "mes": 3, "entidad_RS": "BANCO CARGADO", "puc_codigo": "100000"}
+
+    def setUp(self):
+        BalSupCorteModel.objects.create(periodo=2024, mes=3, fecha_corte=date(2024, 3, 31), registros=1)
+
+    def cargar(self, *saldos, origen=ORIGEN_CARGA):
+        for saldo in saldos:
+            BalSupModel.objects.create(**self.fila, saldo=Decimal(saldo), origen=origen)
+
+    def leer(self):
+        registros = obtener_registros_locales(2024, 3)
+        return [registro["valor"] for registro in registros], indice_saldos_db(2024, 3)["BANCO CARGADO"]["100000"]
+
+    def test_prevalece_la_ultima_carga(self):
+        self.cargar("500", "700")
+        self.assertEqual(self.leer(), ([Decimal(700)], Decimal(700)))
+
+    def test_prevalece_datos_gov_sobre_la_carga(self):
+        self.cargar("500")
+        self.cargar("900", origen=ORIGEN_DATOS_GOV)
+        self.cargar("700")
+        self.assertEqual(self.leer(), ([Decimal(900)], Decimal(900)))
+
+
+class SincronizacionTests(TestCase):
+    paginas = [
+        [{"fecha_corte": "2024-03-31T00:00:00.000", "nombre_entidad": "BANCO API", "cuenta": "100000", "valor": "900"}],
+        [{"fecha_corte": "2024-03-31T00:00:00.000", "nombre_entidad": "BANCO API", "cuenta": "140000", "valor": "x"}],
+    ]
+
+    def sincronizar(self):
+        with mock.patch.object(sync, "descargar_corte", return_value=iter(self.paginas)):
+            return sync.sincronizar_corte(2024, 3)
+
+    def test_reemplaza_el_espejo_y_conserva_las_cargas(self):
+        BalSupModel.objects.create(periodo=2024, mes=3, entidad_RS="BANCO CARGADO", puc_codigo="100000", saldo=Decimal(5))
+        self.assertIsNone(obtener_registros_locales(2024, 3))
+        self.assertEqual(self.sincronizar(), 2)
+        self.assertEqual(self.sincronizar(), 2)
+        self.assertEqual(BalSupModel.objects.filter(origen=ORIGEN_DATOS_GOV).count(), 2)
+        corte = BalSupCorteModel.objects.get(periodo=2024, mes=3)
+        self.assertEqual((corte.fecha_corte, corte.registros), (date(2024, 3, 31), 2))
+        self.assertEqual(
+            sorted((r["nombre_entidad"], r["cuenta"], r["valor"]) for r in obtener_registros_locales(2024, 3)),
+            [("BANCO API", "100000", Decimal(900)), ("BANCO API", "140000", Decimal(0)), ("BANCO CARGADO", "100000", Decimal(5))],
+        )
+
+    def test_lectura_filtra_cuentas_y_entidades(self):
+        self.sincronizar()
+        registros = obtener_registros_locales(2024, 3, cuentas=["100000"], entidades=["BANCO API"])
+        self.assertEqual(registros, [{"nombre_entidad": "BANCO API", "cuenta": "100000", "valor": Decimal(900)}])
+        self.assertEqual(sync.obtener_saldos_locales(2024, 3, ["140000"])["BANCO API"]["140000"], Decimal(0))
+
+    def test_incremental_desde_el_ultimo_corte(self):
+        BalSupCorteModel.objects.create(periodo=2024, mes=2, fecha_corte=date(2024, 2, 29), registros=1)
+        cortes = [date(2024, 2, 29), date(2024, 3, 31)]
+        with mock.patch.object(sync, "consultar_cortes_disponibles", return_value=cortes) as consultar, \
+                mock.patch.object(sync, "sincronizar_corte", return_value=7) as sincronizar:
+            self.assertEqual(sync.sincronizar_incremental(), [(2024, 2, 7), (2024, 3, 7)])
+        consultar.assert_called_once_with(date(2024, 2, 1))
+        self.assertEqual(sincronizar.call_count, 2)
+
+
+class StreamIndicadoresTests(SimpleTestCase):
+    filas = [{"entidad_RS": "A", "periodo": 2024, "mes": 2}, {"entidad_RS": "B", "periodo": 2024, "mes": 1}]
+
+    def test_ndjson_con_secuencia(self):
+        lineas = [json.loads(linea) for linea in lineas_stream(self.filas, "ndjson")]
+        self.assertEqual(lineas[:2], [{"secuencia": 1, **self.filas[0]}, {"secuencia": 2, **self.filas[1]}])
+        self.assertEqual(lineas[2], {"fin": True, "total": 2})
+
+    def test_sse_con_id_y_evento(self):
+        eventos = list(lineas_stream(self.filas[:1], "sse"))
+        self.assertEqual(eventos[0], f"id: 1\nevent: fila\ndata: {json.dumps({'secuencia': 1, **self.filas[0]})}\n\n")
+        self.assertEqual(eventos[1], 'event: fin\ndata: {"fin": true, "total": 1}\n\n')
+
+    def test_error_despues_de_empezar(self):
+        def filas():
+            yield self.filas[0]
+            raise ValueError("mes caído")
+
+        lineas = [json.loads(linea) for linea in lineas_stream(filas(), "ndjson")]
+        self.assertEqual(lineas[-1], {"error": "mes caído", "total": 1})
+
+    def test_vista_valida_el_formato_y_transmite(self):
+        vista = BalSupApiViewIndicador.as_view()
+        factory = APIRequestFactory()
+        self.assertEqual(vista(factory.post("/v1/bal_sup/indicador_financiero?stream=xml", [], format="json")).status_code, 400)
+        with mock.patch.object(BalSupApiViewIndicador, "filas_por_llegada", return_value=iter(self.filas)):
+            respuesta = vista(factory.post("/v1/bal_sup/indicador_financiero?stream=ndjson", [], format="json"))
+            contenido = b"".join(respuesta.streaming_content).decode()
+        self.assertEqual(respuesta["Content-Type"], "application/x-ndjson")
+        self.assertEqual([json.loads(linea).get("secuencia") for linea in contenido.splitlines()], [1, 2, None])
@@ -1,9 +1,10 @@
+import json
 import requests
-import concurrent.futures
-import threading
 
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import transaction
 from django.db.models import Q
+from django.http import StreamingHttpResponse
 
 from decimal import Decimal
 
@@ -11,10 +12,26 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
-from balSup.models import BalSupModel
+from balSup.models import BalSupModel, ORIGEN_CARGA
 from balSup.serializers import BalSupSerializer
-
-from pucSup.models import PucSupModel
+from balSup.sync import BASE_URL_FINANCIERA, SaldosDB, consultar_saldos_api, obtener_registros_locales, obtener_saldos_locales, periodo_sincronizado
+from balSup.indicadores import (
+    INDICADORES_CARTERA,
+    INDICADORES_FINANCIEROS,
+    PUC_INDICADOR_ACTUAL,
+    PUC_INDICADOR_ANTERIOR,
+    guardar_cartera,
+    invalidar_indicadores,
+    leer_cartera,
+    leer_indicadores,
+    meses_afectados,
+)
+
+from datosGov.motor import completados_en_paralelo, ejecutar_en_paralelo
+from datosGov.socrata import get_json
+from datosGov.soql import ConsultaSoQL
+from pucSup.catalogo import catalogo as catalogo_puc
+from trabajos.cola import crear_trabajo
 
 from datetime import datetime, timedelta
 from collections import defaultdict
@@ -31,9 +48,117 @@ def get_month_name(month_number):
     else:
         raise ValueError("Número de mes inválido. Debe estar entre 1 y 12.")
 
+def separar_materializados(data, results, lector, indicadores=None):
+    """Agrega a results los indicadores ya materializados (leídos con lector), sólo
+    los pedidos si se indica, y devuelve los bloques con las entidades que todavía
+    hay que calcular."""
+    periodos = [(item.get("periodo"), item.get("mes")) for item in data]
+    razones_sociales = {
+        nit_info.get("RazonSocial")
+        for item in data
+        for nit_info in item.get("nit", {}).get("superfinanciera", [])
+    }
+    materializados = lector(periodos, razones_sociales)
+    pendientes = []
+    for item in data:
+        periodo, mes = int(item.get("periodo")), int(item.get("mes"))
+        faltantes = []
+        for nit_info in item.get("nit", {}).get("superfinanciera", []):
+            razon_social = nit_info.get("RazonSocial")
+            materializado = materializados.get((razon_social, periodo, mes))
+            if materializado is None:
+                faltantes.append(nit_info)
+                continue
+            if indicadores is not None:
+                materializado = {nombre: valor for nombre, valor in materializado.items() if nombre in indicadores}
+            results.append({
+                "entidad_RS": razon_social,
+                "sigla": nit_info.get("sigla"),
+                "periodo": periodo,
+                "mes": item.get("mes"),
+                **materializado
+            })
+        if faltantes:
+            pendientes.append({**item, "nit": {**item.get("nit", {}), "superfinanciera": faltantes}})
+    return pendientes
+
+def indicadores_solicitados(request, conjunto):
+    """Indicadores pedidos en ?indicadores=a,b (o repitiendo el parámetro); None si
+    se piden todos. Lanza ValueError si alguno no existe en el conjunto."""
+    indicadores = [
+        nombre.strip()
+        for valor in request.query_params.getlist("indicadores")
+        for nombre in valor.split(",")
+        if nombre.strip()
+    ]
+    if not indicadores:
+        return None
+    conjunto.seleccion(indicadores)
+    return set(indicadores)
+
+def calcular_resultados(conjunto, bloques, saldos, indicadores=None):
+    """Evalúa los indicadores del conjunto (o sólo los pedidos) para todas las
+    entidades y meses de los bloques en una sola pasada. saldos trae, en el orden
+    de bloques, (saldos_current, saldos_previous) de cada mes."""
+    por_mes = {}
+    for bloque, (saldos_current, saldos_previous) in zip(bloques, saldos):
+        mes = (int(bloque.get("periodo")), int(bloque.get("mes")))
+        if mes in por_mes:
+            por_mes[mes][0].update(saldos_current)
+            if saldos_previous is not None:
+                por_mes[mes][1].update(saldos_previous)
+        else:
+            por_mes[mes] = (saldos_current, saldos_previous)
+    entidades = list(dict.fromkeys(
+        nit_info.get("RazonSocial")
+        for bloque in bloques
+        for nit_info in bloque.get("nit", {}).get("superfinanciera", [])
+    ))
+    calculados = conjunto.calcular(entidades, por_mes, indicadores)
+    return [
+        {
+            "entidad_RS": nit_info.get("RazonSocial"),
+            "sigla": nit_info.get("sigla"),
+            "periodo": int(bloque.get("periodo")),
+            "mes": bloque.get("mes"),
+            **calculados[(nit_info.get("RazonSocial"), (int(bloque.get("periodo")), int(bloque.get("mes"))))]
+        }
+        for bloque in bloques
+        for nit_info in bloque.get("nit", {}).get("superfinanciera", [])
+    ]
+
+# Formatos de ?stream= para recibir las filas a medida que se calculan.
+FORMATOS_STREAM = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def lineas_stream(filas, formato):
+    """Una línea (ndjson) o evento (sse) por fila con su número de secuencia de
+    llegada, y al final un evento fin con el total (o error si algo falló)."""
+    def linea(evento, contenido, secuencia=None):
+        texto = json.dumps(contenido, cls=DjangoJSONEncoder)
+        if formato == "ndjson":
+            return texto + "\n"
+        return (f"id: {secuencia}\n" if secuencia else "") + f"event: {evento}\ndata: {texto}\n\n"
+
+    secuencia = 0
+    try:
+        for fila in filas:
+            secuencia += 1
+            yield linea("fila", {"secuencia": secuencia, **fila}, secuencia)
+    except Exception as e:
+        print(f"Error al transmitir indicadores: {e}")
+        yield linea("error", {"error": str(e), "total": secuencia})
+        return
+    yield linea("fin", {"fin": True, "total": secuencia})
+
+def respuesta_stream(filas, formato):
+    respuesta = StreamingHttpResponse(lineas_stream(filas, formato), content_type=FORMATOS_STREAM[formato])
+    respuesta["Cache-Control"] = "no-cache"
+    respuesta["X-Accel-Buffering"] = "no"
+    return respuesta
+
 class BalSupApiView(APIView):
     def get(self, request):
-        serializer = BalSupSerializer(BalSupModel.objects.all(), many=True)
+        serializer = BalSupSerializer(BalSupModel.objects.filter(origen=ORIGEN_CARGA).order_by('-id'), many=True)
         return Response(status=status.HTTP_200_OK, data=serializer.data)
     
     def post(self, request):
@@ -81,6 +206,21 @@ class BalSupApiView(APIView):
                 for instance, fields_to_update in update_instances:
                     BalSupModel.objects.bulk_update([instance], fields_to_update)
 
+        cargados = defaultdict(set)
+        for instance in new_instances:
+            cargados[(instance.periodo, instance.mes)].add(instance.entidad_RS)
+        for (periodo, mes), entidades in cargados.items():
+            invalidar_indicadores(periodo, mes, entidades)
+        # Los meses sincronizados se vuelven a materializar en la cola de trabajos;
+        # los demás se calculan en línea, prefiriendo datos.gov.co.
+        meses = [
+            {"periodo": periodo, "mes": mes}
+            for periodo, mes in sorted(cargados)
+            if any(periodo_sincronizado(*afectado) for afectado in meses_afectados(periodo, mes))
+        ]
+        if meses:
+            crear_trabajo("bal_sup/actualizar_indicadores", meses, {})
+
         response_data = {
             "created": len(new_instances),
             "updated": len(update_instances),
@@ -127,8 +267,6 @@ class BalSupApiViewDetail(APIView):
     #     response = { 'deleted': True }
     #     return Response(status=status.HTTP_204_NO_CONTENT, data=response)
 
-thread_BalSupA = threading.local()
-
 class BalSupApiViewA(APIView):
     def post(self, request):
         data = request.data
@@ -139,51 +277,53 @@ class BalSupApiViewA(APIView):
             if not superfinanciera_data:
                 return Response([], status=status.HTTP_200_OK)
         bloques = self.dividir_en_bloques(data)
-        results = []
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = [executor.submit(self.procesar_bloque, bloque, transformed_results, saldos_cache) for bloque in bloques]
-            for future in concurrent.futures.as_completed(futures):
-                future.result()
+        saldos_api = self.get_saldos_api(bloques)
+        self.saldos_db = SaldosDB()
+        ejecutar_en_paralelo(self.procesar_bloque, bloques, transformed_results, saldos_cache, saldos_api)
         final_results = list(transformed_results.values())
         return Response(data=final_results, status=status.HTTP_200_OK)
 
     def dividir_en_bloques(self, datos):
         return [item for item in datos]
 
-    def get_saldo_from_db(self, razon_social, periodo, puc_codigo, mes):
-        if not hasattr(thread_BalSupA, 'last_periodo'):
-            thread_BalSupA.last_periodo = None
-            thread_BalSupA.last_mes_number = None
-            thread_BalSupA.saved_query_results = None
-        if thread_BalSupA.last_periodo == periodo and thread_BalSupA.last_mes_number == mes:
-            all_query_results = thread_BalSupA.saved_query_results
-        else:
-            q_current_period = Q(periodo=periodo, puc_codigo=puc_codigo, mes=mes)
-            all_query_results = BalSupModel.objects.filter(q_current_period).values("entidad_RS", "periodo", "mes", "saldo")
-            thread_BalSupA.saved_query_results = all_query_results
-        thread_BalSupA.last_periodo = periodo
-        thread_BalSupA.last_mes_number = mes
-        filtered_results = [result for result in all_query_results if result['entidad_RS'] == razon_social]
-        return filtered_results
-
-    def procesar_bloque(self, bloque, transformed_results, saldos_cache):
-        periodo = int(bloque.get("periodo"))
-        mes = bloque.get("mes")
+    def get_puc_codigo(self, bloque):
         puc_codigo = bloque.get("puc_codigo")
-
         if puc_codigo == "230000": 
             puc_codigo = "240000"
         if puc_codigo == "350000": 
             puc_codigo = "391500"
+        return puc_codigo
+
+    def get_saldos_api(self, bloques):
+        """Trae en una sola consulta todos los meses que no están sincronizados localmente."""
+        meses, cuentas, entidades = set(), set(), set()
+        for bloque in bloques:
+            periodo, mes = int(bloque.get("periodo")), int(bloque.get("mes"))
+            if periodo_sincronizado(periodo, mes):
+                continue
+            meses.add((periodo, mes))
+            cuentas.add(self.get_puc_codigo(bloque))
+            entidades.update(nit_info.get("RazonSocial") for nit_info in bloque.get("nit", {}).get("superfinanciera", []))
+        try:
+            return consultar_saldos_api(meses, cuentas, entidades)
+        except requests.RequestException as e:
+            print(f"Error al obtener saldos: {e}")
+            return {}
 
-        fecha1 = datetime(periodo, mes, 1)
-        fecha2 = (fecha1 + timedelta(days=31)).replace(day=1) - timedelta(days=1)
-        fecha1_str = fecha1.strftime("%Y-%m-%dT00:00:00")
-        fecha2_str = fecha2.strftime("%Y-%m-%dT23:59:59")
-        baseUrl_entidadesFinanciera = "https://www.datos.gov.co/resource/mxk5-ce6w.json?$limit=500000"
-        url_financiera = f"{baseUrl_entidadesFinanciera}&$where=fecha_corte BETWEEN '{fecha1_str}' AND '{fecha2_str}' AND cuenta='{puc_codigo}' AND moneda ='0'"
-        response_financiera = requests.get(url_financiera)
-        all_data = response_financiera.json() if response_financiera.status_code == 200 else []
+    def get_saldo_from_db(self, razon_social, periodo, puc_codigo, mes):
+        return self.saldos_db.saldos_entidad(razon_social, periodo, mes, [puc_codigo]).get(puc_codigo)
+
+    def procesar_bloque(self, bloque, transformed_results, saldos_cache, saldos_api):
+        periodo = int(bloque.get("periodo"))
+        mes = bloque.get("mes")
+        puc_codigo = self.get_puc_codigo(bloque)
+
+        all_data = obtener_registros_locales(periodo, mes, [puc_codigo])
+        if all_data is None:
+            saldos_mes = saldos_api.get((periodo, int(mes)), {})
+            saldos_entidad = {razon_social: cuentas[puc_codigo] for razon_social, cuentas in saldos_mes.items() if puc_codigo in cuentas}
+        else:
+            saldos_entidad = {data["nombre_entidad"]: data["valor"] for data in all_data}
         for nit_info in bloque.get("nit", {}).get("superfinanciera", []):
             nit = nit_info.get("nit")
             razon_social = nit_info.get("RazonSocial")
@@ -196,657 +336,157 @@ class BalSupApiViewA(APIView):
                     "puc_codigo": puc_codigo,
                     "saldos": [],
                 }
-            entity_data = [data for data in all_data if data['nombre_entidad'] == razon_social]
+            entity_data = razon_social in saldos_entidad
             saldo_en_bd = False
             if entity_data:
-                for result in entity_data:
-                    saldo = float(result.get('valor', '0'))
-                    saldos_cache[razon_social][puc_codigo] = saldo
-                    transformed_results[key]["saldos"].append({"periodo": periodo, "mes": mes, "saldo": saldo})
+                saldo = float(saldos_entidad[razon_social])
+                saldos_cache[razon_social][puc_codigo] = saldo
+                transformed_results[key]["saldos"].append({"periodo": periodo, "mes": mes, "saldo": saldo})
             else:
-                query_results = self.get_saldo_from_db(razon_social, periodo, puc_codigo, mes)
-                if query_results:
-                    first_result = query_results[0]
-                    saldo = float(first_result["saldo"])
+                saldo_db = self.get_saldo_from_db(razon_social, periodo, puc_codigo, mes)
+                if saldo_db is not None:
+                    saldo = float(saldo_db)
                     saldos_cache[razon_social][puc_codigo] = saldo
-                    transformed_results[key]["saldos"].append(
-                        {"periodo": first_result["periodo"], "mes": first_result["mes"], "saldo": saldo}
-                    )
+                    transformed_results[key]["saldos"].append({"periodo": periodo, "mes": int(mes), "saldo": saldo})
                     saldo_en_bd = True
             if not entity_data and not saldo_en_bd:
                 transformed_results[key]["saldos"].append({"periodo": periodo, "mes": mes, "saldo": 0})
             transformed_results[key]["saldos"] = sorted(transformed_results[key]["saldos"], key=lambda x: (x["periodo"], x["mes"]))
 
-thread_Indicador = threading.local()
-thread_lock_Indicador = threading.Lock()
-
 class BalSupApiViewIndicador(APIView):
     def post(self, request):
-        data = request.data
+        formato = request.query_params.get("stream")
+        if formato:
+            if formato not in FORMATOS_STREAM:
+                return Response({"error": f"stream debe ser {' o '.join(FORMATOS_STREAM)}."}, status=status.HTTP_400_BAD_REQUEST)
+            return respuesta_stream(self.filas_por_llegada(request.data), formato)
+        return Response(self.calcular(request.data))
+
+    def filas_por_llegada(self, data):
+        """Las mismas filas de calcular, pero entregadas mes a mes en cuanto cada mes
+        termina (las materializadas primero); el orden final lo pone el cliente."""
+        results = []
+        for item in data:
+            if not item.get("nit", {}).get("superfinanciera", []):
+                return
+        bloques = self.dividir_en_bloques(separar_materializados(data, results, leer_indicadores))
+        yield from results
+        if bloques:
+            self.saldos_db = SaldosDB()
+            for indice, saldos in completados_en_paralelo(self.procesar_bloque, bloques):
+                yield from calcular_resultados(INDICADORES_FINANCIEROS, [bloques[indice]], [saldos])
+
+    def calcular(self, data):
+        """Filas de indicadores de los meses de data, ordenadas por periodo y mes."""
         results = []
-        periodo_anterior = None
-        mes_anterior = None
         for item in data:
             superfinanciera_data = item.get("nit", {}).get("superfinanciera", [])
             if not superfinanciera_data:
-                return Response([], status=status.HTTP_200_OK)
-        bloques = self.dividir_en_bloques(data)
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = [executor.submit(self.procesar_bloque, bloque, results, periodo_anterior, mes_anterior) for bloque in bloques]
-            for future in concurrent.futures.as_completed(futures):
-                future.result()
-        return Response(results)
+                return []
+        bloques = self.dividir_en_bloques(separar_materializados(data, results, leer_indicadores))
+        if bloques:
+            self.saldos_db = SaldosDB()
+            saldos = ejecutar_en_paralelo(self.procesar_bloque, bloques)
+            results.extend(calcular_resultados(INDICADORES_FINANCIEROS, bloques, saldos))
+        results.sort(key=lambda x: (x['periodo'], x['mes']))
+        return results
 
     def dividir_en_bloques(self, datos):
         return [item for item in datos]
 
-    def procesar_bloque(self, bloque, results, periodo_anterior, mes_anterior):
+    def procesar_bloque(self, bloque):
+        """Saldos del mes y del diciembre anterior de las entidades del bloque."""
         periodo = int(bloque.get("periodo"))
         mes = bloque.get("mes")
-        mes_decimal = Decimal(mes)
-        fecha1_str, fecha2_str = self.build_dates(periodo, mes)
-        # puc_codes_current = ["100000", "110000", "120000", "130000", "140000", "210000", "240000", "250000", "300000", "310000", "320000", "370500", "391500", "410200", "510200", "510300"]
-        puc_codes_current = ["100000", "110000", "120000", "130000", "140000", "150000", "160000", "170000", "180000", "190000", "210000", "240000", "250000", "300000", "310000", "320000", "370500", "391500", "410200", "510200", "510300", "512000", "517240", "511800", "513025", "513030", "514500", "516000", "516500", "519005", "519010", "519020", "519025", "519030", "519035", "519040", "519045", "519065", "519070", "519095", "519015", "513010", "513015", "517500", "517800", "518000", "517005"]
-        puc_codes_prev = ["100000", "140000", "210000", "240000", "300000"]
-        saldos_current = self.get_saldos(fecha1_str, fecha2_str, puc_codes_current)
+        entidades = [nit_info.get("RazonSocial") for nit_info in bloque.get("nit", {}).get("superfinanciera", [])]
+        puc_codes_current = PUC_INDICADOR_ACTUAL
+        puc_codes_prev = PUC_INDICADOR_ANTERIOR
+        saldos_current = obtener_saldos_locales(periodo, mes, puc_codes_current)
+        if saldos_current is None:
+            saldos_current = self.get_saldos(periodo, mes, puc_codes_current, entidades)
         periodo_anterior_actual = periodo - 1
         mes_ultimo = 12
-        fecha1_str_pre, fecha2_str_pre = self.build_dates(periodo_anterior_actual, mes_ultimo)
-        if periodo_anterior != periodo_anterior_actual or mes_anterior != mes_ultimo:
-            saldos_previous = self.get_saldos(fecha1_str_pre, fecha2_str_pre, puc_codes_prev, previous=True)
-            periodo_anterior, mes_anterior = periodo_anterior_actual, mes_ultimo
-        else:
-            saldos_previous = thread_Indicador.saved_saldos_previous
-        thread_Indicador.saved_saldos_previous = saldos_previous
-        self.process_indicators(bloque, saldos_current, saldos_previous, results, mes_decimal, periodo, mes, periodo_anterior_actual,puc_codes_current,  puc_codes_prev)
-        return Response(results)
-
-    def build_dates(self, periodo, mes):
-        fecha1 = datetime(periodo, mes, 1)
-        fecha2 = (fecha1 + timedelta(days=31)).replace(day=1) - timedelta(days=1)
-        return fecha1.strftime("%Y-%m-%dT00:00:00"), fecha2.strftime("%Y-%m-%dT23:59:59")
+        saldos_previous = obtener_saldos_locales(periodo_anterior_actual, mes_ultimo, puc_codes_prev)
+        if saldos_previous is None:
+            saldos_previous = self.get_saldos(periodo_anterior_actual, mes_ultimo, puc_codes_prev, entidades)
+        for razon_social in entidades:
+            if not any(saldos_current[razon_social].values()):
+                self.load_saldos_from_db(razon_social, saldos_current, periodo, mes, puc_codes_current)
+            if not any(saldos_previous[razon_social].values()):
+                self.load_saldos_from_db(razon_social, saldos_previous, periodo_anterior_actual, mes_ultimo, puc_codes_prev)
+        return saldos_current, saldos_previous
 
-    def get_saldos(self, fecha1_str, fecha2_str, puc_codes, previous=False):
-        saldos = defaultdict(lambda: defaultdict(Decimal))
-        puc_codes_str = ','.join(f"'{code}'" for code in puc_codes)
-        url = f"https://www.datos.gov.co/resource/mxk5-ce6w.json?$limit=100000&$where=fecha_corte BETWEEN '{fecha1_str}' AND '{fecha2_str}' AND cuenta IN ({puc_codes_str}) AND moneda ='0'"
+    def get_saldos(self, periodo, mes, puc_codes, entidades):
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            all_data = response.json()
-            for result in all_data:
-                razon_social = result.get("nombre_entidad")
-                cuenta = result.get("cuenta")
-                total_saldo = Decimal(result.get("valor", 0))
-                saldos[razon_social][cuenta] += total_saldo
+            return consultar_saldos_api([(periodo, int(mes))], puc_codes, entidades)[(periodo, int(mes))]
         except requests.RequestException as e:
             print(f"Error al obtener saldos: {e}")
-        return saldos
+            return defaultdict(lambda: defaultdict(Decimal))
 
-    def process_indicators(self, item, saldos_current, saldos_previous, results, mes_decimal, periodo, mes, periodo_anterior_actual, puc_codes_current, puc_codes_prev):
-        for nit_info in item.get("nit", {}).get("superfinanciera", []):
-            razon_social = nit_info.get("RazonSocial")
-            if not any(saldos_current[razon_social].values()):
-                self.load_saldos_from_db(razon_social, saldos_current, periodo, mes, puc_codes_current, is_current_period=True)
-            if not any(saldos_previous[razon_social].values()):
-                self.load_saldos_from_db(razon_social, saldos_previous, periodo_anterior_actual, 12, puc_codes_prev, is_current_period=False)
-            try:
-                indicadores = self.calculate_indicators(razon_social, saldos_current, saldos_previous, mes_decimal)
-                result_entry = {
-                    "entidad_RS": razon_social,
-                    "sigla": nit_info.get("sigla"),
-                    "periodo": periodo,
-                    "mes": mes,
-                    **indicadores
-                }
-                with thread_lock_Indicador:
-                    results.append(result_entry)
-            except Exception as e:
-                print(f"Error en cálculo de indicadores para {razon_social}: {e}")
-        with thread_lock_Indicador:
-            results.sort(key=lambda x: (x['periodo'], x['mes']))
-
-    def load_saldos_from_db(self, razon_social, saldos_current, periodo, mes, puc_codes, is_current_period=True):
-        if is_current_period:
-            if not hasattr(thread_Indicador, 'currentPeriodo'):
-                thread_Indicador.currentPeriodo = None
-                thread_Indicador.currentMes = None
-                thread_Indicador.saved_query_current = None
-            if thread_Indicador.currentPeriodo == periodo and thread_Indicador.currentMes == mes:
-                all_query_results = thread_Indicador.saved_query_current
-            else:
-                q_current_period = Q(periodo=periodo, mes=mes) & Q(puc_codigo__in=puc_codes)
-                all_query_results = BalSupModel.objects.filter(q_current_period).values('entidad_RS', 'puc_codigo', 'saldo')
-                thread_Indicador.saved_query_current = all_query_results
-                thread_Indicador.currentPeriodo = periodo
-                thread_Indicador.currentMes = mes
-        else:
-            if not hasattr(thread_Indicador, 'last_periodo'):
-                thread_Indicador.last_periodo = None
-                thread_Indicador.last_Mes = None
-                thread_Indicador.saved_query_Last = None
-            if thread_Indicador.last_periodo == periodo and thread_Indicador.last_Mes == mes:
-                all_query_results = thread_Indicador.saved_query_Last
-            else:
-                q_previous_period = Q(periodo=periodo, mes=mes) & Q(puc_codigo__in=puc_codes)
-                all_query_results = BalSupModel.objects.filter(q_previous_period).values('entidad_RS', 'puc_codigo', 'saldo')
-                thread_Indicador.saved_query_Last = all_query_results
-                thread_Indicador.last_periodo = periodo
-                thread_Indicador.last_Mes = mes
-        for result in all_query_results:
-            if result['entidad_RS'] == razon_social:
-                puc_codigo = result['puc_codigo']
-                saldo = result['saldo']
-                if razon_social not in saldos_current:
-                    saldos_current[razon_social] = {}
-                saldos_current[razon_social][puc_codigo] = saldo
-
-    def calculate_indicators(self, razon_social, saldos_current, saldos_previous, mes_decimal):
-        def safe_division(numerator, denominator):
-            # return (numerator / denominator * 100) if denominator else 
-            return ( numerator / denominator ) if denominator else 0
-
-        indicador_cartera = safe_division(saldos_current[razon_social]["140000"], saldos_current[razon_social]["100000"])
-        indicador_deposito = safe_division(saldos_current[razon_social]["210000"], saldos_current[razon_social]["100000"])
-        indicador_obligaciones = safe_division(saldos_current[razon_social]["240000"], saldos_current[razon_social]["100000"])
-        indicador_cap_social = safe_division(saldos_current[razon_social]["310000"], saldos_current[razon_social]["100000"])
-        indicador_cap_inst = safe_division(saldos_current[razon_social]["320000"] + saldos_current[razon_social]["370500"], saldos_current[razon_social]["100000"])
-        denominator_roe = (saldos_previous[razon_social]["300000"] + (saldos_current[razon_social]["300000"] / mes_decimal) * 12) / 2
-        indicador_roe = safe_division(saldos_current[razon_social]["391500"], denominator_roe)
-        denominator_roa = (saldos_previous[razon_social]["100000"] + (saldos_current[razon_social]["100000"] / mes_decimal) * 12) / 2
-        indicador_roa = safe_division(saldos_current[razon_social]["391500"], denominator_roa)
-        denominator_ingreso_cartera = (saldos_previous[razon_social]["140000"] + (saldos_current[razon_social]["140000"] / mes_decimal) * 12) / 2
-        indicador_ingreso_cartera = safe_division(saldos_current[razon_social]["410200"], denominator_ingreso_cartera)
-        denominator_costos_deposito = (saldos_previous[razon_social]["210000"] + (saldos_current[razon_social]["210000"] / mes_decimal) * 12) / 2
-        indicador_costos_deposito = safe_division(saldos_current[razon_social]["510200"], denominator_costos_deposito)
-        denominator_credito_banco = (saldos_previous[razon_social]["240000"] + (saldos_current[razon_social]["240000"] / mes_decimal) * 12) / 2
-        indicador_credito_banco = safe_division(saldos_current[razon_social]["510300"], denominator_credito_banco)
-
-        indicador_disponible =safe_division((saldos_current[razon_social]["110000"]+saldos_current[razon_social]["120000"]),saldos_current[razon_social]["100000"])
-        
-        cuentas_activosImp = (saldos_current[razon_social]["150000"]+saldos_current[razon_social]["160000"]+saldos_current[razon_social]["170000"]+saldos_current[razon_social]["180000"]+saldos_current[razon_social]["190000"])
-        
-        indicador_activos_imp = safe_division(cuentas_activosImp, saldos_current[razon_social]["100000"])
-
-        # Gastos operativos
-        indicador_personal = safe_division(saldos_current[razon_social]["512000"] + saldos_current[razon_social]["517240"], saldos_current[razon_social]["100000"])
-        administrativos_cuentas = ( saldos_current[razon_social]["511800"] + saldos_current[razon_social]["513025"] + saldos_current[razon_social]["513030"] + saldos_current[razon_social]["514500"] + saldos_current[razon_social]["516000"] + saldos_current[razon_social]["516500"] + saldos_current[razon_social]["519005"] + saldos_current[razon_social]["519010"] + saldos_current[razon_social]["519020"] + saldos_current[razon_social]["519025"] + saldos_current[razon_social]["519030"] + saldos_current[razon_social]["519035"] + saldos_current[razon_social]["519040"] + saldos_current[razon_social]["519045"] + saldos_current[razon_social]["519065"] + saldos_current[razon_social]["519070"] + saldos_current[razon_social]["519095"])
-        indicador_administrativos = safe_division( administrativos_cuentas - saldos_current[razon_social]["519015"] - saldos_current[razon_social]["513010"] - saldos_current[razon_social]["513015"], saldos_current[razon_social]["100000"])
-        indicador_mercader = safe_division(saldos_current[razon_social]["519015"], saldos_current[razon_social]["100000"])
-        indicador_gobernabilidad = safe_division(saldos_current[razon_social]["513010"] + saldos_current[razon_social]["513015"], saldos_current[razon_social]["100000"])
-        indicador_depreAmorti = safe_division(saldos_current[razon_social]["517500"] + saldos_current[razon_social]["517800"] + saldos_current[razon_social]["518000"] , saldos_current[razon_social]["100000"])
-        deteriodo_gastosOpetativos = safe_division(saldos_current[razon_social]["517005"], saldos_current[razon_social]["100000"])
-
-        totalGastosOperativos_cuentas = (saldos_current[razon_social]["512000"] + saldos_current[razon_social]["517240"] + administrativos_cuentas + saldos_current[razon_social]["519015"] + saldos_current[razon_social]["513010"] + saldos_current[razon_social]["513015"] + saldos_current[razon_social]["517500"] + saldos_current[razon_social]["517800"] + saldos_current[razon_social]["518000"])
-
-        indicador_totalGastosOperativos = safe_division(totalGastosOperativos_cuentas, saldos_current[razon_social]["100000"])
-
-        return {
-            "indicadorCartera": indicador_cartera,
-            "indicadorDeposito": indicador_deposito,
-            "indicadorObligaciones": indicador_obligaciones,
-            "indicadorCapSocial": indicador_cap_social,
-            "indicadorCapInst": indicador_cap_inst,
-            "indicadorRoe": indicador_roe,
-            "indicadorRoa": indicador_roa,
-            "indicadorIngCartera": indicador_ingreso_cartera,
-            "indicadorCostDeposito": indicador_costos_deposito,
-            "indicadorCredBanco": indicador_credito_banco,
-            "indicadorDisponible": indicador_disponible,
-            "indicadorActivoImpro": indicador_activos_imp,
-            "DeterioroGastosOperativos": deteriodo_gastosOpetativos,
-            # Gastos Operativos
-            "indicadorPersonal": indicador_personal,
-            # "indicadorAdministrativos": indicador_administrativos,
-            # "indicadorMercader": indicador_mercader,
-            "indicadorGenerales": indicador_administrativos,
-            "indicadorMercadeo": indicador_mercader,
-            "indicadorGobernabilidad": indicador_gobernabilidad,
-            "indicadorDepreciacionesAmort": indicador_depreAmorti,
-            "indicadorTotalGastonOperativos": indicador_totalGastosOperativos,
-        }
-
-thread_IndicadorC = threading.local()
-thread_lock_IndicadorC = threading.Lock()
+    def load_saldos_from_db(self, razon_social, saldos_current, periodo, mes, puc_codes):
+        saldos_current[razon_social].update(self.saldos_db.saldos_entidad(razon_social, periodo, mes, puc_codes))
 
 class BalSupApiViewIndicadorC(APIView):
 
     def post(self, request):
-        data = request.data
+        try:
+            indicadores = indicadores_solicitados(request, INDICADORES_CARTERA)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.calcular(request.data, indicadores))
+
+    def calcular(self, data, indicadores=None):
+        """Filas de cartera de los meses de data (sólo los indicadores pedidos, o
+        todos), ordenadas por periodo y mes."""
         results = []
+        self.indicadores = indicadores
         for item in data:
             superfinanciera_data = item.get("nit", {}).get("superfinanciera", [])
             if not superfinanciera_data:
-                return Response([], status=status.HTTP_200_OK)
-        bloques = self.dividir_en_bloques(data)
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = [executor.submit(self.procesar_bloque, bloque, results) for bloque in bloques]
-            for future in concurrent.futures.as_completed(futures):
-                future.result()
-        return Response(results)
+                return []
+        bloques = self.dividir_en_bloques(separar_materializados(data, results, leer_cartera, self.indicadores))
+        if bloques:
+            self.saldos_db = SaldosDB()
+            saldos = ejecutar_en_paralelo(self.procesar_bloque, bloques)
+            calculados = calcular_resultados(INDICADORES_CARTERA, bloques, saldos, self.indicadores)
+            if self.indicadores is None:
+                # Una selección parcial no se materializa: la fila quedaría incompleta.
+                guardar_cartera(calculados)
+            results.extend(calculados)
+        results.sort(key=lambda x: (x['periodo'], x['mes']))
+        return results
 
     def dividir_en_bloques(self, datos):
         return [item for item in datos]
 
-    def procesar_bloque(self, bloque, results):
+    def procesar_bloque(self, bloque):
         periodo = int(bloque.get("periodo"))
         mes = bloque.get("mes")
-        mes_decimal = Decimal(mes)
-        puc_codes_current = ["140800", "140805", "140810", "140815", "140820", "140825","149100", "141200", "141205", "141210", "141215", "141220","141225", "149300", "141000", "141005", "141010", "141015","141020", "141025", "149500", "148900", "140400", "140405","140410", "140415", "140420", "140425", "140430", "140435", "140440", "140445", "140450", "141400", "141405","141410", "141415", "141420", "141425", "148800", "141430", "141435", "141440", "141445", "141450", "141460", "141465", "141470", "141475", "141480", "812000",
-        "210000", "210500", "210600", "210700", "210800", "210900", "211000", "211100", "211200", "211300", "211400", "211500", "211600", "211700", "211800", "211900", "212000", "212200", "212300", "212400", "212500", "212600", "212700", "212800", "212900", "213000", "213200", "214600", "214700", "214800", "214900", "215000", "215100", "215200", "215300", "215400", "215500", "215600", "215700", "218000", "149800"
-        ]
-        fecha1_str, fecha2_str = self.build_dates(periodo, mes)
-        saldos_current = self.get_saldos(fecha1_str, fecha2_str, puc_codes_current)
-        self.process_indicators(bloque, saldos_current, results, mes_decimal, periodo, mes,puc_codes_current)
-        return Response(results)
-
-    def build_dates(self, periodo, mes):
-        fecha1 = datetime(periodo, mes, 1)
-        fecha2 = (fecha1 + timedelta(days=31)).replace(day=1) - timedelta(days=1)
-        return fecha1.strftime("%Y-%m-%dT00:00:00"), fecha2.strftime("%Y-%m-%dT23:59:59")
+        entidades = [nit_info.get("RazonSocial") for nit_info in bloque.get("nit", {}).get("superfinanciera", [])]
+        puc_codes_current = INDICADORES_CARTERA.cuentas(self.indicadores)
+        saldos_current = obtener_saldos_locales(periodo, mes, puc_codes_current)
+        if saldos_current is None:
+            saldos_current = self.get_saldos(periodo, mes, puc_codes_current, entidades)
+        for razon_social in entidades:
+            if not any(saldos_current[razon_social].values()):
+                self.load_saldos_from_db(razon_social, saldos_current, periodo, mes, puc_codes_current)
+        return saldos_current, None
 
-    def get_saldos(self, fecha1_str, fecha2_str, puc_codes, previous=False):
-        saldos = defaultdict(lambda: defaultdict(Decimal))
-        puc_codes_str = ','.join(f"'{code}'" for code in puc_codes)
-        url = f"https://www.datos.gov.co/resource/mxk5-ce6w.json?$limit=100000&$where=fecha_corte BETWEEN '{fecha1_str}' AND '{fecha2_str}' AND cuenta IN ({puc_codes_str}) AND moneda ='0'"
+    def get_saldos(self, periodo, mes, puc_codes, entidades):
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            all_data = response.json()
-            for result in all_data:
-                razon_social = result.get("nombre_entidad")
-                cuenta = result.get("cuenta")
-                total_saldo = Decimal(result.get("valor", 0))
-                saldos[razon_social][cuenta] += total_saldo
+            return consultar_saldos_api([(periodo, int(mes))], puc_codes, entidades)[(periodo, int(mes))]
         except requests.RequestException as e:
             print(f"Error al obtener saldos: {e}")
-        return saldos
-
-    def process_indicators(self, item, saldos_current, results, mes_decimal, periodo, mes,puc_codes_current):
-        for nit_info in item.get("nit", {}).get("superfinanciera", []):
-            razon_social = nit_info.get("RazonSocial")
-            if not any(saldos_current[razon_social].values()):
-                self.load_saldos_from_db(razon_social, saldos_current, periodo, mes, puc_codes_current)
-            try:
-                indicadores = self.calculate_indicators(razon_social, saldos_current, mes_decimal)
-                
-                result_entry = {
-                    "entidad_RS": razon_social,
-                    "sigla": nit_info.get("sigla"),
-                    "periodo": periodo,
-                    "mes": mes,
-                    **indicadores
-                }
-                with thread_lock_IndicadorC:
-                    results.append(result_entry)
-            except Exception as e:
-                print(f"Error en cálculo de indicadores para {razon_social}: {e}")
-        with thread_lock_IndicadorC:
-            results.sort(key=lambda x: (x['periodo'], x['mes']))
+            return defaultdict(lambda: defaultdict(Decimal))
 
     def load_saldos_from_db(self, razon_social, saldos_current, periodo, mes_number, puc_codes):
-        if not hasattr(thread_IndicadorC, 'last_periodo'):
-            thread_IndicadorC.last_periodo = None
-            thread_IndicadorC.last_mes_number = None
-            thread_IndicadorC.saved_query_results = None
-        if thread_IndicadorC.last_periodo == periodo and thread_IndicadorC.last_mes_number == mes_number:
-            all_query_results = thread_IndicadorC.saved_query_results
-        else:
-            q_current_period = Q(periodo=periodo, mes=mes_number) & Q(puc_codigo__in=puc_codes)
-            all_query_results = BalSupModel.objects.filter(q_current_period).values('entidad_RS', 'puc_codigo', 'saldo')
-            thread_IndicadorC.saved_query_results = all_query_results
-        for result in all_query_results:
-            if result['entidad_RS'] == razon_social:
-                puc_codigo = result['puc_codigo']
-                saldo = result['saldo']
-                if razon_social not in saldos_current:
-                    saldos_current[razon_social] = {}
-                saldos_current[razon_social][puc_codigo] = saldo
-        thread_IndicadorC.last_periodo = periodo
-        thread_IndicadorC.last_mes_number = mes_number
+        saldos_current[razon_social].update(self.saldos_db.saldos_entidad(razon_social, periodo, mes_number, puc_codes))
         return saldos_current
 
-    def calculate_indicators(self, razon_social, saldos_current, mes_decimal):
-        def safe_division(numerator, denominator):
-            # return (numerator / denominator * 100) if denominator else 0
-            return ( numerator / denominator ) if denominator else 0
-
-        #Consumo
-        consumo_a = saldos_current[razon_social]["140805"]
-        consumo_b = saldos_current[razon_social]["140810"]
-        consumo_c = saldos_current[razon_social]["140815"]
-        consumo_d = saldos_current[razon_social]["140820"]
-        consumo_e = saldos_current[razon_social]["140825"]
-        consumo_total = saldos_current[razon_social]["140800"]
-        consumo_ind_mora = safe_division((consumo_b + consumo_c + consumo_d + consumo_e), (consumo_a + consumo_b + consumo_c + consumo_d + consumo_e))
-        consumo_deterioro = saldos_current[razon_social]["149100"]
-        denominator_consumo_ind_mora = (consumo_a + consumo_b + consumo_c + consumo_d + consumo_e)
-        consumo_cartera_improductiva = safe_division((consumo_c + consumo_d + consumo_e), denominator_consumo_ind_mora)
-        denominator_consumo_porc_cobertura = (consumo_b + consumo_c + consumo_d + consumo_e)
-        consumo_porc_cobertura = safe_division(consumo_deterioro, denominator_consumo_porc_cobertura)
-
-        #microcredito
-        microcredito_a = saldos_current[razon_social]["141205"]
-        microcredito_b = saldos_current[razon_social]["141210"]
-        microcredito_c = saldos_current[razon_social]["141215"]
-        microcredito_d = saldos_current[razon_social]["141220"]
-        microcredito_e = saldos_current[razon_social]["141225"]
-        microcredito_total = saldos_current[razon_social]["141200"]
-        microcredito_deterioro = saldos_current[razon_social]["149300"]
-        denominator_microcredito_ind_mora = (microcredito_a + microcredito_b + microcredito_c + microcredito_d + microcredito_e)
-        microcredito_ind_mora = safe_division((microcredito_b + microcredito_c + microcredito_d + microcredito_e), denominator_microcredito_ind_mora)
-        microcredito_cartera_improductiva = safe_division((microcredito_c + microcredito_d + microcredito_e), denominator_microcredito_ind_mora)
-        denominator_microcredito_porc_cobertura = (microcredito_b + microcredito_c + microcredito_d + microcredito_e)
-        microcredito_porc_cobertura = safe_division(microcredito_deterioro, denominator_microcredito_porc_cobertura)
-
-        #comercioal
-        comercial_a = saldos_current[razon_social]["141005"]
-        comercial_b = saldos_current[razon_social]["141010"]
-        comercial_c = saldos_current[razon_social]["141015"]
-        comercial_d = saldos_current[razon_social]["141020"]
-        comercial_e = saldos_current[razon_social]["141025"]
-        comercial_total = saldos_current[razon_social]["141000"]
-        comercial_deterioro = saldos_current[razon_social]["149500"]
-        denominator_comercial_ind_mora = (comercial_a + comercial_b + comercial_c + comercial_d + comercial_e)
-        comercial_ind_mora = safe_division((comercial_b + comercial_c + comercial_d + comercial_e), denominator_comercial_ind_mora)
-        comercial_cartera_improductiva = safe_division((comercial_c + comercial_d + comercial_e), denominator_comercial_ind_mora)
-        denominator_comercial_porc_cobertura = (comercial_b + comercial_c + comercial_d + comercial_e)
-        comercial_porc_cobertura = safe_division(comercial_deterioro, denominator_comercial_porc_cobertura)
-
-        vivienda_a = saldos_current[razon_social]["140405"] + saldos_current[razon_social]["140410"]
-        vivienda_b = saldos_current[razon_social]["140415"] + saldos_current[razon_social]["140420"]
-        vivienda_c = saldos_current[razon_social]["140425"] + saldos_current[razon_social]["140430"]
-        vivienda_d = saldos_current[razon_social]["140435"] + saldos_current[razon_social]["140440"]
-        vivienda_e = saldos_current[razon_social]["140445"] + saldos_current[razon_social]["140450"]
-        vivienda_total = saldos_current[razon_social]["140400"]
-        vivienda_deterioro = saldos_current[razon_social]["148900"]
-        denominator_vivienda_ind_mora = (vivienda_a + vivienda_b + vivienda_c + vivienda_d + vivienda_e)
-        vivienda_ind_mora = safe_division((vivienda_b + vivienda_c + vivienda_d + vivienda_e), denominator_vivienda_ind_mora)
-        vivienda_cartera_improductiva = safe_division((vivienda_c + vivienda_d + vivienda_e), denominator_vivienda_ind_mora)
-        denominator_vivienda_porc_cobertura = (vivienda_b + vivienda_c + vivienda_d + vivienda_e)
-        vivienda_porc_cobertura = safe_division(vivienda_deterioro, denominator_vivienda_porc_cobertura)
-
-        #EMPLEADOS
-        empleados_a = (saldos_current[razon_social]["141405"] + saldos_current[razon_social]["141430"] + saldos_current[razon_social]["141460"])
-        empleados_b = (saldos_current[razon_social]["141410"] + saldos_current[razon_social]["141435"] + saldos_current[razon_social]["141465"])
-        empleados_c = (saldos_current[razon_social]["141415"] + saldos_current[razon_social]["141440"] + saldos_current[razon_social]["141470"])
-        empleados_d = (saldos_current[razon_social]["141420"] + saldos_current[razon_social]["141445"] + saldos_current[razon_social]["141475"])
-        empleados_e = (saldos_current[razon_social]["141425"] + saldos_current[razon_social]["141450"] + saldos_current[razon_social]["141480"])
-        empleados_total = (saldos_current[razon_social]["141400"])
-        # empleados_deterioro = saldos_current[razon_social]["149100"]
-        empleados_deterioro = saldos_current[razon_social]["148800"]
-        denominator_empleados_ind_mora = (empleados_a + empleados_b + empleados_c + empleados_d + empleados_e)
-        empleados_ind_mora = safe_division((empleados_b + empleados_c + empleados_d + empleados_e), denominator_empleados_ind_mora)
-        empleados_cartera_improductiva = safe_division((empleados_c + empleados_d + empleados_e), denominator_empleados_ind_mora)
-        denominator_empleados_porc_cobertura = (empleados_b + empleados_c + empleados_d + empleados_e)
-        empleados_porc_cobertura = safe_division(empleados_deterioro, denominator_empleados_porc_cobertura)
-        
-        #TOTAL
-        total_a = (consumo_a + microcredito_a + comercial_a + vivienda_a + empleados_a)
-        total_b = (consumo_b + microcredito_b + comercial_b + vivienda_b + empleados_b)
-        total_c = (consumo_c + microcredito_c + comercial_c + vivienda_c + empleados_c)
-        total_d = (consumo_d + microcredito_d + comercial_d + vivienda_d + empleados_d)
-        total_e = (consumo_e + microcredito_e + comercial_e + vivienda_e + empleados_e)
-        total_castigos = saldos_current[razon_social]["812000"]
-        total_total = (consumo_total + microcredito_total + comercial_total + vivienda_total + empleados_total)
-
-        total_deterioro_ind = (consumo_deterioro + microcredito_deterioro + comercial_deterioro + vivienda_deterioro + empleados_deterioro)
-        total_deterioro_gen = saldos_current[razon_social]["149800"]
-        total_deterioro = (total_deterioro_ind + total_deterioro_gen)
-        
-        total_contable = (total_total - total_deterioro)
-
-        denominator_total_ind_mora = (total_a + total_b + total_c + total_d + total_e)
-        # total_ind_mora = (((total_b + total_c + total_d + total_e) / denominator_total_ind_mora) * 100 if denominator_total_ind_mora else 0)
-        total_ind_mora = safe_division((total_b + total_c + total_d + total_e), denominator_total_ind_mora)
-        total_cart_impro = safe_division((total_c + total_d + total_e), denominator_total_ind_mora)
-        denominator_total_porc_cobertura = (total_b + total_c + total_d + total_e)
-        # total_porc_cobertura = ((total_deterioro / denominator_total_porc_cobertura) * 100 if denominator_total_porc_cobertura else 0)
-        total_porc_cobertura = safe_division(total_deterioro, denominator_total_porc_cobertura)
-
-        #DEPOSITO
-        deposito = saldos_current[razon_social]["210000"]
-        # print(deposito)
-        dp_cuenta_corriente = saldos_current[razon_social]["210500"]
-        dp_simple = saldos_current[razon_social]["210600"]
-        dp_certificado_termino = saldos_current[razon_social]["210700"]
-        dp_ahorro = saldos_current[razon_social]["210800"]
-        dp_cuenta_ahorro_especial = saldos_current[razon_social]["210900"]
-        dp_certificado_ahorro_valorReal = saldos_current[razon_social]["211000"]
-        dp_documento_pagar = saldos_current[razon_social]["211100"]
-        dp_cuenta_centralizada = saldos_current[razon_social]["211200"]
-        dp_fondos_cuentas = saldos_current[razon_social]["211300"]
-        dp_cesantias_fondoNacional = saldos_current[razon_social]["211400"]
-        dp_bancos_corresponsales = saldos_current[razon_social]["211500"]
-        dp_especiales = saldos_current[razon_social]["211600"]
-        dp_exigibilidad_servico = saldos_current[razon_social]["211700"]
-        dp_recaudo = saldos_current[razon_social]["211800"]
-        dp_establecimientos_afiliados = saldos_current[razon_social]["211900"]
-        dp_electronicos = saldos_current[razon_social]["212000"]
-        dp_fondos_interbancarios = saldos_current[razon_social]["212200"]
-        dp_fondos_interasociadas = saldos_current[razon_social]["212300"]
-        dp_operaciones_reporto = saldos_current[razon_social]["212400"]
-        dp_operaciones_simultaneas = saldos_current[razon_social]["212500"]
-        dp_operaciones_transferencia = saldos_current[razon_social]["212600"]
-        dp_billetes_circulacion = saldos_current[razon_social]["212700"]
-        dp_pagos_internacionales = saldos_current[razon_social]["212800"]
-        dp_compromisos = saldos_current[razon_social]["212900"]
-        dp_titulos_inversion = saldos_current[razon_social]["213000"]
-        dp_titulo_regulacion_banco = saldos_current[razon_social]["213200"]
-        dp_titulo_regulacion = saldos_current[razon_social]["214600"]
-        dp_operaciones_credito_internas_corto = saldos_current[razon_social]["214700"]
-        dp_operaciones_credito_internas_largo = saldos_current[razon_social]["214800"]
-        dp_operaciones_credito_externas_corto = saldos_current[razon_social]["214900"]
-        dp_operaciones_credito_externas_largo = saldos_current[razon_social]["215000"]
-        dp_operaciones_financiera_internas_corto = saldos_current[razon_social]["215100"]
-        dp_operaciones_financiera_internas_largo = saldos_current[razon_social]["215200"]
-        dp_operaciones_financiera_externas_corto = saldos_current[razon_social]["215300"]
-        dp_operaciones_financiera_externas_largo = saldos_current[razon_social]["215400"]
-        dp_operaciones_conjuntas = saldos_current[razon_social]["215500"]
-        dp_cuentas_canceladas = saldos_current[razon_social]["215600"]
-        dp_operaciones_contratacion = saldos_current[razon_social]["215700"]
-        dp_pasivos_arrendamientos = saldos_current[razon_social]["218000"]
-
-        partc_cuenta_corriente = safe_division(saldos_current[razon_social]["210500"], deposito)
-        partc_simple = safe_division(saldos_current[razon_social]["210600"], deposito)
-        partc_certificado_termino = safe_division(saldos_current[razon_social]["210700"], deposito)
-        partc_ahorro = safe_division(saldos_current[razon_social]["210800"], deposito)
-        partc_cuenta_ahorro_especial = safe_division(saldos_current[razon_social]["210900"], deposito)
-        partc_certificado_ahorro_valorReal = safe_division(saldos_current[razon_social]["211000"], deposito)
-        partc_documento_pagar = safe_division(saldos_current[razon_social]["211100"], deposito)
-        partc_cuenta_centralizada = safe_division(saldos_current[razon_social]["211200"], deposito)
-        partc_fondos_cuentas = safe_division(saldos_current[razon_social]["211300"], deposito)
-        partc_cesantias_fondoNacional = safe_division(saldos_current[razon_social]["211400"], deposito)
-        partc_bancos_corresponsales = safe_division(saldos_current[razon_social]["211500"], deposito)
-        partc_especiales = safe_division(saldos_current[razon_social]["211600"], deposito)
-        partc_exigibilidad_servico = safe_division(saldos_current[razon_social]["211700"], deposito)
-        partc_recaudo = safe_division(saldos_current[razon_social]["211800"], deposito)
-        partc_establecimientos_afiliados = safe_division(saldos_current[razon_social]["211900"], deposito)
-        partc_electronicos = safe_division(saldos_current[razon_social]["212000"], deposito)
-        partc_fondos_interbancarios = safe_division(saldos_current[razon_social]["212200"], deposito)
-        partc_fondos_interasociadas = safe_division(saldos_current[razon_social]["212300"], deposito)
-        partc_operaciones_reporto = safe_division(saldos_current[razon_social]["212400"], deposito)
-        partc_operaciones_simultaneas = safe_division(saldos_current[razon_social]["212500"], deposito)
-        partc_operaciones_transferencia = safe_division(saldos_current[razon_social]["212600"], deposito)
-        partc_billetes_circulacion = safe_division(saldos_current[razon_social]["212700"], deposito)
-        partc_pagos_internacionales = safe_division(saldos_current[razon_social]["212800"], deposito)
-        partc_compromisos = safe_division(saldos_current[razon_social]["212900"], deposito)
-        partc_titulos_inversion = safe_division(saldos_current[razon_social]["213000"], deposito)
-        partc_titulo_regulacion_banco = safe_division(saldos_current[razon_social]["213200"], deposito)
-        partc_titulo_regulacion = safe_division(saldos_current[razon_social]["214600"], deposito)
-        partc_operaciones_credito_internas_corto = safe_division(saldos_current[razon_social]["214700"], deposito)
-        partc_operaciones_credito_internas_largo = safe_division(saldos_current[razon_social]["214800"], deposito)
-        partc_operaciones_credito_externas_corto = safe_division(saldos_current[razon_social]["214900"], deposito)
-        partc_operaciones_credito_externas_largo = safe_division(saldos_current[razon_social]["215000"], deposito)
-        partc_operaciones_financiera_internas_corto = safe_division(saldos_current[razon_social]["215100"], deposito)
-        partc_operaciones_financiera_internas_largo = safe_division(saldos_current[razon_social]["215200"], deposito)
-        partc_operaciones_financiera_externas_corto = safe_division(saldos_current[razon_social]["215300"], deposito)
-        partc_operaciones_financiera_externas_largo = safe_division(saldos_current[razon_social]["215400"], deposito)
-        partc_operaciones_conjuntas = safe_division(saldos_current[razon_social]["215500"], deposito)
-        partc_cuentas_canceladas = safe_division(saldos_current[razon_social]["215600"], deposito)
-        partc_operaciones_contratacion = safe_division(saldos_current[razon_social]["215700"], deposito)
-        partc_pasivos_arrendamientos = safe_division(saldos_current[razon_social]["218000"], deposito)
-
-        dp_total = (
-            partc_cuenta_corriente+partc_simple+partc_certificado_termino+partc_ahorro+partc_cuenta_ahorro_especial+partc_certificado_ahorro_valorReal+partc_documento_pagar+partc_cuenta_centralizada+partc_fondos_cuentas+partc_cesantias_fondoNacional+partc_bancos_corresponsales+partc_especiales+partc_exigibilidad_servico+partc_recaudo+partc_establecimientos_afiliados+partc_electronicos+partc_fondos_interbancarios+partc_fondos_interasociadas+partc_operaciones_reporto+partc_operaciones_simultaneas+partc_operaciones_transferencia+partc_billetes_circulacion+partc_pagos_internacionales+partc_compromisos+partc_titulos_inversion+partc_titulo_regulacion_banco+partc_titulo_regulacion+partc_operaciones_credito_internas_corto+partc_operaciones_credito_internas_largo+partc_operaciones_credito_externas_corto+partc_operaciones_credito_externas_largo+partc_operaciones_financiera_internas_corto+partc_operaciones_financiera_internas_largo+partc_operaciones_financiera_externas_corto+partc_operaciones_financiera_externas_largo+partc_operaciones_conjuntas+partc_cuentas_canceladas+partc_operaciones_contratacion+partc_pasivos_arrendamientos
-        )
-
-        return {
-            "consumoA": consumo_a,
-            "consumoB": consumo_b,
-            "consumoC": consumo_c,
-            "consumoD": consumo_d,
-            "consumoE": consumo_e,
-            "consumoTotal": consumo_total,
-            "consumoIndMora": consumo_ind_mora,
-            "consumoCartImprod": consumo_cartera_improductiva,
-            "consumoDeterioro": consumo_deterioro,
-            "consumoPorcCobertura": consumo_porc_cobertura,
-            "microcreditoA": microcredito_a,
-            "microcreditoB": microcredito_b,
-            "microcreditoC": microcredito_c,
-            "microcreditoD": microcredito_d,
-            "microcreditoE": microcredito_e,
-            "microcreditoTotal": microcredito_total,
-            "microcreditoIndMora": microcredito_ind_mora,
-            "microcreditoCartImprod": microcredito_cartera_improductiva,
-            "microcreditoDeterioro": microcredito_deterioro,
-            "microcreditoPorcCobertura": microcredito_porc_cobertura,
-            "comercialA": comercial_a,
-            "comercialB": comercial_b,
-            "comercialC": comercial_c,
-            "comercialD": comercial_d,
-            "comercialE": comercial_e,
-            "comercialTotal": comercial_total,
-            "comercialIndMora": comercial_ind_mora,
-            "comercialCartImprod": comercial_cartera_improductiva,
-            "comercialDeterioro": comercial_deterioro,
-            "comercialPorcCobertura": comercial_porc_cobertura,
-            "viviendaA": vivienda_a,
-            "viviendaB": vivienda_b,
-            "viviendaC": vivienda_c,
-            "viviendaD": vivienda_d,
-            "viviendaE": vivienda_e,
-            "viviendaTotal": vivienda_total,
-            "viviendaIndMora": vivienda_ind_mora,
-            "viviendaCartImprod": vivienda_cartera_improductiva,
-            "viviendaDeterioro": vivienda_deterioro,
-            "viviendaPorcCobertura": vivienda_porc_cobertura,
-            "empleadosA": empleados_a,
-            "empleadosB": empleados_b,
-            "empleadosC": empleados_c,
-            "empleadosD": empleados_d,
-            "empleadosE": empleados_e,
-            "empleadosTotal": empleados_total,
-            "empleadosIndMora": empleados_ind_mora,
-            "empleadosCartImprod": empleados_cartera_improductiva,
-            "empleadosDeterioro": empleados_deterioro,
-            "empleadosPorcCobertura": empleados_porc_cobertura,
-            "totalA": total_a,
-            "totalB": total_b,
-            "totalC": total_c,
-            "totalD": total_d,
-            "totalE": total_e,
-            "totalTotal": total_total,
-            "totalCastigos": total_castigos,
-            "totalIndMora": total_ind_mora,
-            "totalCartImpro": total_cart_impro,
-            "totalContable": total_contable,
-
-            "totalDeterioroInd": total_deterioro_ind,
-            "totalDeterioroGen": total_deterioro_gen,
-            "totalDeterioro": total_deterioro,
-            "totalPorcCobertura": total_porc_cobertura,
-
-            "deposito": deposito,
-            "depositoAhorro": dp_ahorro, #2108
-            "particionAhorro": partc_ahorro, #2108
-            "depositoAhorroTermino": dp_certificado_termino, #2107
-            "particionAhorroTermino": partc_certificado_termino, #2107
-
-            "depositoCuentaCorriente": dp_cuenta_corriente, #2105
-            "particionCuentaCorriente": partc_cuenta_corriente, #2105
-            "depositoSimple": dp_simple, #2106
-            "particionSimple": partc_simple, #2106
-            "depositoCuentaAhorroEspecial": dp_cuenta_ahorro_especial, #2109
-            "particionCuentaAhorroEspecial": partc_cuenta_ahorro_especial, #2109
-            "depositoCertificadoAhorroValorReal": dp_certificado_ahorro_valorReal, #2110
-            "particionCertificadoAhorroValorReal": partc_certificado_ahorro_valorReal, #2110
-            "depositoDocumentoPagar": dp_documento_pagar, #2111
-            "particionDocumentoPagar": partc_documento_pagar, #2111
-            "depositoCuentaCentralizada": dp_cuenta_centralizada, #2112
-            "particionCuentaCentralizada": partc_cuenta_centralizada, #2112
-            "depositoFondosCuentas": dp_fondos_cuentas, #2113
-            "particionFondosCuentas": partc_fondos_cuentas, #2113
-            "depositoCesantiasFondoNacional": dp_cesantias_fondoNacional, #2114
-            "particionCesantiasFondoNacional": partc_cesantias_fondoNacional, #2114
-            "depositoBancosCorresponsales": dp_bancos_corresponsales, #2115
-            "particionBancosCorresponsales": partc_bancos_corresponsales, #2115
-            "depositoEspeciales": dp_especiales, #2116
-            "particionEspeciales": partc_especiales, #2116
-            "depositoExigibilidadServico": dp_exigibilidad_servico, #2117
-            "particionExigibilidadServico": partc_exigibilidad_servico, #2117
-            "depositoRecaudo": dp_recaudo, #2118
-            "particionRecaudo": partc_recaudo, #2118
-            "depositoEstablecimientosAfiliados": dp_establecimientos_afiliados, #2119
-            "particionEstablecimientosAfiliados": partc_establecimientos_afiliados, #2119
-            "depositoElectronicos": dp_electronicos, #2120
-            "particionElectronicos": partc_electronicos, #2120
-            "depositoFondosInterbancarios": dp_fondos_interbancarios, #2122
-            "particionFondosInterbancarios": partc_fondos_interbancarios, #2122
-            "depositoFondosInterasociadas": dp_fondos_interasociadas, #2123
-            "particionFondosInterasociadas": partc_fondos_interasociadas, #2123
-            "depositoOperacionesReporto": dp_operaciones_reporto, #2124
-            "particionOperacionesReporto": partc_operaciones_reporto, #2124
-            "depositoOperacionesSimultaneas": dp_operaciones_simultaneas, #2125
-            "particionOperacionesSimultaneas": partc_operaciones_simultaneas, #2125
-            "depositoOperacionesTransferencia": dp_operaciones_transferencia, #2126
-            "particionOperacionesTransferencia": partc_operaciones_transferencia, #2126
-            "depositoBilletesCirculacion": dp_billetes_circulacion, #2127
-            "particionBilletesCirculacion": partc_billetes_circulacion, #2127
-            "depositoPagosInternacionales": dp_pagos_internacionales, #2128
-            "particionPagosInternacionales": partc_pagos_internacionales, #2128
-            "depositoCompromisos": dp_compromisos, #2129
-            "particionCompromisos": partc_compromisos, #2129
-            "depositoTitulosInversion": dp_titulos_inversion, #2130
-            "particionTitulosInversion": partc_titulos_inversion, #2130
-            "depositoTituloRegulacionBanco": dp_titulo_regulacion_banco, #2132
-            "particionTituloRegulacionBanco": partc_titulo_regulacion_banco, #2132
-            "depositoTituloRegulacion": dp_titulo_regulacion, #2146
-            "particionTituloRegulacion": partc_titulo_regulacion, #2146
-            "depositoOperacionesCreditoInternasCorto": dp_operaciones_credito_internas_corto, #2147
-            "particionOperacionesCreditoInternasCorto": partc_operaciones_credito_internas_corto, #2147
-            "depositoOperacionesCreditoInternasLargo": dp_operaciones_credito_internas_largo, #2148
-            "particionOperacionesCreditoInternasLargo": partc_operaciones_credito_internas_largo, #2148
-            "depositoOperacionesCreditoExternasCorto": dp_operaciones_credito_externas_corto, #2149
-            "particionOperacionesCreditoExternasCorto": partc_operaciones_credito_externas_corto, #2149
-            "depositoOperacionesCreditoExternasLargo": dp_operaciones_credito_externas_largo, #2150
-            "particionOperacionesCreditoExternasLargo": partc_operaciones_credito_externas_largo, #2150
-            "depositoOperacionesFinancieraInternasCorto": dp_operaciones_financiera_internas_corto, #2151
-            "particionOperacionesFinancieraInternasCorto": partc_operaciones_financiera_internas_corto, #2151
-            "depositoOperacionesFinancieraInternasLargo": dp_operaciones_financiera_internas_largo, #2152
-            "particionOperacionesFinancieraInternasLargo": partc_operaciones_financiera_internas_largo, #2152
-            "depositoOperacionesFinancieraExternasCorto": dp_operaciones_financiera_externas_corto, #2153
-            "particionOperacionesFinancieraExternasCorto": partc_operaciones_financiera_externas_corto, #2153
-            "depositoOperacionesFinancieraExternasLargo": dp_operaciones_financiera_externas_largo, #2154
-            "particionOperacionesFinancieraExternasLargo": partc_operaciones_financiera_externas_largo, #2154
-            "depositoOperacionesConjuntas": dp_operaciones_conjuntas, #2155
-            "particionOperacionesConjuntas": partc_operaciones_conjuntas, #2155
-            "depositoCuentasCanceladas": dp_cuentas_canceladas, #2156
-            "particionCuentasCanceladas": partc_cuentas_canceladas, #2156
-            "depositoOperacionesContratacion": dp_operaciones_contratacion, #2157
-            "particionOperacionesContratacion": partc_operaciones_contratacion, #2157
-            "depositoPasivosArrendamientos": dp_pasivos_arrendamientos, #2180
-            "particionPasivosArrendamientos": partc_pasivos_arrendamientos, #2180
-
-            "depositoPorcentajeTotal": dp_total
-        }
-
 class BalSupApiViewBalanceCuenta(APIView):
     def post(self, request):
         data = request.data
         results = []
-        baseUrl_entidadesFinanciera = "https://www.datos.gov.co/resource/mxk5-ce6w.json?$limit=500000"
 
         entidades_financieras = data.get("entidad", {}).get("superfinanciera", [])
         periodo = data.get("año")
@@ -854,23 +494,17 @@ class BalSupApiViewBalanceCuenta(APIView):
         pucCodigo = data.get("pucCodigo")
         pucName = data.get("pucName")
 
-        fecha1 = datetime(periodo, mes, 1)
-        fecha2 = (fecha1 + timedelta(days=31)).replace(day=1) - timedelta(days=1)
-        fecha1_str = fecha1.strftime("%Y-%m-%dT00:00:00")
-        fecha2_str = fecha2.strftime("%Y-%m-%dT23:59:59")
-
         def obtener_saldos_api():
-            url_financiera = f"{baseUrl_entidadesFinanciera}&$where=fecha_corte BETWEEN '{fecha1_str}' AND '{fecha2_str}' AND cuenta ='{pucCodigo}' AND moneda ='0'"
-            response_financiera = requests.get(url_financiera)
-
-            if response_financiera.status_code == 200:
-                all_data = response_financiera.json()
-                for result in all_data:
-                    razon_social = result.get("nombre_entidad")
-                    total_saldo = Decimal(result.get("valor", 0))
-                    yield razon_social, total_saldo
-            else:
+            entidades = [nit_info.get("RazonSocial") for nit_info in entidades_financieras]
+            if not entidades:
+                return
+            try:
+                saldos_mes = consultar_saldos_api([(periodo, mes)], [pucCodigo], entidades)[(periodo, mes)]
+            except requests.HTTPError:
                 print("No data fetched from API.")
+                return
+            for razon_social, cuentas in saldos_mes.items():
+                yield razon_social, cuentas[pucCodigo]
 
         def obtener_saldos_db():
             for nit_info in entidades_financieras:
@@ -884,11 +518,16 @@ class BalSupApiViewBalanceCuenta(APIView):
 
         saldos_current = defaultdict(Decimal)
 
-        for razon_social, total_saldo in obtener_saldos_api():
-            saldos_current[razon_social] += total_saldo
+        registros_locales = obtener_registros_locales(periodo, mes, [pucCodigo])
+        if registros_locales is not None:
+            for result in registros_locales:
+                saldos_current[result["nombre_entidad"]] += result["valor"]
+        else:
+            for razon_social, total_saldo in obtener_saldos_api():
+                saldos_current[razon_social] += total_saldo
 
-        for razon_social, total_saldo in obtener_saldos_db():
-            saldos_current[razon_social] += total_saldo
+            for razon_social, total_saldo in obtener_saldos_db():
+                saldos_current[razon_social] += total_saldo
 
         def formatear_resultados():
             for nit_info in entidades_financieras:
@@ -918,7 +557,6 @@ class BalSupApiViewBalanceIndependiente(APIView):
         data = request.data
 
         results = []
-        baseUrl_entidadesFinanciera = "https://www.datos.gov.co/resource/mxk5-ce6w.json?$limit=500000"
         entidad_financiera = data.get("entidad", {}).get("superfinanciera", [])
 
         periodo = data.get("año")
@@ -929,25 +567,30 @@ class BalSupApiViewBalanceIndependiente(APIView):
         Razon_Social = entidad_financiera[0].get("RazonSocial")
 
         def obtener_saldos_api():
-            url_financiera = f"{baseUrl_entidadesFinanciera}&$where=fecha_corte BETWEEN '{fecha1_str}' AND '{fecha2_str}' AND nombre_entidad = '{Razon_Social}' AND moneda = '0'"
-            response_financiera = requests.get(url_financiera)
-            if response_financiera.status_code == 200:
-                all_data = response_financiera.json()
-                if all_data: 
-                    for result in all_data:
-                        razon_social = result.get("nombre_entidad")
-                        cuenta = result.get("cuenta")
-                        nombreCuenta = result.get("nombre_cuenta")
-                        valor = Decimal(result.get("valor", 0))
-                        yield {
-                            "razon_social": razon_social,
-                            "cuenta": cuenta,
-                            "nombreCuenta": nombreCuenta,
-                            "valor": valor
-                        }
-            else:
-                print(f"Error al obtener datos de la API. Status code: {response_financiera.status_code}")
-            return []  
+            consulta = (
+                ConsultaSoQL()
+                .select("nombre_entidad", "cuenta", "nombre_cuenta", "valor")
+                .entre("fecha_corte", fecha1_str, fecha2_str)
+                .igual("nombre_entidad", Razon_Social)
+                .igual("moneda", "0")
+                .limit(500000)
+            )
+            try:
+                all_data = get_json(BASE_URL_FINANCIERA, params=consulta.params())
+            except requests.HTTPError as e:
+                print(f"Error al obtener datos de la API. Status code: {e.response.status_code}")
+                return
+            for result in all_data:
+                razon_social = result.get("nombre_entidad")
+                cuenta = result.get("cuenta")
+                nombreCuenta = result.get("nombre_cuenta")
+                valor = Decimal(result.get("valor", 0))
+                yield {
+                    "razon_social": razon_social,
+                    "cuenta": cuenta,
+                    "nombreCuenta": nombreCuenta,
+                    "valor": valor
+                }
 
         def obtener_saldos_db():
             for nit_info in entidad_financiera:
@@ -956,8 +599,7 @@ class BalSupApiViewBalanceIndependiente(APIView):
                 query_results_current = BalSupModel.objects.filter(q_current_period).values("entidad_RS", "puc_codigo", "saldo")
 
                 for result in query_results_current:
-                    nombreCuenta = PucSupModel.objects.filter(Codigo=result["puc_codigo"]).first()
-                    nombreCuenta = nombreCuenta.Descripcion if nombreCuenta else "Cuenta no encontrada"
+                    nombreCuenta = catalogo_puc.descripcion(result["puc_codigo"])
 
                     yield {
                         "razon_social": razon_social,
@@ -968,8 +610,13 @@ class BalSupApiViewBalanceIndependiente(APIView):
 
         saldos_current = defaultdict(lambda: {"saldo": Decimal(0), "nombreCuenta": ""})
 
-        api_data = list(obtener_saldos_api())
-        if api_data:
+        registros_locales = obtener_registros_locales(periodo, mes, entidades=[Razon_Social])
+        api_data = list(obtener_saldos_api()) if registros_locales is None else []
+        if registros_locales is not None:
+            for result in registros_locales:
+                saldos_current[result["cuenta"]]["saldo"] = Decimal(result["valor"])
+                saldos_current[result["cuenta"]]["nombreCuenta"] = catalogo_puc.descripcion(result["cuenta"])
+        elif api_data:
             for saldo in api_data:
                 saldos_current[saldo["cuenta"]]["saldo"] = saldo["valor"]
                 saldos_current[saldo["cuenta"]]["nombreCuenta"] = saldo["nombreCuenta"]
@@ -0,0 +1,39 @@
+import time
+import threading
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+# Catálogo Codigo -> Descripcion en memoria de una tabla PUC. Se carga con una sola
+# consulta y se invalida con las señales de escritura del modelo; el TTL cubre las
+# escrituras hechas desde otro worker.
+
+CATALOGO_TTL = getattr(settings, "PUC_CATALOGO_TTL", 600)
+
+class Catalogo:
+    def __init__(self, modelo, orden=()):
+        """orden decide qué fila queda cuando un código se repite (la última)."""
+        self.modelo = modelo
+        self.orden = orden
+        self.catalogo = None
+        self.cargado_en = 0.0
+        self.lock = threading.Lock()
+        post_save.connect(self.invalidar_por_senal, sender=modelo, weak=False)
+        post_delete.connect(self.invalidar_por_senal, sender=modelo, weak=False)
+
+    def descripciones(self):
+        with self.lock:
+            if self.catalogo is None or time.monotonic() - self.cargado_en > CATALOGO_TTL:
+                self.catalogo = dict(self.modelo.objects.order_by(*self.orden).values_list("Codigo", "Descripcion"))
+                self.cargado_en = time.monotonic()
+            return self.catalogo
+
+    def descripcion(self, codigo, defecto="Cuenta no encontrada"):
+        return self.descripciones().get(str(codigo), defecto)
+
+    def invalidar(self):
+        with self.lock:
+            self.catalogo = None
+
+    def invalidar_por_senal(self, sender, **kwargs):
+        self.invalidar()
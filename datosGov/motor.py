@@ -0,0 +1,224 @@
+import time
+import queue
+import asyncio
+import threading
+import backoff
+import httpx
+import requests
+
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import close_old_connections
+
+# Motor HTTP compartido por todas las vistas. Un único httpx.AsyncClient vive en
+# un event loop propio (un hilo por proceso) con conexiones keep-alive, un límite
+# global de solicitudes simultáneas hacia datos.gov.co y un espaciado mínimo por
+# host. El código síncrono lo usa con get() o iterar_bytes(); el asíncrono con
+# ejecutar(), o con esperar_en_motor()/get_async() desde otro event loop (las vistas
+# async bajo ASGI) sin ocupar un hilo por solicitud.
+# Las vistas reparten sus bloques con ejecutar_en_paralelo en un único pool
+# acotado en lugar de crear un ThreadPoolExecutor por solicitud.
+
+MAX_CONEXIONES = getattr(settings, "DATOS_GOV_MAX_CONEXIONES", 20)
+MAX_CONCURRENCIA = getattr(settings, "DATOS_GOV_MAX_CONCURRENCIA", 8)
+SOLICITUDES_POR_SEGUNDO = getattr(settings, "DATOS_GOV_SOLICITUDES_POR_SEGUNDO", 10)
+MAX_WORKERS = getattr(settings, "DATOS_GOV_MAX_WORKERS", 16)
+MAX_INTENTOS = 5
+TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+ESTADOS_REINTENTABLES = (429, 500, 502, 503, 504)
+BLOQUES_EN_COLA = 16
+
+def convertir_timeout(timeout):
+    """Acepta los timeouts al estilo de requests: número, (connect, read) o None."""
+    if timeout is None:
+        return TIMEOUT
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+def no_reintentable(e):
+    return isinstance(e, httpx.HTTPStatusError) and e.response.status_code not in ESTADOS_REINTENTABLES
+
+async def poner(cola, valor):
+    """put en una queue.Queue acotada sin bloquear el event loop."""
+    while True:
+        try:
+            cola.put_nowait(valor)
+            return
+        except queue.Full:
+            await asyncio.sleep(0.005)
+
+class LimitadorHost:
+    """Espacia las solicitudes a un mismo host para no superar el ritmo configurado."""
+
+    def __init__(self, por_segundo):
+        self.intervalo = 1 / por_segundo
+        self.siguiente = 0.0
+        self.lock = asyncio.Lock()
+
+    async def esperar(self):
+        async with self.lock:
+            ahora = time.monotonic()
+            espera = self.siguiente - ahora
+            self.siguiente = max(ahora, self.siguiente) + self.intervalo
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+class MotorDatosGov:
+    def __init__(self):
+        self.loop = None
+        self.client = None
+        self.semaforo = None
+        self.limitadores = {}
+        self.lock = threading.Lock()
+
+    def iniciar(self):
+        with self.lock:
+            if self.loop is not None:
+                return self.loop
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="datos-gov", daemon=True).start()
+            asyncio.run_coroutine_threadsafe(self.crear_cliente(), loop).result()
+            self.loop = loop
+            return loop
+
+    async def crear_cliente(self):
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=MAX_CONEXIONES, max_keepalive_connections=MAX_CONEXIONES),
+            timeout=TIMEOUT,
+        )
+        self.semaforo = asyncio.Semaphore(MAX_CONCURRENCIA)
+
+    def limitador(self, host):
+        if host not in self.limitadores:
+            self.limitadores[host] = LimitadorHost(SOLICITUDES_POR_SEGUNDO)
+        return self.limitadores[host]
+
+    @backoff.on_exception(backoff.expo, (httpx.TransportError, httpx.HTTPStatusError), max_tries=MAX_INTENTOS, giveup=no_reintentable)
+    async def get(self, url, params=None, timeout=None):
+        """GET desde el event loop del motor. Sólo debe esperarse dentro de ese loop."""
+        async with self.semaforo:
+            await self.limitador(urlsplit(url).netloc).esperar()
+            response = await self.client.get(url, params=params, timeout=convertir_timeout(timeout))
+            response.raise_for_status()
+            return response
+
+    @backoff.on_exception(backoff.expo, (httpx.TransportError, httpx.HTTPStatusError), max_tries=MAX_INTENTOS, giveup=no_reintentable)
+    async def abrir(self, url, params=None, timeout=None):
+        """Abre la respuesta sin leer el cuerpo. Sólo se reintenta hasta este punto:
+        una vez entregados bloques, reintentar duplicaría datos."""
+        await self.limitador(urlsplit(url).netloc).esperar()
+        request = self.client.build_request("GET", url, params=params, timeout=convertir_timeout(timeout))
+        response = await self.client.send(request, stream=True)
+        if response.is_error:
+            await response.aclose()
+            response.raise_for_status()
+        return response
+
+    async def transmitir(self, url, params, timeout, cola):
+        """Pasa el cuerpo de la respuesta a cola por bloques; la cola acotada frena la
+        descarga cuando el consumidor va más lento."""
+        cancelado = False
+        try:
+            async with self.semaforo:
+                response = await self.abrir(url, params=params, timeout=timeout)
+                try:
+                    async for bloque in response.aiter_bytes():
+                        await poner(cola, bloque)
+                finally:
+                    await response.aclose()
+        except asyncio.CancelledError:
+            cancelado = True
+            raise
+        finally:
+            if not cancelado:
+                await poner(cola, None)
+
+motor = MotorDatosGov()
+
+def ejecutar(coro):
+    """Corre una corrutina en el loop del motor y espera su resultado."""
+    return asyncio.run_coroutine_threadsafe(coro, motor.iniciar()).result()
+
+async def esperar_en_motor(coro):
+    """Espera desde otro event loop una corrutina que corre en el loop del motor."""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, motor.iniciar()))
+
+@contextmanager
+def errores_requests():
+    """Traduce los errores de httpx a los de requests para que los llamadores
+    existentes sigan capturando requests.RequestException."""
+    try:
+        yield
+    except httpx.HTTPStatusError as e:
+        raise requests.HTTPError(str(e), response=e.response) from e
+    except httpx.TimeoutException as e:
+        raise requests.exceptions.Timeout(str(e)) from e
+    except httpx.RequestError as e:
+        raise requests.exceptions.ConnectionError(str(e)) from e
+
+def get(url, params=None, timeout=None):
+    """GET síncrono a través del motor."""
+    with errores_requests():
+        return ejecutar(motor.get(url, params=params, timeout=timeout))
+
+async def get_async(url, params=None, timeout=None):
+    """get() para vistas async: mismas excepciones, sin bloquear el event loop."""
+    with errores_requests():
+        return await esperar_en_motor(motor.get(url, params=params, timeout=timeout))
+
+def iterar_bytes(url, params=None, timeout=None):
+    """GET síncrono que entrega el cuerpo por bloques a medida que llega, sin
+    guardar la respuesta completa en memoria."""
+    cola = queue.Queue(maxsize=BLOQUES_EN_COLA)
+    future = asyncio.run_coroutine_threadsafe(motor.transmitir(url, params, timeout, cola), motor.iniciar())
+    try:
+        while True:
+            bloque = cola.get()
+            if bloque is None:
+                break
+            yield bloque
+        with errores_requests():
+            future.result()
+    finally:
+        if not future.done():
+            future.cancel()
+
+ejecutor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="reportes")
+hilo_ejecutor = threading.local()
+
+def ejecutar_tarea(funcion, item, args):
+    hilo_ejecutor.activo = True
+    close_old_connections()
+    try:
+        return funcion(item, *args)
+    finally:
+        close_old_connections()
+
+def ejecutar_en_paralelo(funcion, items, *args):
+    """Aplica funcion(item, *args) a cada item en el pool compartido y devuelve los
+    resultados en el orden de items. Dentro del propio pool corre en serie para no
+    agotarlo con tareas anidadas."""
+    if getattr(hilo_ejecutor, "activo", False):
+        return [funcion(item, *args) for item in items]
+    futures = [ejecutor.submit(ejecutar_tarea, funcion, item, args) for item in items]
+    return [future.result() for future in futures]
+
+def completados_en_paralelo(funcion, items, *args):
+    """Como ejecutar_en_paralelo, pero va entregando (indice, resultado) a medida que
+    terminan las tareas, sin esperar a la más lenta."""
+    if getattr(hilo_ejecutor, "activo", False):
+        for indice, item in enumerate(items):
+            yield indice, funcion(item, *args)
+        return
+    futures = {ejecutor.submit(ejecutar_tarea, funcion, item, args): indice for indice, item in enumerate(items)}
+    try:
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,470 @@
+import json
+import time
+import asyncio
+import uuid
+import codecs
+import hashlib
+import threading
+import requests
+
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+from datosGov import motor
+from datosGov.soql import planear_bloques
+
+# Consultas a datos.gov.co (Socrata) con caché de resultados y "single-flight":
+# mientras una consulta está en curso, las solicitudes idénticas del mismo
+# proceso esperan su resultado, y las de otros workers lo esperan en la caché
+# compartida ("datos_gov" en CACHES) en lugar de repetir la descarga.
+# Los resultados se comparten entre solicitudes: no deben modificarse.
+# Para respuestas grandes, agregar_json lee los registros a medida que llegan y
+# guarda en caché sólo el agregado, no la respuesta. Las consultas sin $group
+# que pueden devolver muchas filas se paginan con paginar: count(*) primero y
+# luego las páginas ($limit/$offset) en paralelo. Las consultas con listas IN
+# largas se parten por longitud de URL y los bloques se descargan a la vez con
+# agregar_json_en_bloques.
+# Las vistas async usan get_json_async/get_json_paginado_async: comparten la
+# caché, las consultas en curso y el motor con las síncronas, pero esperan en su
+# propio event loop en lugar de bloquear un hilo.
+
+CACHE_TTL = getattr(settings, "DATOS_GOV_CACHE_TTL", 3600)
+CACHE_MAX_BYTES = getattr(settings, "DATOS_GOV_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+CACHE_MAX_BYTES_COMPARTIDA = getattr(settings, "DATOS_GOV_CACHE_MAX_BYTES_COMPARTIDA", 8 * 1024 * 1024)
+TAMANO_PAGINA = getattr(settings, "DATOS_GOV_TAMANO_PAGINA", 50000)
+PAGINAS_SIMULTANEAS = getattr(settings, "DATOS_GOV_PAGINAS_SIMULTANEAS", 4)
+ESPERA_MAXIMA = 300
+INTERVALO_ESPERA = 0.5
+
+WORKER_ID = uuid.uuid4().hex
+
+class CacheLocal:
+    """LRU en memoria con TTL y límite por tamaño de la respuesta en bytes."""
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entradas = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, clave):
+        with self.lock:
+            entrada = self.entradas.get(clave)
+            if entrada is None:
+                return None
+            expira, tamano, valor = entrada
+            if expira < time.monotonic():
+                self.eliminar(clave)
+                return None
+            self.entradas.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor, tamano):
+        if tamano > self.max_bytes:
+            return
+        with self.lock:
+            if clave in self.entradas:
+                self.eliminar(clave)
+            self.entradas[clave] = (time.monotonic() + self.ttl, tamano, valor)
+            self.total_bytes += tamano
+            while self.total_bytes > self.max_bytes:
+                self.eliminar(next(iter(self.entradas)))
+
+    def eliminar(self, clave):
+        _, tamano, _ = self.entradas.pop(clave)
+        self.total_bytes -= tamano
+
+    def clear(self):
+        with self.lock:
+            self.entradas.clear()
+            self.total_bytes = 0
+
+class Contador:
+    """Bytes recibidos en una descarga. El tamaño de una entrada de caché se mide con
+    lo que llegó por la red, no serializando otra vez el resultado."""
+
+    def __init__(self):
+        self.bytes = 0
+
+def tamano_aproximado(valor):
+    """Tamaño aproximado de un agregado (dicts, listas y escalares) sin serializarlo."""
+    if isinstance(valor, dict):
+        return 2 + sum(tamano_aproximado(clave) + tamano_aproximado(item) for clave, item in valor.items())
+    if isinstance(valor, (list, tuple, set)):
+        return 2 + sum(tamano_aproximado(item) for item in valor)
+    if isinstance(valor, str):
+        return 2 + len(valor)
+    return 8
+
+class Vuelo:
+    """Consulta en curso. Los que llegan después esperan future: con result() desde
+    un hilo o con await asyncio.wrap_future(...) desde un event loop."""
+
+    def __init__(self):
+        self.future = Future()
+
+cache_local = CacheLocal(CACHE_MAX_BYTES, CACHE_TTL)
+vuelos = {}
+vuelos_lock = threading.Lock()
+
+def normalizar_consulta(url, params=None):
+    """URL canónica de la consulta: parámetros ordenados y espacios colapsados, de modo
+    que la misma consulta escrita de dos formas comparta la entrada de caché."""
+    partes = urlsplit(url)
+    consulta = parse_qsl(partes.query, keep_blank_values=True) + list((params or {}).items())
+    consulta = sorted((clave, " ".join(str(valor).split())) for clave, valor in consulta)
+    return f"{partes.scheme}://{partes.netloc}{partes.path}?{urlencode(consulta)}"
+
+def cache_compartida():
+    try:
+        return caches["datos_gov"]
+    except InvalidCacheBackendError:
+        return None
+
+def leer_compartida(clave):
+    cache = cache_compartida()
+    if cache is None:
+        return None
+    try:
+        return cache.get(clave)
+    except Exception as e:
+        print(f"DATOS GOV caché compartida no disponible: {e}")
+        return None
+
+def leer_resultado_compartido(clave):
+    """(resultado, tamaño) guardado por descargar_coordinado, o None."""
+    entrada = leer_compartida(clave)
+    return entrada if isinstance(entrada, tuple) else None
+
+def descargar(url, params, timeout):
+    response = motor.get(url, params=params, timeout=timeout)
+    return response.json(), len(response.content)
+
+def iterar_registros(url, params=None, timeout=None, contador=None):
+    """Registros de un arreglo JSON decodificados a medida que llega la respuesta:
+    en memoria sólo queda el bloque en curso. contador acumula los bytes leídos."""
+    decodificador = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    texto = ""
+    inicio = False
+    fin = False
+    for bloque in motor.iterar_bytes(url, params=params, timeout=timeout):
+        if contador is not None:
+            contador.bytes += len(bloque)
+        texto += utf8.decode(bloque)
+        pos = 0
+        while not fin:
+            while pos < len(texto) and texto[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(texto):
+                break
+            if not inicio:
+                if texto[pos] != "[":
+                    raise ValueError("Se esperaba un arreglo JSON")
+                inicio = True
+                pos += 1
+                continue
+            if texto[pos] == "]":
+                fin = True
+                break
+            try:
+                registro, pos = decodificador.raw_decode(texto, pos)
+            except json.JSONDecodeError:
+                break
+            yield registro
+        texto = texto[pos:]
+    texto += utf8.decode(b"", final=True)
+    if not fin or texto.strip() != "]":
+        raise ValueError("Respuesta JSON incompleta")
+
+def consulta_conteo(params):
+    conteo = {"$select": "count(*) AS total"}
+    if params.get("$where"):
+        conteo["$where"] = params["$where"]
+    return conteo
+
+def planear_paginas(params, total, tamano_pagina):
+    """Parámetros de cada página. $limit, si viene, acota el total; sin $order
+    explícito se ordena por :id para que las páginas no se solapen."""
+    if params.get("$limit") is not None:
+        total = min(total, int(params["$limit"]))
+    base = {clave: valor for clave, valor in params.items() if clave not in ("$limit", "$offset")}
+    base.setdefault("$order", ":id")
+    return [
+        {**base, "$limit": min(tamano_pagina, total - offset), "$offset": offset}
+        for offset in range(0, total, tamano_pagina)
+    ]
+
+async def contar_async(url, params, timeout=None):
+    response = await motor.motor.get(url, params=consulta_conteo(params), timeout=timeout)
+    filas = response.json()
+    return int(filas[0].get("total", 0)) if filas else 0
+
+async def paginar_async(url, params, tamano_pagina=TAMANO_PAGINA, timeout=None, contador=None):
+    """Versión para el event loop del motor: todas las páginas, en orden de $offset.
+    La concurrencia la acota el semáforo del motor."""
+    total = await contar_async(url, params, timeout)
+    respuestas = await asyncio.gather(*(
+        motor.motor.get(url, params=pagina, timeout=timeout)
+        for pagina in planear_paginas(params, total, tamano_pagina)
+    ))
+    if contador is not None:
+        contador.bytes += sum(len(response.content) for response in respuestas)
+    return [response.json() for response in respuestas]
+
+def paginar(url, params, tamano_pagina=TAMANO_PAGINA, timeout=None, contador=None):
+    """Entrega las páginas de una consulta sin $group en orden de $offset, con hasta
+    PAGINAS_SIMULTANEAS descargas en curso mientras el llamador procesa. contador
+    acumula los bytes de las respuestas."""
+    with motor.errores_requests():
+        total = motor.ejecutar(contar_async(url, params, timeout))
+    loop = motor.motor.iniciar()
+    pendientes = deque()
+    try:
+        for pagina in planear_paginas(params, total, tamano_pagina):
+            pendientes.append(asyncio.run_coroutine_threadsafe(motor.motor.get(url, params=pagina, timeout=timeout), loop))
+            if len(pendientes) >= PAGINAS_SIMULTANEAS:
+                yield leer_pagina(pendientes.popleft(), contador)
+        while pendientes:
+            yield leer_pagina(pendientes.popleft(), contador)
+    finally:
+        for future in pendientes:
+            future.cancel()
+
+def leer_pagina(future, contador=None):
+    with motor.errores_requests():
+        response = future.result()
+    if contador is not None:
+        contador.bytes += len(response.content)
+    return response.json()
+
+def descargar_coordinado(clave, descarga):
+    """Descarga una sola vez entre workers: el primero que toma el candado descarga
+    y publica; los demás esperan el resultado en la caché compartida."""
+    cache = cache_compartida()
+    clave_candado = f"{clave}:candado"
+    try:
+        tiene_candado = cache is None or cache.add(clave_candado, WORKER_ID, ESPERA_MAXIMA)
+    except Exception as e:
+        print(f"DATOS GOV caché compartida no disponible: {e}")
+        cache, tiene_candado = None, True
+
+    if not tiene_candado:
+        limite = time.monotonic() + ESPERA_MAXIMA
+        while time.monotonic() < limite:
+            time.sleep(INTERVALO_ESPERA)
+            entrada = leer_resultado_compartido(clave)
+            if entrada is not None:
+                return entrada
+            if leer_compartida(clave_candado) is None:
+                break
+
+    try:
+        resultado, tamano = descarga()
+        if cache is not None and tamano <= CACHE_MAX_BYTES_COMPARTIDA:
+            try:
+                cache.set(clave, (resultado, tamano), CACHE_TTL)
+            except Exception as e:
+                print(f"DATOS GOV no se pudo guardar en la caché compartida: {e}")
+        return resultado, tamano
+    finally:
+        if cache is not None and tiene_candado:
+            try:
+                cache.delete(clave_candado)
+            except Exception as e:
+                print(f"DATOS GOV no se pudo liberar el candado: {e}")
+
+def clave_consulta(url, params):
+    return "datos_gov:" + hashlib.sha1(normalizar_consulta(url, params).encode()).hexdigest()
+
+def get_json(url, params=None, timeout=None):
+    """GET a datos.gov.co con caché y coalescencia de consultas idénticas. Lanza las
+    mismas excepciones de requests que requests.get + raise_for_status (ver motor.get)."""
+    return consultar(clave_consulta(url, params), lambda: descargar(url, params, timeout))
+
+def get_json_paginado(url, params, timeout=None):
+    """get_json para consultas grandes sin $group: descarga con paginar."""
+    def descarga():
+        contador = Contador()
+        resultado = [registro for pagina in paginar(url, params, timeout=timeout, contador=contador) for registro in pagina]
+        return resultado, contador.bytes
+
+    return consultar(f"{clave_consulta(url, params)}:paginado", descarga)
+
+def agregar_json(url, params, reductor, timeout=None, paginado=False):
+    """Como get_json, pero pasa los registros a reductor(registros) a medida que se
+    decodifican y cachea lo que devuelve. reductor debe ser una función de módulo
+    (su nombre forma parte de la clave) y devolver estructuras serializables. Con
+    paginado=True los registros llegan de paginar en lugar de una sola respuesta."""
+    clave = f"{clave_consulta(url, params)}:{reductor.__module__}.{reductor.__qualname__}"
+
+    def descarga():
+        if paginado:
+            registros = (registro for pagina in paginar(url, params, timeout=timeout) for registro in pagina)
+        else:
+            registros = iterar_registros(url, params=params, timeout=timeout)
+        # Se guarda el agregado, no la respuesta: se mide lo que ocupa él.
+        resultado = reductor(registros)
+        return resultado, tamano_aproximado(resultado)
+
+    return consultar(clave, descarga)
+
+# Pool propio para los bloques: sus tareas sólo esperan al motor y nunca encolan
+# otras, así que se puede usar también desde los hilos de ejecutar_en_paralelo.
+ejecutor_bloques = ThreadPoolExecutor(max_workers=motor.MAX_CONCURRENCIA, thread_name_prefix="datos_gov_bloques")
+
+def agregar_json_en_bloques(url, construir, listas, reductor, timeout=None, paginado=False, omitir_errores=False):
+    """agregar_json para consultas con listas IN que pueden no caber en una URL.
+    planear_bloques parte las listas ({nombre: valores}, ver construir allí) y los
+    bloques se consultan a la vez. Devuelve el agregado de cada bloque en el orden
+    del plan. Con omitir_errores los bloques que fallan se informan y quedan en None,
+    para que el llamador sepa que el resultado está incompleto."""
+    bloques = planear_bloques(url, construir, listas)
+
+    def agregar_bloque(params):
+        try:
+            return agregar_json(url, params, reductor, timeout=timeout, paginado=paginado)
+        except requests.RequestException as e:
+            if not omitir_errores:
+                raise
+            print(f"DATOS GOV Error en un bloque de {url}: {e}")
+            return None
+
+    if len(bloques) == 1:
+        resultados = [agregar_bloque(bloques[0])]
+    else:
+        futures = [ejecutor_bloques.submit(agregar_bloque, params) for params in bloques]
+        resultados = [future.result() for future in futures]
+    return resultados
+
+def unirse(clave):
+    """(vuelo, lider): el vuelo en curso de la clave o uno nuevo que dirige el llamador."""
+    with vuelos_lock:
+        vuelo = vuelos.get(clave)
+        lider = vuelo is None
+        if lider:
+            vuelo = vuelos[clave] = Vuelo()
+    return vuelo, lider
+
+def aterrizar(clave, vuelo, resultado=None, error=None):
+    with vuelos_lock:
+        vuelos.pop(clave, None)
+    if error is not None:
+        vuelo.future.set_exception(error)
+    else:
+        vuelo.future.set_result(resultado)
+
+def consultar(clave, descarga):
+    resultado = cache_local.get(clave)
+    if resultado is not None:
+        return resultado
+
+    vuelo, lider = unirse(clave)
+    if not lider:
+        return vuelo.future.result()
+
+    try:
+        entrada = leer_resultado_compartido(clave)
+        resultado, tamano = entrada if entrada is not None else descargar_coordinado(clave, descarga)
+        cache_local.set(clave, resultado, tamano)
+    except Exception as e:
+        aterrizar(clave, vuelo, error=e)
+        raise
+    aterrizar(clave, vuelo, resultado)
+    return resultado
+
+# Versión async
+
+async def leer_compartida_async(clave):
+    cache = cache_compartida()
+    if cache is None:
+        return None
+    try:
+        return await cache.aget(clave)
+    except Exception as e:
+        print(f"DATOS GOV caché compartida no disponible: {e}")
+        return None
+
+async def leer_resultado_compartido_async(clave):
+    entrada = await leer_compartida_async(clave)
+    return entrada if isinstance(entrada, tuple) else None
+
+async def descargar_coordinado_async(clave, descarga):
+    """descargar_coordinado para corrutinas: la espera del candado no bloquea el loop."""
+    cache = cache_compartida()
+    clave_candado = f"{clave}:candado"
+    try:
+        tiene_candado = cache is None or await cache.aadd(clave_candado, WORKER_ID, ESPERA_MAXIMA)
+    except Exception as e:
+        print(f"DATOS GOV caché compartida no disponible: {e}")
+        cache, tiene_candado = None, True
+
+    if not tiene_candado:
+        limite = time.monotonic() + ESPERA_MAXIMA
+        while time.monotonic() < limite:
+            await asyncio.sleep(INTERVALO_ESPERA)
+            entrada = await leer_resultado_compartido_async(clave)
+            if entrada is not None:
+                return entrada
+            if await leer_compartida_async(clave_candado) is None:
+                break
+
+    try:
+        resultado, tamano = await descarga()
+        if cache is not None and tamano <= CACHE_MAX_BYTES_COMPARTIDA:
+            try:
+                await cache.aset(clave, (resultado, tamano), CACHE_TTL)
+            except Exception as e:
+                print(f"DATOS GOV no se pudo guardar en la caché compartida: {e}")
+        return resultado, tamano
+    finally:
+        if cache is not None and tiene_candado:
+            try:
+                await cache.adelete(clave_candado)
+            except Exception as e:
+                print(f"DATOS GOV no se pudo liberar el candado: {e}")
+
+async def consultar_async(clave, descarga):
+    """consultar para corrutinas; descarga es una función async."""
+    resultado = cache_local.get(clave)
+    if resultado is not None:
+        return resultado
+
+    vuelo, lider = unirse(clave)
+    if not lider:
+        return await asyncio.wrap_future(vuelo.future)
+
+    try:
+        entrada = await leer_resultado_compartido_async(clave)
+        resultado, tamano = entrada if entrada is not None else await descargar_coordinado_async(clave, descarga)
+        cache_local.set(clave, resultado, tamano)
+    except BaseException as e:
+        aterrizar(clave, vuelo, error=e)
+        raise
+    aterrizar(clave, vuelo, resultado)
+    return resultado
+
+async def get_json_async(url, params=None, timeout=None):
+    """get_json para vistas async (misma caché y mismas excepciones)."""
+    async def descarga():
+        response = await motor.get_async(url, params=params, timeout=timeout)
+        return response.json(), len(response.content)
+
+    return await consultar_async(clave_consulta(url, params), descarga)
+
+async def get_json_paginado_async(url, params, tamano_pagina=TAMANO_PAGINA, timeout=None):
+    """get_json_paginado para vistas async: las páginas se piden en el loop del motor."""
+    async def descarga():
+        contador = Contador()
+        with motor.errores_requests():
+            paginas = await motor.esperar_en_motor(paginar_async(url, params, tamano_pagina, timeout, contador))
+        resultado = [registro for pagina in paginas for registro in pagina]
+        return resultado, contador.bytes
+
+    return await consultar_async(f"{clave_consulta(url, params)}:paginado", descarga)
@@ -0,0 +1,133 @@
+import math
+
+from datetime import date, datetime
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+
+# Constructor de consultas SoQL. Las vistas describen qué campos, filtros y
+# agrupaciones necesitan y datos.gov.co hace el filtrado, en lugar de descargar
+# el mercado completo y recorrerlo en Python.
+# Las listas IN largas (entidades, cuentas) se parten con planear_bloques para
+# que ninguna URL supere LONGITUD_MAXIMA_URL.
+
+LONGITUD_MAXIMA_URL = getattr(settings, "DATOS_GOV_LONGITUD_MAXIMA_URL", 2048)
+
+def literal(valor):
+    """Literal SoQL: textos entre comillas simples (duplicando las internas)."""
+    if isinstance(valor, datetime):
+        return f"'{valor.strftime('%Y-%m-%dT%H:%M:%S')}'"
+    if isinstance(valor, date):
+        return f"'{valor.strftime('%Y-%m-%dT00:00:00')}'"
+    return "'{}'".format(str(valor).replace("'", "''"))
+
+def lista(valores):
+    return ','.join(literal(valor) for valor in valores)
+
+class ConsultaSoQL:
+    def __init__(self):
+        self.campos = []
+        self.condiciones = []
+        self.agrupacion = []
+        self.orden = None
+        self.limite = None
+        self.desplazamiento = None
+
+    def select(self, *campos):
+        self.campos.extend(campos)
+        return self
+
+    def where(self, condicion):
+        self.condiciones.append(condicion)
+        return self
+
+    def igual(self, campo, valor):
+        return self.where(f"{campo} = {literal(valor)}")
+
+    def en(self, campo, valores):
+        valores = sorted(set(valores), key=str)
+        if not valores:
+            raise ValueError(f"Lista vacía para {campo}")
+        return self.where(f"{campo} IN ({lista(valores)})")
+
+    def entre(self, campo, desde, hasta):
+        return self.where(f"{campo} BETWEEN {literal(desde)} AND {literal(hasta)}")
+
+    def entre_rangos(self, campo, rangos):
+        """campo en cualquiera de los rangos [(desde, hasta)], un BETWEEN por rango."""
+        condiciones = [f"{campo} BETWEEN {literal(desde)} AND {literal(hasta)}" for desde, hasta in rangos]
+        if not condiciones:
+            raise ValueError(f"Sin rangos para {campo}")
+        if len(condiciones) == 1:
+            return self.where(condiciones[0])
+        return self.where(f"({' OR '.join(condiciones)})")
+
+    def group(self, *campos):
+        self.agrupacion.extend(campos)
+        return self
+
+    def order(self, orden):
+        self.orden = orden
+        return self
+
+    def limit(self, limite):
+        self.limite = limite
+        return self
+
+    def offset(self, desplazamiento):
+        self.desplazamiento = desplazamiento
+        return self
+
+    def params(self):
+        params = {}
+        if self.campos:
+            params["$select"] = ", ".join(self.campos)
+        if self.condiciones:
+            params["$where"] = " AND ".join(self.condiciones)
+        if self.agrupacion:
+            params["$group"] = ", ".join(self.agrupacion)
+        if self.orden:
+            params["$order"] = self.orden
+        if self.limite is not None:
+            params["$limit"] = self.limite
+        if self.desplazamiento is not None:
+            params["$offset"] = self.desplazamiento
+        return params
+
+def longitud_url(url, params):
+    """Longitud de la URL con los parámetros codificados (espacios como %20, el caso
+    más largo)."""
+    return len(url) + 1 + len(urlencode(params, quote_via=quote))
+
+def planear_bloques(url, construir, listas, longitud_maxima=LONGITUD_MAXIMA_URL):
+    """Parámetros de las consultas en que hay que partir las listas IN para que cada
+    URL quepa en longitud_maxima. listas es {nombre: valores} y construir(listas)
+    arma la ConsultaSoQL de un bloque. Cada lista se parte en partes iguales y los
+    bloques son todas las combinaciones, siempre en el mismo orden."""
+    listas = {nombre: sorted(set(valores), key=str) for nombre, valores in listas.items()}
+    params = construir(listas).params()
+    longitud = longitud_url(url, params)
+    if longitud <= longitud_maxima:
+        return [params]
+
+    ocupado = {nombre: len(quote(lista(valores))) for nombre, valores in listas.items()}
+    disponible = longitud_maxima - (longitud - sum(ocupado.values()))
+    partes = {nombre: 1 for nombre in listas}
+    # Se parte una vez más la lista que más ocupa en cada bloque hasta que quepan.
+    while sum(ocupado[nombre] / partes[nombre] for nombre in listas) > disponible:
+        partibles = [nombre for nombre in listas if partes[nombre] < len(listas[nombre])]
+        if not partibles:
+            raise ValueError(f"La consulta no cabe en {longitud_maxima} caracteres ni con un valor por lista")
+        nombre = max(partibles, key=lambda nombre: ocupado[nombre] / partes[nombre])
+        partes[nombre] += 1
+
+    bloques = [{}]
+    for nombre, valores in listas.items():
+        tamano = math.ceil(len(valores) / partes[nombre])
+        bloques = [
+            {**bloque, nombre: valores[inicio:inicio + tamano]}
+            for bloque in bloques
+            for inicio in range(0, len(valores), tamano)
+        ]
+    # Los valores no miden todos lo mismo: un bloque que aún no quepa se vuelve a partir.
+    return [params for bloque in bloques for params in planear_bloques(url, construir, bloque, longitud_maxima)]
@@ -0,0 +1,199 @@
+import re
+import threading
+import time
+import requests
+
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from datosGov import socrata
+from datosGov.motor import completados_en_paralelo, ejecutar_en_paralelo
+from datosGov.soql import ConsultaSoQL, longitud_url, planear_bloques
+
+URL = "https://www.datos.gov.co/resource/prueba.json"
+
+CACHES_PRUEBA = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "pruebas"},
+    "datos_gov": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "pruebas_datos_gov"},
+}
+
+def construir(listas):
+    return (
+        ConsultaSoQL()
+        .select("nit", "cuenta", "valor")
+        .en("nit", listas["nit"])
+        .en("cuenta", listas["cuenta"])
+    )
+
+def valores_en(campo, where):
+    lista = re.search(rf"{campo} IN \(([^)]*)\)", where).group(1)
+    return [valor.strip("'") for valor in lista.split(",")]
+
+
+class PlanearBloquesTests(SimpleTestCase):
+    nits = [f"{800000000 + i * 7919}" for i in range(300)]
+    cuentas = [str(100000 + i * 100) for i in range(40)]
+
+    def test_consulta_corta_un_bloque(self):
+        bloques = planear_bloques(URL, construir, {"nit": self.nits[:3], "cuenta": self.cuentas[:2]})
+        self.assertEqual(bloques, [construir({"nit": sorted(self.nits[:3]), "cuenta": sorted(self.cuentas[:2])}).params()])
+
+    def test_bloques_caben_y_cubren_cada_valor_una_vez(self):
+        for longitud_maxima in (600, 1024, 2048):
+            with self.subTest(longitud_maxima=longitud_maxima):
+                bloques = planear_bloques(URL, construir, {"nit": self.nits, "cuenta": self.cuentas}, longitud_maxima)
+                self.assertGreater(len(bloques), 1)
+                pares = []
+                for params in bloques:
+                    self.assertLessEqual(longitud_url(URL, params), longitud_maxima)
+                    where = params["$where"]
+                    pares += [(nit, cuenta) for nit in valores_en("nit", where) for cuenta in valores_en("cuenta", where)]
+                self.assertEqual(len(pares), len(set(pares)))
+                self.assertEqual(set(pares), {(nit, cuenta) for nit in self.nits for cuenta in self.cuentas})
+
+    def test_plan_determinista(self):
+        listas = {"nit": self.nits, "cuenta": self.cuentas}
+        desordenadas = {"nit": list(reversed(self.nits)), "cuenta": self.cuentas[::-1]}
+        self.assertEqual(planear_bloques(URL, construir, listas, 1024), planear_bloques(URL, construir, desordenadas, 1024))
+
+    def test_consulta_que_no_cabe(self):
+        with self.assertRaises(ValueError):
+            planear_bloques(URL, construir, {"nit": self.nits, "cuenta": self.cuentas}, len(URL) + 50)
+
+
+class CacheLocalTests(SimpleTestCase):
+    def test_desaloja_por_tamano_la_menos_usada(self):
+        cache = socrata.CacheLocal(max_bytes=100, ttl=60)
+        cache.set("a", "A", 40)
+        cache.set("b", "B", 40)
+        self.assertEqual(cache.get("a"), "A")
+        cache.set("c", "C", 40)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), ("A", "C"))
+        self.assertEqual(cache.total_bytes, 80)
+
+    def test_no_guarda_entradas_mayores_al_limite(self):
+        cache = socrata.CacheLocal(max_bytes=100, ttl=60)
+        cache.set("a", "A", 101)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.total_bytes, 0)
+
+    def test_reemplazo_y_vencimiento(self):
+        cache = socrata.CacheLocal(max_bytes=100, ttl=60)
+        cache.set("a", "A", 30)
+        cache.set("a", "A2", 50)
+        self.assertEqual((cache.get("a"), cache.total_bytes), ("A2", 50))
+        with mock.patch("datosGov.socrata.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.total_bytes, 0)
+
+    def test_tamano_aproximado_no_serializa(self):
+        self.assertEqual(socrata.tamano_aproximado({"a": [1, "xy"]}), 19)
+
+
+@override_settings(CACHES=CACHES_PRUEBA)
+class ConsultarTests(SimpleTestCase):
+    def setUp(self):
+        socrata.cache_local.clear()
+        self.addCleanup(socrata.cache_local.clear)
+
+    def test_consultas_identicas_descargan_una_vez(self):
+        llamadas = []
+        liberar = threading.Event()
+
+        def descarga():
+            llamadas.append(1)
+            liberar.wait(5)
+            return [{"valor": "1"}], 16
+
+        resultados = []
+        hilos = [threading.Thread(target=lambda: resultados.append(socrata.consultar("datos_gov:prueba", descarga))) for _ in range(8)]
+        hilos[0].start()
+        while "datos_gov:prueba" not in socrata.vuelos:
+            time.sleep(0.01)
+        for hilo in hilos[1:]:
+            hilo.start()
+        liberar.set()
+        for hilo in hilos:
+            hilo.join(5)
+        self.assertEqual(len(llamadas), 1)
+        self.assertEqual(resultados, [[{"valor": "1"}]] * 8)
+        self.assertNotIn("datos_gov:prueba", socrata.vuelos)
+
+    def test_error_no_queda_en_cache(self):
+        def descarga():
+            raise requests.ConnectionError("caído")
+
+        with self.assertRaises(requests.ConnectionError):
+            socrata.consultar("datos_gov:error", descarga)
+        self.assertNotIn("datos_gov:error", socrata.vuelos)
+        self.assertEqual(socrata.consultar("datos_gov:error", lambda: ([1], 8)), [1])
+
+    def test_otro_worker_lee_la_cache_compartida_con_su_tamano(self):
+        socrata.consultar("datos_gov:compartida", lambda: ([{"valor": "1"}], 1234))
+        self.assertEqual(socrata.leer_resultado_compartido("datos_gov:compartida"), ([{"valor": "1"}], 1234))
+        socrata.cache_local.clear()
+
+        def descarga():
+            raise AssertionError("no debía descargar")
+
+        self.assertEqual(socrata.consultar("datos_gov:compartida", descarga), [{"valor": "1"}])
+        self.assertEqual(socrata.cache_local.total_bytes, 1234)
+
+    def test_paginado_mide_los_bytes_de_las_respuestas(self):
+        class Respuesta:
+            content = b'[{"valor":"1"},{"valor":"2"}]'
+
+            def json(self):
+                return [{"valor": "1"}, {"valor": "2"}]
+
+        async def contar(*args, **kwargs):
+            return 2
+
+        async def get(*args, **kwargs):
+            return Respuesta()
+
+        with mock.patch("datosGov.socrata.contar_async", contar), mock.patch.object(socrata.motor.motor, "get", get):
+            resultado = socrata.get_json_paginado(URL, {"$where": "valor > 0"})
+        self.assertEqual(resultado, [{"valor": "1"}, {"valor": "2"}])
+        self.assertEqual(socrata.cache_local.total_bytes, len(Respuesta.content))
+
+
+def reductor_prueba(registros):
+    return list(registros)
+
+
+class AgregarEnBloquesTests(SimpleTestCase):
+    def agregar(self, url, params, reductor, **kwargs):
+        nits = valores_en("nit", params["$where"])
+        if "800000000" in nits:
+            raise requests.ConnectionError("bloque caído")
+        return nits
+
+    def test_bloques_fallidos_quedan_en_none(self):
+        listas = {"nit": [str(800000000 + i) for i in range(200)], "cuenta": ["100000"]}
+        with mock.patch("datosGov.socrata.agregar_json", side_effect=self.agregar):
+            resultados = socrata.agregar_json_en_bloques(URL, construir, listas, reductor_prueba, omitir_errores=True)
+            self.assertGreater(len(resultados), 1)
+            self.assertIsNone(resultados[0])
+            self.assertTrue(all(resultado is not None for resultado in resultados[1:]))
+            with self.assertRaises(requests.ConnectionError):
+                socrata.agregar_json_en_bloques(URL, construir, listas, reductor_prueba)
+
+
+class ParaleloTests(SimpleTestCase):
+    def test_ejecutar_en_paralelo_conserva_el_orden(self):
+        def tarea(item, espera):
+            time.sleep(espera * (5 - item))
+            return item * 10
+
+        self.assertEqual(ejecutar_en_paralelo(tarea, range(5), 0.01), [0, 10, 20, 30, 40])
+
+    def test_completados_en_paralelo_entrega_por_llegada(self):
+        def tarea(item):
+            time.sleep(item)
+            return item
+
+        llegadas = list(completados_en_paralelo(tarea, [0.3, 0.0, 0.15]))
+        self.assertEqual(llegadas, [(1, 0.0), (2, 0.15), (0, 0.3)])
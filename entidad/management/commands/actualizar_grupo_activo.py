@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from entidad.views import actualizar_grupos_activo
+
+class Command(BaseCommand):
+    help = "Recalcula entidad_grupo_activo (último activo total y grupo de cada entidad) desde datos.gov.co."
+
+    def handle(self, *args, **options):
+        total = actualizar_grupos_activo()
+        self.stdout.write(self.style.SUCCESS(f"{total} entidades clasificadas"))
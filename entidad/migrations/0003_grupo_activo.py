@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 09:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entidad', '0002_alter_entidadmodel_dv_alter_entidadmodel_email_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GrupoActivoModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('saldo', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('grupo', models.SmallIntegerField(db_index=True)),
+                ('periodo', models.SmallIntegerField()),
+                ('mes', models.SmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('entidad', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='grupo_activo', to='entidad.entidadmodel')),
+            ],
+            options={
+                'db_table': 'entidad_grupo_activo',
+            },
+        ),
+    ]
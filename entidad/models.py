@@ -23,3 +23,17 @@ class EntidadModel(models.Model):
     class Meta:
         db_table = "entidad"
         ordering = ['-created_at']
+
+class GrupoActivoModel(models.Model):
+    """Último saldo de activo total de cada entidad y su grupo (determinar_grupo),
+    para que el filtro por Grupo_Activo sea una consulta a la base de datos."""
+    entidad = models.OneToOneField(EntidadModel, on_delete=models.CASCADE, related_name="grupo_activo")
+    saldo = models.DecimalField(max_digits=20, decimal_places=2)
+    grupo = models.SmallIntegerField(db_index=True)
+    periodo = models.SmallIntegerField()
+    mes = models.SmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "entidad_grupo_activo"
@@ -1,3 +1,87 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIRequestFactory
+
+from entidad.models import EntidadModel, GrupoActivoModel
+from entidad.views import EntidadApiView, clasificar_entidades, format_nit_dv, indice_ultimo_corte
+
+
+class GrupoActivoTests(TestCase):
+    def setUp(self):
+        self.guardada = EntidadModel.objects.create(Nit=1, RazonSocial="BANCO GUARDADO", TipoEntidad=1)
+        self.nueva = EntidadModel.objects.create(Nit=2, RazonSocial="BANCO NUEVO", TipoEntidad=1)
+        GrupoActivoModel.objects.create(entidad=self.guardada, saldo=Decimal(10), grupo=1, periodo=2024, mes=3)
+
+    def consultar(self, grupos):
+        request = APIRequestFactory().get("/api/v1/entidad", {"Grupo_Activo": grupos, "puc": "100000"})
+        return EntidadApiView.as_view()(request)
+
+    def clasificar(self, queryset, puc_param):
+        for entidad in queryset:
+            yield entidad, Decimal(20), 1, 2024, 6
+
+    def test_clasifica_en_vivo_las_entidades_sin_fila(self):
+        with mock.patch("entidad.views.clasificar_entidades", side_effect=self.clasificar) as clasificar:
+            respuesta = self.consultar([1])
+        self.assertEqual(list(clasificar.call_args.args[0]), [self.nueva])
+        self.assertEqual(sorted(fila["RazonSocial"] for fila in respuesta.data), ["BANCO GUARDADO", "BANCO NUEVO"])
+        self.assertEqual(GrupoActivoModel.objects.get(entidad=self.nueva).mes, 6)
+
+        with mock.patch("entidad.views.clasificar_entidades", side_effect=AssertionError("ya estaban guardadas")):
+            self.assertEqual(len(self.consultar([1]).data), 2)
+
+    def test_filtra_por_grupo(self):
+        with mock.patch("entidad.views.clasificar_entidades", side_effect=self.clasificar):
+            self.assertEqual(self.consultar([2]).data, [])
+
+
+class UltimoCorteTests(SimpleTestCase):
+    def test_ultimo_corte_por_entidad(self):
+        datos = [
+            {"nit": "A", "mes": 3, "valor": 1},
+            {"nit": "B", "mes": 1, "valor": 2},
+            {"nit": "A", "mes": 6, "valor": 3},
+            {"nit": "A", "mes": 6, "valor": 4},
+            {"nit": "A", "mes": 2, "valor": 5},
+        ]
+        ultimos = indice_ultimo_corte(datos, "nit", lambda registro: registro["mes"])
+        self.assertEqual({nit: registro["valor"] for nit, registro in ultimos.items()}, {"A": 3, "B": 2})
+
+    def test_sin_datos(self):
+        self.assertEqual(indice_ultimo_corte(None, "nit", lambda registro: registro["mes"]), {})
+
+
+class RetrocesoTests(TestCase):
+    def setUp(self):
+        self.coop = EntidadModel.objects.create(Nit=1000, Dv=0, RazonSocial="COOP", TipoEntidad=2)
+        self.banco = EntidadModel.objects.create(Nit=2000, Dv=1, RazonSocial="BANCO", TipoEntidad=1)
+        self.descargados = []
+
+    def ultimo(self, url, params):
+        if "tic6-rbue" in url:
+            return [{"periodo": "2024"}]
+        return [{"fecha_corte": "2023-12-31T00:00:00.000"}]
+
+    def descargar(self, url, params):
+        self.descargados.append(params["$where"][:30])
+        if "a_o='2023'" in params["$where"]:
+            return [
+                {"nit": format_nit_dv(1000, 0), "mes": "MARZO", "valor_en_pesos": "$10"},
+                {"nit": format_nit_dv(1000, 0), "mes": "JUNIO", "valor_en_pesos": "$20"},
+            ]
+        if "2023-01-01" in params["$where"]:
+            return [{"nombre_entidad": "BANCO", "fecha_corte": "2023-11-30T00:00:00.000", "valor": "30"}]
+        return []
+
+    def test_parte_del_ultimo_periodo_publicado(self):
+        with mock.patch("entidad.views.get_json", side_effect=self.ultimo), \
+                mock.patch("entidad.views.get_json_paginado", side_effect=self.descargar):
+            clasificados = list(clasificar_entidades(EntidadModel.objects.all(), "100000"))
+        self.assertEqual(
+            [(entidad.RazonSocial, saldo, periodo, mes) for entidad, saldo, _, periodo, mes in clasificados],
+            [("COOP", Decimal(20), 2023, 6), ("BANCO", Decimal(30), 2023, 11)],
+        )
+        # Solidaria retrocede un año desde 2024; Financiera arranca en su último año.
+        self.assertEqual(len(self.descargados), 3)
@@ -1,5 +1,6 @@
 import logging
 import requests
+from django.db import connection
 from django.db.models import Case, When, IntegerField, DecimalField, Value, Subquery, OuterRef
 from django.db.models.functions import Coalesce
 from decimal import Decimal, InvalidOperation
@@ -8,14 +9,19 @@ from rest_framework import serializers, generics
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from entidad.models import EntidadModel
+from entidad.models import EntidadModel, GrupoActivoModel
 from balSup.models import BalSupModel
 from balCoop.models import BalCoopModel
 from balCoop.serializers import BalCoopSerializer 
 from entidad.serializers import EntidadSerializer
+from datosGov.motor import ejecutar_en_paralelo
+from datosGov.socrata import get_json, get_json_paginado
 
 logger = logging.getLogger('django')
 
+# Cuenta de activo total con la que se clasifican las entidades por tamaño.
+PUC_ACTIVO = "100000"
+
 # def determinar_grupo(saldo):
 #     if saldo < 10000000000:
 #         return 1
@@ -97,123 +103,191 @@ def get_month_from_date(date_string):
     except ValueError as e:
         raise ValueError("Formato de fecha incorrecto o inválido: " + str(e))
 
-def obtener_saldo_y_periodo(queryset, puc_param, grupo_activo_values):
-    baseUrl_entidadesSolidaria = "https://www.datos.gov.co/resource/tic6-rbue.json?$limit=500000"
-    baseUrl_entidadesFinanciera = "https://www.datos.gov.co/resource/mxk5-ce6w.json?$limit=500000"
+def indice_ultimo_corte(datos, campo, orden):
+    """{registro[campo]: registro más reciente según orden}. Ante empates queda el
+    primero, como con max()."""
+    ultimos = {}
+    for registro in datos or []:
+        llave = orden(registro)
+        actual = ultimos.get(registro[campo])
+        if actual is None or llave > actual[0]:
+            ultimos[registro[campo]] = (llave, registro)
+    return {valor: registro for valor, (_, registro) in ultimos.items()}
+
+def clasificar_entidades(queryset, puc_param):
+    """(entidad, saldo, grupo, periodo, mes) con el último saldo publicado de la
+    cuenta puc_param para cada entidad del queryset que tenga datos."""
+    baseUrl_entidadesSolidaria = "https://www.datos.gov.co/resource/tic6-rbue.json"
+    baseUrl_entidadesFinanciera = "https://www.datos.gov.co/resource/mxk5-ce6w.json"
 
     periodo_actual = datetime.now().year
     # fecha1_str = f"{periodo_actual}-01-01T00:00:00.000"
     # fecha2_str = f"{periodo_actual}-12-31T23:59:59.999"
+    filtro_Solidaria = f"codrenglon='{puc_param}' AND codigo_entidad IN ('90', '93', '127', '197', '246', '271', '284', '330', '374', '424', '446', '561', '631', '715', '752', '757', '821', '824', '902', '912', '970', '978', '991', '997', '1093', '1100', '1119', '1128', '1190', '1198', '1266', '1302', '1306', '1319', '1339', '1344', '1355', '1356', '1360', '1365', '1370', '1377', '1386', '1388', '1390', '1411', '1414', '1421', '1437', '1442', '1450', '1457', '1459', '1477', '1510', '1512', '1615', '1630', '1632', '1644', '1648', '1649', '1661', '1663', '1691', '1698', '1703', '1751', '1755', '1756', '1760', '1805', '1811', '1813', '1824', '1827', '1851', '1852', '1859', '1889', '1894', '1961', '1991', '1997', '2006', '2012', '2021', '2024', '2028', '2058', '2077', '2078', '2109', '2130', '2196', '2199', '2223', '2231', '2246', '2336', '2337', '2392', '2398', '2426', '2434', '2483', '2506', '2520', '2525', '2540', '2560', '2641', '2655', '2660', '2675', '2688', '2773', '2783', '2814', '2829', '2871', '2878', '3018', '3033', '3034', '3048', '3049', '3070', '3072', '3123', '3246', '3249', '3278', '3282', '3316', '3341', '3360', '3386', '3391', '3399', '3400', '3402', '3438', '3446', '3488', '3620', '3640', '4004', '4011', '4054', '4403', '4458', '4617', '7099', '7571', '7961', '8024', '8202', '8480', '8487', '8825', '10300', '10555', '11085', '11128', '11327', '11488', '13022', '13024', '13813', '15236', '20009')"
+
+    if puc_param == "350000":
+        puc_param_F = "391500"
+    elif puc_param == "230000":
+        puc_param_F = "240000"
+    else:
+        puc_param_F = puc_param
+    filtro_Financiera = f"cuenta='{puc_param_F}' AND moneda ='0' AND tipo_entidad IN ('1', '4', '32')"
+
+    def ultimo_periodo_solidaria():
+        datos = get_json(baseUrl_entidadesSolidaria, {"$select": "max(a_o) AS periodo", "$where": filtro_Solidaria})
+        return int(datos[0]['periodo']) if datos and datos[0].get('periodo') else None
+
+    def ultimo_periodo_financiera():
+        datos = get_json(baseUrl_entidadesFinanciera, {"$select": "max(fecha_corte) AS fecha_corte", "$where": filtro_Financiera})
+        return int(datos[0]['fecha_corte'][:4]) if datos and datos[0].get('fecha_corte') else None
+
     def obtener_datos_solidaria(periodo):
         # url_Solidaria = f"{baseUrl_entidadesSolidaria}&$where=a_o='{periodo}' AND codrenglon='{puc_param}'"
-        url_Solidaria = f"{baseUrl_entidadesSolidaria}&$where=a_o='{periodo}' AND codrenglon='{puc_param}' AND codigo_entidad IN ('90', '93', '127', '197', '246', '271', '284', '330', '374', '424', '446', '561', '631', '715', '752', '757', '821', '824', '902', '912', '970', '978', '991', '997', '1093', '1100', '1119', '1128', '1190', '1198', '1266', '1302', '1306', '1319', '1339', '1344', '1355', '1356', '1360', '1365', '1370', '1377', '1386', '1388', '1390', '1411', '1414', '1421', '1437', '1442', '1450', '1457', '1459', '1477', '1510', '1512', '1615', '1630', '1632', '1644', '1648', '1649', '1661', '1663', '1691', '1698', '1703', '1751', '1755', '1756', '1760', '1805', '1811', '1813', '1824', '1827', '1851', '1852', '1859', '1889', '1894', '1961', '1991', '1997', '2006', '2012', '2021', '2024', '2028', '2058', '2077', '2078', '2109', '2130', '2196', '2199', '2223', '2231', '2246', '2336', '2337', '2392', '2398', '2426', '2434', '2483', '2506', '2520', '2525', '2540', '2560', '2641', '2655', '2660', '2675', '2688', '2773', '2783', '2814', '2829', '2871', '2878', '3018', '3033', '3034', '3048', '3049', '3070', '3072', '3123', '3246', '3249', '3278', '3282', '3316', '3341', '3360', '3386', '3391', '3399', '3400', '3402', '3438', '3446', '3488', '3620', '3640', '4004', '4011', '4054', '4403', '4458', '4617', '7099', '7571', '7961', '8024', '8202', '8480', '8487', '8825', '10300', '10555', '11085', '11128', '11327', '11488', '13022', '13024', '13813', '15236', '20009')"
-        response_Solidaria = requests.get(url_Solidaria)
-        datos = response_Solidaria.json() if response_Solidaria.status_code == 200 and response_Solidaria.json() else []
-        return datos
+        where_Solidaria = f"a_o='{periodo}' AND {filtro_Solidaria}"
+        try:
+            datos = get_json_paginado(baseUrl_entidadesSolidaria, {"$where": where_Solidaria, "$limit": 500000})
+        except requests.HTTPError:
+            datos = []
+        return datos or []
 
     def obtener_datos_financiera(periodo):
-        if puc_param == "350000":
-            puc_param_F = "391500"
-        elif puc_param == "230000":
-            puc_param_F = "240000"
-        else:
-            puc_param_F = puc_param
-
         fecha1_str = f"{periodo}-01-01T00:00:00.000"
         fecha2_str = f"{periodo}-12-31T23:59:59.999"
 
-        url_Financiera = f"{baseUrl_entidadesFinanciera}&$where=fecha_corte BETWEEN '{fecha1_str}' AND '{fecha2_str}' AND cuenta='{puc_param_F}' AND moneda ='0' AND tipo_entidad IN ('1', '4', '32')"
-        response_Financiera = requests.get(url_Financiera)
-        datos = response_Financiera.json() if response_Financiera.status_code == 200 and response_Financiera.json() else []
-        return datos
-
-    def obtener_datos(periodo):
-        def obtener_datos_con_retroceso(funcion_obtener, periodo):
-            while periodo >= 2000:
-                datos = funcion_obtener(periodo)
-                if datos:
-                    return datos, periodo
-                periodo -= 1
+        where_Financiera = f"fecha_corte BETWEEN '{fecha1_str}' AND '{fecha2_str}' AND {filtro_Financiera}"
+        try:
+            datos = get_json_paginado(baseUrl_entidadesFinanciera, {"$where": where_Financiera, "$limit": 500000})
+        except requests.HTTPError:
+            datos = []
+        return datos or []
+
+    def obtener_datos_con_retroceso(funciones, periodo):
+        # Primero se pregunta por el último año publicado (un max() pequeño) y se
+        # descarga sólo ese año; el retroceso año a año queda para cuando el
+        # agregado falla o ese año viene vacío.
+        funcion_ultimo, funcion_obtener = funciones
+        try:
+            ultimo = funcion_ultimo()
+        except requests.RequestException as e:
+            print(f"Error consultando el último periodo publicado: {e}")
+            ultimo = periodo
+        if ultimo is None:
             return None, None
+        periodo = min(periodo, ultimo)
+        while periodo >= 2000:
+            datos = funcion_obtener(periodo)
+            if datos:
+                return datos, periodo
+            periodo -= 1
+        return None, None
 
-        solidaria_data, periodo_solidaria = obtener_datos_con_retroceso(obtener_datos_solidaria, periodo)
-        financiera_data, periodo_financiera = obtener_datos_con_retroceso(obtener_datos_financiera, periodo)
-
+    def obtener_datos(periodo):
+        # Los dos sectores se consultan a la vez.
+        (solidaria_data, periodo_solidaria), (financiera_data, periodo_financiera) = ejecutar_en_paralelo(
+            obtener_datos_con_retroceso,
+            [(ultimo_periodo_solidaria, obtener_datos_solidaria), (ultimo_periodo_financiera, obtener_datos_financiera)],
+            periodo,
+        )
         return solidaria_data, financiera_data, periodo_solidaria, periodo_financiera
 
     Solidaria_data, Financiera_data, periodo_solidaria, periodo_financiera = obtener_datos(periodo_actual)
 
+    # Un solo recorrido por dataset: último corte de cada entidad, con la fecha ya
+    # convertida, para que cada entidad del queryset sea una búsqueda en el índice.
+    ultimo_Solidaria = indice_ultimo_corte(Solidaria_data, 'nit', lambda x: convertir_mes_a_numero(x['mes']))
+    ultimo_Financiera = indice_ultimo_corte(Financiera_data, 'nombre_entidad', lambda x: datetime.fromisoformat(x['fecha_corte']))
+
     def generar_resultado_Solidaria():
         for entidad in queryset:
             if entidad.TipoEntidad == 2:
-                nit = entidad.Nit
-                dv = entidad.Dv
-                formatted_nit_dv = format_nit_dv(nit, dv)
-
-                entity_data = (data for data in Solidaria_data if data['nit'] == formatted_nit_dv)
-                most_recent_data = max(
-                    entity_data,
-                    key=lambda x: convertir_mes_a_numero(x['mes']),
-                    default=None
-                )
+                formatted_nit_dv = format_nit_dv(entidad.Nit, entidad.Dv)
+                most_recent_data = ultimo_Solidaria.get(formatted_nit_dv)
 
                 if most_recent_data:
                     mes_numero = get_month_name(most_recent_data['mes'])
                     saldo_decimal = clean_currency_value_Decimal(most_recent_data['valor_en_pesos'])
-                    grupo_activo = determinar_grupo(saldo_decimal)
-
-                    fecha_tamaño = f"{(most_recent_data['mes']).upper()} - {periodo_solidaria}"
-
-                    if grupo_activo in grupo_activo_values:
-                        yield {
-                            'id': entidad.id,
-                            'Nit': entidad.Nit,
-                            'Dv': entidad.Dv,
-                            'RazonSocial': entidad.RazonSocial,
-                            'Sigla': entidad.Sigla,
-                            'TipoEntidad': entidad.TipoEntidad,
-                            'Departamento': entidad.Departamento,
-                            'Gremio': entidad.Gremio,
-                            'Grupo_Activo': grupo_activo,
-                            'periodo': periodo_solidaria,
-                            'mes': mes_numero,
-                            'fecha_tamaño': fecha_tamaño
-                        }
+                    yield entidad, saldo_decimal, determinar_grupo(saldo_decimal), periodo_solidaria, mes_numero
 
     def generar_resultado_Financiera():
         for entidad in queryset:
             if entidad.TipoEntidad != 2:
-                razon_social = entidad.RazonSocial
-
-                entity_data = (data for data in Financiera_data if data['nombre_entidad'] == razon_social)
-                most_recent_data = max(
-                    entity_data,
-                    key=lambda x: datetime.strptime(x['fecha_corte'], '%Y-%m-%dT%H:%M:%S.%f'),
-                    default=None
-                )
+                most_recent_data = ultimo_Financiera.get(entidad.RazonSocial)
 
                 if most_recent_data:
                     mes_numero_financiera = get_month_from_date(most_recent_data['fecha_corte'])
-                    saldo_decimal = float(most_recent_data['valor'])
-                    grupo_activo = determinar_grupo(saldo_decimal)
-
-                    fecha_tamaño = f"{get_month_name(mes_numero_financiera)} - {periodo_financiera}"
-                    if grupo_activo in grupo_activo_values:
-                        yield {
-                            'id': entidad.id,
-                            'Nit': entidad.Nit,
-                            'Dv': entidad.Dv,
-                            'RazonSocial': entidad.RazonSocial,
-                            'Sigla': entidad.Sigla,
-                            'TipoEntidad': entidad.TipoEntidad,
-                            'Departamento': entidad.Departamento,
-                            'Gremio': entidad.Gremio,
-                            'Grupo_Activo': grupo_activo,
-                            'periodo': periodo_financiera,
-                            'mes': mes_numero_financiera,
-                            'fecha_tamaño': fecha_tamaño
-                        }
-    return list(generar_resultado_Solidaria()) + list(generar_resultado_Financiera())
+                    saldo_decimal = Decimal(most_recent_data['valor'])
+                    grupo_activo = determinar_grupo(float(most_recent_data['valor']))
+                    yield entidad, saldo_decimal, grupo_activo, periodo_financiera, mes_numero_financiera
+
+    yield from generar_resultado_Solidaria()
+    yield from generar_resultado_Financiera()
+
+def fila_grupo_activo(entidad, grupo_activo, periodo, mes):
+    return {
+        'id': entidad.id,
+        'Nit': entidad.Nit,
+        'Dv': entidad.Dv,
+        'RazonSocial': entidad.RazonSocial,
+        'Sigla': entidad.Sigla,
+        'TipoEntidad': entidad.TipoEntidad,
+        'Departamento': entidad.Departamento,
+        'Gremio': entidad.Gremio,
+        'Grupo_Activo': grupo_activo,
+        'periodo': periodo,
+        'mes': mes,
+        'fecha_tamaño': f"{get_month_name(mes)} - {periodo}"
+    }
+
+def obtener_saldo_y_periodo(queryset, puc_param, grupo_activo_values):
+    return [
+        fila_grupo_activo(entidad, grupo_activo, periodo, mes)
+        for entidad, _, grupo_activo, periodo, mes in clasificar_entidades(queryset, puc_param)
+        if grupo_activo in grupo_activo_values
+    ]
+
+def guardar_grupos_activo(queryset):
+    """Clasifica las entidades del queryset y guarda su fila en entidad_grupo_activo.
+    Las entidades sin datos conservan su fila anterior."""
+    filas = [
+        GrupoActivoModel(entidad=entidad, saldo=saldo, grupo=grupo_activo, periodo=periodo, mes=mes)
+        for entidad, saldo, grupo_activo, periodo, mes in clasificar_entidades(queryset, PUC_ACTIVO)
+    ]
+    # MySQL resuelve el conflicto por cualquier índice único y no admite unique_fields.
+    GrupoActivoModel.objects.bulk_create(
+        filas,
+        update_conflicts=True,
+        unique_fields=['entidad'] if connection.features.supports_update_conflicts_with_target else None,
+        update_fields=['saldo', 'grupo', 'periodo', 'mes', 'updated_at'],
+    )
+    return len(filas)
+
+def actualizar_grupos_activo():
+    """Recalcula entidad_grupo_activo con el último activo total publicado de cada
+    entidad."""
+    total = guardar_grupos_activo(EntidadModel.objects.all())
+    print(f"GRUPO ACTIVO: {total} entidades")
+    return total
+
+def grupos_activo_guardados(queryset, grupo_activo_values):
+    """Filtro por Grupo_Activo sobre entidad_grupo_activo, en el mismo orden que
+    obtener_saldo_y_periodo (primero las cooperativas). Las entidades del queryset
+    que aún no están en la tabla se clasifican en vivo y se guardan antes."""
+    faltantes = queryset.filter(grupo_activo__isnull=True)
+    if faltantes.exists():
+        guardar_grupos_activo(faltantes)
+    guardados = (
+        GrupoActivoModel.objects
+        .filter(entidad__in=queryset, grupo__in=grupo_activo_values)
+        .select_related('entidad')
+        .order_by(
+            Case(When(entidad__TipoEntidad=2, then=Value(0)), default=Value(1), output_field=IntegerField()),
+            '-entidad__created_at',
+        )
+    )
+    return [
+        fila_grupo_activo(guardado.entidad, guardado.grupo, guardado.periodo, guardado.mes)
+        for guardado in guardados
+    ]
 
 def convertir_mes_a_numero(mes):
     MESES = {
@@ -268,6 +342,8 @@ class EntidadApiView(APIView):
         if gremio_values:
             queryset = queryset.filter(Gremio__in=gremio_values)
         if grupo_activo_values:
+            if puc_param == PUC_ACTIVO:
+                return Response(status=status.HTTP_200_OK, data=grupos_activo_guardados(queryset, grupo_activo_values))
             resultado = obtener_saldo_y_periodo(queryset, puc_param, grupo_activo_values)         
             return Response(status=status.HTTP_200_OK, data=resultado)
         else:
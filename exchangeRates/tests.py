@@ -1,3 +1,34 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+import requests
+
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory
+
+from exchangeRates.views import SolidarityFinancialData
+
+
+async def datos_gov(url, params, chunk_size, timeout=None):
+    if url == SolidarityFinancialData.FINANCIERA_URL:
+        return [{"fecha_corte": "2024-01-31T00:00:00.000"}, {"fecha_corte": "2024-03-31T00:00:00.000"}]
+    raise requests.HTTPError("sin datos")
+
+
+class SolidarityFinancialDataTests(SimpleTestCase):
+    def consultar(self, **params):
+        request = APIRequestFactory().get("/v1/solidarity_financial_data", params)
+        return SolidarityFinancialData.as_view()(request)
+
+    def test_consulta_ambos_sectores(self):
+        with mock.patch("exchangeRates.views.get_json_paginado_async", side_effect=datos_gov) as consultar:
+            respuesta = self.consultar(year=2024)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(consultar.call_count, 2)
+        financiera, solidaria = respuesta.data[0]["datos"]
+        self.assertEqual([mes for mes, hay in financiera["valores"].items() if hay], ["Ene", "Mar"])
+        self.assertFalse(any(solidaria["valores"].values()))
+        self.assertIn('nit IN("804-009-752-8",', consultar.call_args_list[1].args[1]["$where"])
+
+    def test_valida_el_year(self):
+        self.assertEqual(self.consultar().status_code, 400)
+        self.assertEqual(self.consultar(year="x").status_code, 400)
@@ -1,13 +1,14 @@
 import requests
 import calendar
 import time
-import httpx
-import backoff
 import asyncio
+from asgiref.sync import async_to_sync
 from django.core.cache import cache
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from balCoop.sync import BASE_URL_DATASET, get_dataset_solidaria
+from datosGov.socrata import get_json_paginado_async
 from .serializers import ExchangeRateSerializer, ExchangeRateRawMaterialsSerializer, CombinedExchangeRateSerializer
 
 from datetime import datetime, date
@@ -290,6 +291,8 @@ class CombinedExchangeRates(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class SolidarityFinancialData(APIView):
+    """Las consultas a datos.gov.co de ambos sectores se esperan juntas con la capa
+    async de datosGov.socrata; la vista sigue siendo de DRF."""
 
     MONTHS_ES = {
         1: 'Ene', 2: 'Feb', 3: 'Mar', 4: 'Abr', 5: 'May', 6: 'Jun',
@@ -298,48 +301,16 @@ class SolidarityFinancialData(APIView):
 
     FINANCIERA_URL = "https://www.datos.gov.co/resource/mxk5-ce6w.json"
 
-    def get_api_params_solidarity(self, year: int) -> tuple:
-        if year == 2020:
-            return ("https://www.datos.gov.co/resource/78xz-k3hv.json", 'codcuenta')
-        elif year == 2021:
-            return ("https://www.datos.gov.co/resource/irgu-au8v.json", 'codrenglon')
-        return ("https://www.datos.gov.co/resource/tic6-rbue.json", 'codrenglon')
-
     CHUNK_SIZE = 1000  
 
-    @backoff.on_exception( backoff.expo, (httpx.RequestError, httpx.TimeoutException), max_tries=10 )
-
-    async def fetch_page(self, client, url: str, params: dict, entity: str):
-        """Obtiene una página de datos de la API."""
+    async def fetch_year_data(self, url: str, params: dict, entity: str) -> list:
+        """Cuenta los registros del año y los descarga en páginas de CHUNK_SIZE en paralelo."""
         try:
-            # print(f"[{entity}] Consultando: {url} con {params}")
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            # print(f"[{entity}] Datos recibidos: {len(data)} registros")
-            return data if isinstance(data, list) else []
-        except httpx.HTTPStatusError as e:
+            return await get_json_paginado_async(url, params, self.CHUNK_SIZE, timeout=(1.0, 3.0))
+        except requests.HTTPError as e:
             # print(f"[{entity}] Error HTTP {e.response.status_code}: {e}")
             return []
 
-    async def fetch_year_data(self, url: str, params: dict, entity: str) -> list:
-        """Realiza solicitudes en paralelo por CHUNKS de 3,000 registros."""
-        all_data = []
-        limit = self.CHUNK_SIZE
-        offsets = list(range(0, 1000, limit))
-
-        async with httpx.AsyncClient(timeout=httpx.Timeout(1.0, read=3.0)) as client:
-            tasks = [
-                self.fetch_page(client, url, {**params, "$limit": limit, "$offset": offset}, entity)
-                for offset in offsets
-            ]
-            results = await asyncio.gather(*tasks)
-
-        for data in results:
-            all_data.extend(data)
-
-        return all_data
-
     async def process_financiera_year_data(self, year: int) -> dict:
         """Procesa datos financieros de manera asíncrona."""
         start_date = f"{year}-01-01T00:00:00"
@@ -367,9 +338,11 @@ class SolidarityFinancialData(APIView):
 
     async def process_solidaria_year_data(self, year: int) -> dict:
         """Procesa datos solidarios de manera asíncrona."""
-        url, codigo_str = self.get_api_params_solidarity(year)
+        dataset, codigo_str = get_dataset_solidaria(year)
+        url = BASE_URL_DATASET.format(dataset)
         nits = ["804-009-752-8", "860-025-596-6", "860-007-327-5", "890-505-363-6", "890-203-225-1"]
-        where_clause = f"a_o='{year}' AND {codigo_str}='100000' AND nit IN({','.join(f'\"{nit}\"' for nit in nits)})"
+        nits_str = ",".join(f'"{nit}"' for nit in nits)
+        where_clause = f"a_o='{year}' AND {codigo_str}='100000' AND nit IN({nits_str})"
         params = {
             "$where": where_clause
         }
@@ -424,7 +397,7 @@ class SolidarityFinancialData(APIView):
             )
 
         # print(f"\n=== Procesando el año: {year} ===")
-        result = asyncio.run(self.get_async(year))
+        result = async_to_sync(self.get_async)(year)
 
         # print("\nResultado final:", result)
-        return Response(result, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(result, status=status.HTTP_200_OK)
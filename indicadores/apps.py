@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class IndicadoresConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'indicadores'
+
+    def ready(self):
+        # Registra y compila los conjuntos de indicadores de cada app (<app>.indicadores).
+        autodiscover_modules('indicadores')
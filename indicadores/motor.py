@@ -0,0 +1,197 @@
+import operator
+import numpy as np
+
+from decimal import Decimal
+
+# Motor columnar de indicadores. Los saldos se cargan en arreglos
+# (entidades x cuentas PUC x meses) y cada indicador es una fórmula declarativa
+# sobre columnas PUC (C, P, MES, div) que se evalúa para todas las entidades y
+# meses a la vez. En modo exacto los arreglos guardan Decimal y las operaciones
+# son las mismas que hacía el cálculo escalar; si no, se usa float64.
+
+class Expresion:
+    def __add__(self, otro):
+        return Operacion(operator.add, self, como_expresion(otro))
+
+    def __radd__(self, otro):
+        return Operacion(operator.add, como_expresion(otro), self)
+
+    def __sub__(self, otro):
+        return Operacion(operator.sub, self, como_expresion(otro))
+
+    def __rsub__(self, otro):
+        return Operacion(operator.sub, como_expresion(otro), self)
+
+    def __mul__(self, otro):
+        return Operacion(operator.mul, self, como_expresion(otro))
+
+    def __rmul__(self, otro):
+        return Operacion(operator.mul, como_expresion(otro), self)
+
+    def __truediv__(self, otro):
+        return Operacion(operator.truediv, self, como_expresion(otro))
+
+    def __rtruediv__(self, otro):
+        return Operacion(operator.truediv, como_expresion(otro), self)
+
+    def cuentas(self, anterior=False):
+        """Cuentas PUC que lee la fórmula, del mes (o del diciembre anterior)."""
+        return set().union(*(hijo.cuentas(anterior) for hijo in self.hijos()))
+
+    def hijos(self):
+        return ()
+
+    def clave(self):
+        raise NotImplementedError
+
+    def evaluar(self, bloque):
+        raise NotImplementedError
+
+class Cuenta(Expresion):
+    def __init__(self, codigo, anterior=False):
+        self.codigo = str(codigo)
+        self.anterior = anterior
+
+    def cuentas(self, anterior=False):
+        return {self.codigo} if self.anterior == anterior else set()
+
+    def clave(self):
+        return ("cuenta", self.codigo, self.anterior)
+
+    def evaluar(self, bloque):
+        return bloque.columna(self.codigo, self.anterior)
+
+class Constante(Expresion):
+    def __init__(self, valor):
+        self.valor = valor
+
+    def clave(self):
+        return ("constante", type(self.valor).__name__, self.valor)
+
+    def evaluar(self, bloque):
+        return self.valor
+
+class NumeroMes(Expresion):
+    def clave(self):
+        return ("mes",)
+
+    def evaluar(self, bloque):
+        return bloque.numero_mes
+
+class Operacion(Expresion):
+    def __init__(self, funcion, izquierda, derecha):
+        self.funcion = funcion
+        self.izquierda = izquierda
+        self.derecha = derecha
+
+    def hijos(self):
+        return (self.izquierda, self.derecha)
+
+    def evaluar(self, bloque):
+        return self.funcion(bloque.valor(self.izquierda), bloque.valor(self.derecha))
+
+class Division(Operacion):
+    """numerador / denominador, o 0 donde el denominador es 0."""
+
+    def __init__(self, numerador, denominador):
+        super().__init__(operator.truediv, numerador, denominador)
+
+    def evaluar(self, bloque):
+        numerador, denominador = np.broadcast_arrays(
+            np.asarray(bloque.valor(self.izquierda), dtype=bloque.dtype),
+            np.asarray(bloque.valor(self.derecha), dtype=bloque.dtype),
+        )
+        resultado = np.zeros(numerador.shape, dtype=bloque.dtype)
+        np.divide(numerador, denominador, out=resultado, where=denominador != 0)
+        return resultado
+
+def como_expresion(valor):
+    return valor if isinstance(valor, Expresion) else Constante(valor)
+
+def C(*codigos):
+    """Suma de las cuentas del mes."""
+    return suma(Cuenta(codigo) for codigo in codigos)
+
+def P(*codigos):
+    """Suma de las cuentas del diciembre del año anterior."""
+    return suma(Cuenta(codigo, anterior=True) for codigo in codigos)
+
+def suma(expresiones):
+    expresiones = list(expresiones)
+    total = expresiones[0]
+    for expresion in expresiones[1:]:
+        total = total + expresion
+    return total
+
+def div(numerador, denominador):
+    return Division(como_expresion(numerador), como_expresion(denominador))
+
+MES = NumeroMes()
+
+class Bloque:
+    """Saldos de varias entidades y meses. entidades y meses son las etiquetas de los
+    ejes (cualquier valor hashable); meses son tuplas (periodo, mes)."""
+
+    def __init__(self, entidades, meses, cuentas, exacto=False):
+        self.entidades = list(entidades)
+        self.meses = list(meses)
+        self.indice_mes = {mes: k for k, mes in enumerate(self.meses)}
+        self.cuentas = {codigo: j for j, codigo in enumerate(sorted({str(codigo) for codigo in cuentas}))}
+        self.exacto = exacto
+        self.dtype = object if exacto else np.float64
+        cero = Decimal(0) if exacto else 0.0
+        forma = (len(self.entidades), len(self.cuentas), len(self.meses))
+        self.actual = np.full(forma, cero, dtype=self.dtype)
+        self.anterior = np.full(forma, cero, dtype=self.dtype)
+        self.numero_mes = np.array([self.numero(mes) for _, mes in self.meses], dtype=self.dtype).reshape(1, -1)
+        self.memoria = {}
+
+    def numero(self, valor):
+        if self.exacto:
+            return valor if isinstance(valor, Decimal) else Decimal(valor)
+        return float(valor)
+
+    def cargar(self, mes, saldos, anterior=False, claves=None):
+        """Copia {clave: {cuenta: saldo}} en la columna del mes. claves(entidad) da las
+        claves a buscar en saldos para cada entidad; la primera que tenga la cuenta
+        gana (por defecto la propia entidad)."""
+        k = self.indice_mes[mes]
+        destino = self.anterior if anterior else self.actual
+        for i, entidad in enumerate(self.entidades):
+            for clave in reversed(claves(entidad) if claves else (entidad,)):
+                saldos_entidad = saldos.get(clave)
+                if not saldos_entidad:
+                    continue
+                for codigo, saldo in saldos_entidad.items():
+                    j = self.cuentas.get(codigo)
+                    if j is not None:
+                        destino[i, j, k] = self.numero(saldo)
+        self.memoria.clear()
+
+    def columna(self, codigo, anterior=False):
+        try:
+            j = self.cuentas[codigo]
+        except KeyError:
+            raise KeyError(f"La cuenta {codigo} no se cargó en el bloque") from None
+        return (self.anterior if anterior else self.actual)[:, j, :]
+
+    def valor(self, expresion):
+        """Evalúa una expresión una sola vez por bloque aunque varias fórmulas la compartan."""
+        clave = id(expresion)
+        if clave not in self.memoria:
+            self.memoria[clave] = (expresion, expresion.evaluar(self))
+        return self.memoria[clave][1]
+
+    def calcular(self, formulas):
+        """{nombre: arreglo (entidades x meses)} para todas las fórmulas."""
+        forma = (len(self.entidades), len(self.meses))
+        return {nombre: np.broadcast_to(self.valor(formula), forma) for nombre, formula in formulas.items()}
+
+    def filas(self, formulas):
+        """(entidad, mes, {indicador: valor}) por cada entidad y mes del bloque."""
+        resultados = self.calcular(formulas)
+        convertir = (lambda valor: valor) if self.exacto else float
+        for i, entidad in enumerate(self.entidades):
+            for k, mes in enumerate(self.meses):
+                yield entidad, mes, {nombre: convertir(valores[i, k]) for nombre, valores in resultados.items()}
+
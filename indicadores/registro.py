@@ -0,0 +1,72 @@
+from indicadores.motor import Bloque, Operacion
+
+# Registro de conjuntos de indicadores. Cada app declara sus fórmulas en su
+# módulo indicadores.py y las registra al importarse; IndicadoresConfig.ready
+# importa esos módulos al arrancar, así que las fórmulas se compilan una sola
+# vez por proceso. El conjunto sabe qué cuentas PUC lee cada indicador, de modo
+# que las consultas piden sólo las cuentas de los indicadores solicitados.
+
+conjuntos = {}
+
+def compartir(expresion, nodos):
+    """Reemplaza las subexpresiones iguales por un mismo objeto para que el bloque
+    las evalúe una sola vez (el bloque memoriza por identidad)."""
+    if isinstance(expresion, Operacion):
+        expresion.izquierda = compartir(expresion.izquierda, nodos)
+        expresion.derecha = compartir(expresion.derecha, nodos)
+        clave = (type(expresion).__name__, expresion.funcion.__name__, id(expresion.izquierda), id(expresion.derecha))
+    else:
+        clave = expresion.clave()
+    return nodos.setdefault(clave, expresion)
+
+class Conjunto:
+    def __init__(self, nombre, formulas):
+        self.nombre = nombre
+        nodos = {}
+        self.formulas = {indicador: compartir(formula, nodos) for indicador, formula in formulas.items()}
+        self.cuentas_indicador = {
+            indicador: (formula.cuentas(), formula.cuentas(anterior=True))
+            for indicador, formula in self.formulas.items()
+        }
+
+    def seleccion(self, indicadores=None):
+        """Fórmulas de los indicadores pedidos (todos si no se indica), en el orden
+        del conjunto."""
+        if indicadores is None:
+            return self.formulas
+        desconocidos = set(indicadores) - set(self.formulas)
+        if desconocidos:
+            raise ValueError(f"Indicadores desconocidos en {self.nombre}: {', '.join(sorted(desconocidos))}")
+        return {indicador: formula for indicador, formula in self.formulas.items() if indicador in indicadores}
+
+    def cuentas(self, indicadores=None, anterior=False):
+        """Cuentas PUC que hay que consultar para los indicadores pedidos: las del mes,
+        o las del diciembre anterior con anterior=True."""
+        posicion = 1 if anterior else 0
+        return sorted(set().union(*(self.cuentas_indicador[indicador][posicion] for indicador in self.seleccion(indicadores))))
+
+    def bloque(self, entidades, saldos, indicadores=None, claves=None, exacto=False):
+        """Bloque con las cuentas de los indicadores pedidos. saldos es {(periodo, mes):
+        (saldos del mes, saldos del diciembre anterior o None)}."""
+        cuentas = self.cuentas(indicadores) + self.cuentas(indicadores, anterior=True)
+        bloque = Bloque(entidades, sorted(saldos, key=str), cuentas, exacto=exacto)
+        for mes, (saldos_current, saldos_previous) in saldos.items():
+            bloque.cargar(mes, saldos_current, claves=claves)
+            if saldos_previous is not None:
+                bloque.cargar(mes, saldos_previous, anterior=True, claves=claves)
+        return bloque
+
+    def calcular(self, entidades, saldos, indicadores=None, claves=None, exacto=False):
+        """{(entidad, (periodo, mes)): {indicador: valor}} para todas las entidades y meses."""
+        formulas = self.seleccion(indicadores)
+        bloque = self.bloque(entidades, saldos, indicadores, claves, exacto)
+        return {(entidad, mes): valores for entidad, mes, valores in bloque.filas(formulas)}
+
+def registrar(nombre, formulas):
+    if nombre in conjuntos:
+        raise ValueError(f"El conjunto de indicadores {nombre} ya está registrado")
+    conjuntos[nombre] = Conjunto(nombre, formulas)
+    return conjuntos[nombre]
+
+def obtener(nombre):
+    return conjuntos[nombre]
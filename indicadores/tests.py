@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+import numpy as np
+
+from django.test import SimpleTestCase
+
+from indicadores.motor import MES, Bloque, C, P, div
+from indicadores.registro import Conjunto
+
+FORMULAS = {
+    "cartera": div(C("140000"), C("100000")),
+    "roa": div(C("391500"), (P("100000") + (C("100000") / MES) * 12) / 2),
+    "activo": C("100000") + 0,
+}
+
+SALDOS = {
+    (2024, 6): (
+        {
+            "A": {"100000": Decimal("1000.10"), "140000": Decimal("333.37"), "391500": Decimal("12.5")},
+            "B": {"100000": Decimal("0"), "140000": Decimal("50")},
+        },
+        {"A": {"100000": Decimal("900.00")}},
+    ),
+}
+
+
+class DivisionTests(SimpleTestCase):
+    def test_division_por_cero_da_cero(self):
+        for exacto in (False, True):
+            with self.subTest(exacto=exacto):
+                bloque = Bloque(["A", "B"], [(2024, 1)], ["1", "2"], exacto=exacto)
+                bloque.cargar((2024, 1), {"A": {"1": 10, "2": 4}, "B": {"1": 10, "2": 0}})
+                resultado = bloque.calcular({"x": div(C("1"), C("2"))})["x"]
+                self.assertEqual(resultado[0, 0], Decimal("2.5") if exacto else 2.5)
+                self.assertEqual(resultado[1, 0], 0)
+
+    def test_float_sin_avisos_de_numpy(self):
+        bloque = Bloque(["A"], [(2024, 1)], ["1", "2"])
+        with np.errstate(all="raise"):
+            self.assertEqual(bloque.calcular({"x": div(C("1"), C("2"))})["x"][0, 0], 0.0)
+
+    def test_cuenta_no_cargada(self):
+        bloque = Bloque(["A"], [(2024, 1)], ["1"])
+        with self.assertRaises(KeyError):
+            bloque.calcular({"x": C("2")})
+
+
+class ConjuntoTests(SimpleTestCase):
+    def setUp(self):
+        self.conjunto = Conjunto("pruebas", FORMULAS)
+
+    def test_seleccion_rechaza_nombres_desconocidos(self):
+        with self.assertRaisesRegex(ValueError, "noExiste"):
+            self.conjunto.seleccion(["cartera", "noExiste"])
+
+    def test_seleccion_conserva_el_orden_del_conjunto(self):
+        self.assertEqual(list(self.conjunto.seleccion(["activo", "cartera"])), ["cartera", "activo"])
+        self.assertEqual(list(self.conjunto.seleccion()), list(FORMULAS))
+
+    def test_cuentas_por_indicador(self):
+        self.assertEqual(self.conjunto.cuentas(["cartera"]), ["100000", "140000"])
+        self.assertEqual(self.conjunto.cuentas(["cartera"], anterior=True), [])
+        self.assertEqual(self.conjunto.cuentas(["roa"], anterior=True), ["100000"])
+
+    def test_subexpresiones_compartidas(self):
+        self.assertIs(self.conjunto.formulas["cartera"].derecha, self.conjunto.formulas["roa"].derecha.izquierda.derecha.izquierda.izquierda)
+
+    def test_exacto_igual_al_calculo_escalar(self):
+        calculados = self.conjunto.calcular(["A", "B"], SALDOS, exacto=True)
+        actual, anterior = SALDOS[(2024, 6)]
+        mes = Decimal(6)
+        a = actual["A"]
+        self.assertEqual(calculados[("A", (2024, 6))], {
+            "cartera": a["140000"] / a["100000"],
+            "roa": a["391500"] / ((anterior["A"]["100000"] + (a["100000"] / mes) * 12) / 2),
+            "activo": a["100000"],
+        })
+        self.assertEqual(calculados[("B", (2024, 6))], {"cartera": 0, "roa": 0, "activo": 0})
+        self.assertIsInstance(calculados[("A", (2024, 6))]["cartera"], Decimal)
+
+    def test_float_cercano_al_exacto(self):
+        exactos = self.conjunto.calcular(["A", "B"], SALDOS, exacto=True)
+        flotantes = self.conjunto.calcular(["A", "B"], SALDOS)
+        for clave, valores in exactos.items():
+            for indicador, valor in valores.items():
+                self.assertAlmostEqual(flotantes[clave][indicador], float(valor), places=12)
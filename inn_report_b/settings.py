@@ -38,6 +38,10 @@ INSTALLED_APPS = [
     'pucSup',
     'balCoop',
     'balSup',
+    'datosGov',
+    'indicadores',
+    'totalaccounts',
+    'trabajos',
     'Resumen'
 ]
 
@@ -208,5 +212,35 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'ExchangeRates',
-    }
-}
\ No newline at end of file
+    },
+    # Resultados de datos.gov.co compartidos entre workers (python manage.py createcachetable)
+    'datos_gov': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'datos_gov_cache',
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
+DATOS_GOV_CACHE_TTL = 3600
+DATOS_GOV_CACHE_MAX_BYTES = 256 * 1024 * 1024
+DATOS_GOV_CACHE_MAX_BYTES_COMPARTIDA = 8 * 1024 * 1024
+
+# Segundos que vive el catálogo PUC en memoria de cada worker (core.catalogo)
+PUC_CATALOGO_TTL = 600
+
+# Motor HTTP compartido hacia datos.gov.co (datosGov.motor)
+DATOS_GOV_MAX_CONEXIONES = 20
+DATOS_GOV_MAX_CONCURRENCIA = 8
+DATOS_GOV_SOLICITUDES_POR_SEGUNDO = 10
+DATOS_GOV_MAX_WORKERS = 16
+
+# Reportes en segundo plano (trabajos.cola). Los procesos web sólo encolan y los
+# ejecuta `manage.py procesar_trabajos`; TRABAJOS_EN_PROCESO = True los ejecuta
+# también en el proceso web (sólo para desarrollo).
+TRABAJOS_MAX_WORKERS = 2
+TRABAJOS_EN_PROCESO = False
+TRABAJOS_VENCIMIENTO = 1800
\ No newline at end of file
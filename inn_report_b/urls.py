@@ -10,6 +10,7 @@ from balSup.urls import urlpatterns_balSup
 from Resumen.urls import urlpatterns_Resumen
 from exchangeRates.urls import urlpatterns_exchangeRates
 from totalaccounts.urls import urlpatterns_totalAccounts
+from trabajos.urls import urlpatterns_trabajos
 
 from django.conf import settings
 from django.conf.urls.static import static
@@ -25,6 +26,7 @@ urlpatterns = [
     path('api/', include(urlpatterns_Resumen)),
     path('api/', include(urlpatterns_exchangeRates)),
     path('api/', include(urlpatterns_totalAccounts)),
+    path('api/', include(urlpatterns_trabajos)),
     path('api/', include(('core.routers', 'core'), namespace='core-api')),
 
 ]
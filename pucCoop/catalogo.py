@@ -0,0 +1,4 @@
+from core.catalogo import Catalogo
+from pucCoop.models import PucCoopModel
+
+catalogo = Catalogo(PucCoopModel, orden=("created_at",))
@@ -0,0 +1,4 @@
+from core.catalogo import Catalogo
+from pucSup.models import PucSupModel
+
+catalogo = Catalogo(PucSupModel)
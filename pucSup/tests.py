@@ -1,3 +1,25 @@
 from django.test import TestCase
 
-# Create your tests here.
+from pucSup.catalogo import catalogo
+from pucSup.models import PucSupModel
+
+
+class CatalogoTests(TestCase):
+    def setUp(self):
+        catalogo.invalidar()
+        self.cuenta = PucSupModel.objects.create(Codigo="100000", Descripcion="ACTIVO", CreditoRiesgo=0)
+
+    def test_escrituras_invalidan_el_catalogo(self):
+        self.assertEqual(catalogo.descripcion(100000), "ACTIVO")
+        self.cuenta.Descripcion = "ACTIVO TOTAL"
+        self.cuenta.save()
+        self.assertEqual(catalogo.descripcion(100000), "ACTIVO TOTAL")
+        PucSupModel.objects.create(Codigo="140000", Descripcion="CARTERA", CreditoRiesgo=0)
+        self.assertEqual(catalogo.descripcion("140000"), "CARTERA")
+        self.cuenta.delete()
+        self.assertEqual(catalogo.descripcion(100000), "Cuenta no encontrada")
+
+    def test_lecturas_sin_consultas(self):
+        catalogo.descripciones()
+        with self.assertNumQueries(0):
+            self.assertEqual(catalogo.descripcion("100000"), "ACTIVO")
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from balCoop.models import BalCoopCorteModel
+from balSup.models import BalSupCorteModel
+from totalaccounts.models import TotalSectorModel
+from totalaccounts.views import TIPO_SOLIDARIA, TIPOS_FINANCIERA, materializar_totales
+
+def meses_pendientes(cortes, tipos):
+    """Meses sincronizados que aún no están en total_sector, más el último (las
+    entidades reportan tarde y ese mes se vuelve a descargar)."""
+    cortes = sorted(set(cortes.order_by().values_list("periodo", "mes")))
+    guardados = set(
+        TotalSectorModel.objects.filter(tipo_entidad__in=tipos)
+        .order_by().values_list("periodo", "mes").distinct()
+    )
+    return [corte for corte in cortes if corte not in guardados or corte == cortes[-1]]
+
+class Command(BaseCommand):
+    help = "Calcula la tabla total_sector (totales por año, mes, TipoEntidad y cuenta) para los meses sincronizados."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--periodo", type=int, help="Año a recalcular.")
+        parser.add_argument("--mes", type=int, help="Mes a recalcular (requiere --periodo).")
+
+    def handle(self, *args, **options):
+        periodo = options.get("periodo")
+        mes = options.get("mes")
+        if mes and not periodo:
+            raise CommandError("--mes requiere --periodo.")
+
+        sectores = [
+            (BalSupCorteModel.objects.all(), TIPOS_FINANCIERA),
+            (BalCoopCorteModel.objects.all(), (TIPO_SOLIDARIA,)),
+        ]
+        total = 0
+        for cortes, tipos in sectores:
+            if periodo:
+                cortes = cortes.filter(periodo=periodo)
+                if mes:
+                    cortes = cortes.filter(mes=mes)
+                meses = sorted(set(cortes.order_by().values_list("periodo", "mes")))
+            else:
+                meses = meses_pendientes(cortes, tipos)
+            for periodo_corte, mes_corte in meses:
+                total += materializar_totales(periodo_corte, mes_corte, tipos)
+        self.stdout.write(self.style.SUCCESS(f"{total} totales materializados"))
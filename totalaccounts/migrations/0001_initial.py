@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TotalSectorModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.SmallIntegerField()),
+                ('mes', models.SmallIntegerField()),
+                ('tipo_entidad', models.SmallIntegerField()),
+                ('puc_codigo', models.CharField(max_length=128)),
+                ('saldo', models.DecimalField(decimal_places=2, max_digits=22)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'total_sector',
+                'unique_together': {('periodo', 'mes', 'tipo_entidad', 'puc_codigo')},
+            },
+        ),
+    ]
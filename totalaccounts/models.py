@@ -1,3 +1,15 @@
 from django.db import models
 
-# Create your models here.
+class TotalSectorModel(models.Model):
+    """Suma de una cuenta para todas las entidades de un TipoEntidad en un mes."""
+    periodo = models.SmallIntegerField()
+    mes = models.SmallIntegerField()
+    tipo_entidad = models.SmallIntegerField()
+    puc_codigo = models.CharField(max_length=128)
+    saldo = models.DecimalField(max_digits=22, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "total_sector"
+        unique_together = ('periodo', 'mes', 'tipo_entidad', 'puc_codigo')
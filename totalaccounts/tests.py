@@ -1,3 +1,82 @@
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
 from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from balSup.models import BalSupCorteModel, BalSupModel, ORIGEN_DATOS_GOV
+from balSup.views import BalSupApiView
+from totalaccounts.management.commands.materializar_totales_sector import meses_pendientes
+from totalaccounts.models import TotalSectorModel
+from totalaccounts.views import CUENTAS_TOTALES, TIPOS_FINANCIERA, TotalAccounts, materializar_totales, sumas_db, valores_cuentas
+
+
+class SumasDbTests(TestCase):
+    fila = {"periodo": 2024, "mes": 3, "entidad_RS": "BANCO DE PRUEBA", "puc_codigo": "100000", "saldo": "1500.00"}
+
+    def cargar(self, filas):
+        request = APIRequestFactory().post("/v1/bal_sup", {"extractedData": filas, "isStaff": True}, format="json")
+        return BalSupApiView.as_view()(request)
+
+    def sumas(self):
+        return dict(sumas_db(BalSupModel, 2024, 3, [100000], ["BANCO DE PRUEBA"]))
+
+    def test_carga_repetida_cuenta_una_vez(self):
+        self.cargar([self.fila])
+        self.cargar([self.fila])
+        self.assertEqual(BalSupModel.objects.count(), 2)
+        self.assertEqual(self.sumas(), {"100000": Decimal("1500.00")})
+
+    def test_prevalece_la_ultima_carga(self):
+        self.cargar([self.fila])
+        self.cargar([{**self.fila, "saldo": "1750.00"}])
+        self.assertEqual(self.sumas(), {"100000": Decimal("1750.00")})
+
+    def test_prevalece_datos_gov_sobre_la_carga(self):
+        self.cargar([self.fila])
+        self.cargar([self.fila])
+        BalSupModel.objects.create(**{**self.fila, "saldo": Decimal("2000.00"), "origen": ORIGEN_DATOS_GOV})
+        self.assertEqual(self.sumas(), {"100000": Decimal("2000.00")})
+
+
+class TotalesMaterializadosTests(TestCase):
+    def total(self, anio, mes, tipo, cuentas, completo=True):
+        return {
+            "año": anio,
+            "mes": mes,
+            "TipoEntidad": tipo,
+            "cuentas_sumadas": {nombre: Decimal(tipo * 100 + indice) for indice, nombre in enumerate(cuentas)},
+            "completo": completo,
+        }
+
+    def materializar(self, completo=True):
+        total = lambda *args: self.total(*args, completo=completo)
+        with mock.patch("totalaccounts.views.total_sector", side_effect=total):
+            return materializar_totales(2024, 3, TIPOS_FINANCIERA)
+
+    def test_guarda_todas_las_cuentas_de_cada_tipo(self):
+        self.assertEqual(self.materializar(), len(CUENTAS_TOTALES) * len(TIPOS_FINANCIERA))
+        self.assertEqual(self.materializar(), len(CUENTAS_TOTALES) * len(TIPOS_FINANCIERA))
+        fila = TotalSectorModel.objects.get(periodo=2024, mes=3, tipo_entidad=1, puc_codigo=str(valores_cuentas(1, "Cartera")))
+        self.assertEqual(fila.saldo, Decimal(102))
+
+    def test_consulta_incompleta_no_se_guarda(self):
+        self.assertEqual(self.materializar(completo=False), 0)
+        self.assertFalse(TotalSectorModel.objects.exists())
+
+    def test_la_vista_responde_desde_lo_guardado(self):
+        self.materializar()
+        datos = [{"anio": 2024, "mes": 3, "TipoEntidad": [1], "cuentas": ["Activos", "Cartera"]}]
+        request = APIRequestFactory().post("/v1/total_accounts", datos, format="json")
+        with mock.patch("totalaccounts.views.total_Financiera", side_effect=AssertionError("ya estaba materializado")) as total:
+            respuesta = TotalAccounts.as_view()(request)
+        total.assert_not_called()
+        self.assertEqual(respuesta.data["cuentas"]["Cartera"], {"Cooperativas Financieras": [{"anio": 2024, "mes": 3, "saldo": Decimal(102)}]})
 
-# Create your tests here.
+    def test_meses_pendientes(self):
+        for mes in (1, 2, 3):
+            BalSupCorteModel.objects.create(periodo=2024, mes=mes, fecha_corte=date(2024, mes, 28), registros=1)
+        for mes in (1, 3):
+            TotalSectorModel.objects.create(periodo=2024, mes=mes, tipo_entidad=1, puc_codigo="100000", saldo=Decimal(1))
+        self.assertEqual(meses_pendientes(BalSupCorteModel.objects.all(), TIPOS_FINANCIERA), [(2024, 2), (2024, 3)])
@@ -1,25 +1,21 @@
 import requests
-import concurrent.futures
-from time import sleep
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Q, Subquery, Sum
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
 from collections import defaultdict
-from decimal import Decimal, InvalidOperation
-
-from datetime import datetime, timedelta
+from decimal import Decimal
 
 from entidad.models import EntidadModel
-from balSup.models import BalSupModel
+from balSup.models import BalSupModel, ORIGEN_CARGA, ORIGEN_DATOS_GOV
 from balCoop.models import BalCoopModel
-
-def build_dates(periodo, mes):
-    fecha1 = datetime(periodo, mes, 1)
-    fecha2 = (fecha1 + timedelta(days=31)).replace(day=1) - timedelta(days=1)
-    return fecha1.strftime("%Y-%m-%dT00:00:00"), fecha2.strftime("%Y-%m-%dT23:59:59")
+from totalaccounts.models import TotalSectorModel
+from balSup.sync import consultar_saldos_api
+from balCoop.sync import get_api_details, obtener_saldos, saldos_completos
+from datosGov.motor import ejecutar_en_paralelo
 
 def tipo_entidad_str(codigo):
     entidad = {
@@ -99,121 +95,98 @@ def valores_cuentas_financiera(cuentas):
     else:
         return convertir(cuentas)
 
+# Respaldo en la base de datos. Las cuentas que la API no trae para una entidad
+# se toman de bal_sup/bal_coop, sumadas en la propia base de datos.
+
+def sumas_db(modelo, anio, mes, cuentas, entidades):
+    """(puc_codigo, SUM(saldo)) de las entidades dadas. Si una entidad tiene la misma
+    cuenta cargada a mano y desde datos.gov.co, sólo cuenta la de datos.gov.co; si la
+    cargaron a mano varias veces, sólo la última carga."""
+    misma_cuenta = dict(
+        periodo=OuterRef("periodo"),
+        mes=OuterRef("mes"),
+        entidad_RS=OuterRef("entidad_RS"),
+        puc_codigo=OuterRef("puc_codigo"),
+    )
+    duplicada = modelo.objects.filter(origen=ORIGEN_DATOS_GOV, **misma_cuenta)
+    ultima_carga = (
+        modelo.objects
+        .filter(origen=ORIGEN_CARGA, **misma_cuenta)
+        .order_by()
+        .values("puc_codigo")
+        .annotate(ultimo=Max("id"))
+        .values("ultimo")
+    )
+    return (
+        modelo.objects
+        .filter(periodo=anio, mes=mes, puc_codigo__in=[str(c) for c in cuentas], entidad_RS__in=entidades)
+        .exclude(Q(origen=ORIGEN_CARGA) & (Exists(duplicada) | ~Q(id=Subquery(ultima_carga))))
+        .order_by()
+        .values("puc_codigo")
+        .annotate(total=Sum("saldo"))
+        .values_list("puc_codigo", "total")
+    )
+
+def sumar_con_respaldo_db(modelo, anio, mes, data_entities, cuentas_num, razones_sociales):
+    """{codigo: suma} de los saldos de la API más, por cada cuenta, los de la base de
+    datos de las entidades a las que la API no se la trajo. Sin datos de la API se
+    toman de la base de datos todas las entidades."""
+    try:
+        mes = int(mes)
+    except ValueError:
+        print("❌ Error: El mes debe ser un número válido.")
+        return {}
+    cuentas = [int(c) for c in cuentas_num]
+    if not data_entities:
+        data_entities = {nombre: {} for nombre in razones_sociales}
+
+    sumas = {}
+    faltantes = defaultdict(list)
+    for entidad, cuentas_existentes in data_entities.items():
+        presentes = set()
+        for cuenta, valor in cuentas_existentes.items():
+            codigo = int(cuenta)
+            if not isinstance(valor, Decimal):
+                valor = Decimal(str(valor))
+            sumas[codigo] = sumas.get(codigo, Decimal(0)) + valor
+            presentes.add(codigo)
+        for codigo in cuentas:
+            if codigo not in presentes:
+                faltantes[codigo].append(entidad.strip())
+
+    # Las cuentas a las que les faltan las mismas entidades se suman en una sola consulta.
+    consultas = defaultdict(list)
+    for codigo, entidades in faltantes.items():
+        consultas[frozenset(entidades)].append(codigo)
+        sumas.setdefault(codigo, Decimal(0))
+    for entidades, codigos in consultas.items():
+        for puc_codigo, total in sumas_db(modelo, anio, mes, codigos, entidades):
+            sumas[int(puc_codigo)] += total
+    return dict(sorted(sumas.items()))
+
 # Financiera
 
 def get_api_financiera(anio, mes, puc_codes, entities):
-    
-    fecha1_str, fecha2_str = build_dates(anio, mes)
-    
-    saldos = defaultdict(lambda: defaultdict(Decimal))
-    puc_codes_str = ','.join(f"'{code}'" for code in puc_codes)
-    entities = ','.join(f"'{entity}'" for entity in entities)
-    url = f"https://www.datos.gov.co/resource/mxk5-ce6w.json?$limit=100000&$where=fecha_corte BETWEEN '{fecha1_str}' AND '{fecha2_str}' AND NOMBRE_ENTIDAD IN ({entities}) AND cuenta IN ({puc_codes_str}) AND moneda ='0'"
+    """(saldos, completo): completo es False si la consulta a la API falló y todo sale
+    del respaldo en la base de datos."""
+    if not entities:
+        return defaultdict(lambda: defaultdict(Decimal)), True
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        all_data = response.json()
-        for result in all_data:
-            razon_social = result.get("nombre_entidad")
-            cuenta = result.get("cuenta")
-            total_saldo = Decimal(result.get("valor", 0))
-            saldos[razon_social][cuenta] += total_saldo
+        return consultar_saldos_api([(anio, mes)], puc_codes, entities)[(anio, mes)], True
     except requests.RequestException as e:
         print(f"Error al obtener saldos: {e}")
-
-    return saldos
+        return defaultdict(lambda: defaultdict(Decimal)), False
 
 def get_db_financiera(anio, mes, data_entities, cuentas_num, razones_sociales):
+    return sumar_con_respaldo_db(BalSupModel, anio, mes, data_entities, cuentas_num, razones_sociales)
 
-    def limpiar_entidades(data):
-        return [ent.strip() for ent in data.keys()]
-
-    def convertir_cuentas(cuentas):
-        return [int(c) for c in cuentas]
-
-    def convertir_mes(mes_valor):
-        try:
-            return int(mes_valor)
-        except ValueError:
-            print("❌ Error: El mes debe ser un número válido.")
-            return None
-
-    def consultar_db(entidades, cuentas, anio, mes):
-        return BalSupModel.objects.filter(
-            Q(periodo=anio, mes=mes),
-            puc_codigo__in=[str(c) for c in cuentas],
-            entidad_RS__in=entidades
-        ).values("entidad_RS", "puc_codigo", "saldo")
-
-    def estructurar_db_resultado(queryset):
-        datos = {}
-        for item in queryset:
-            entidad = item["entidad_RS"]
-            cuenta = int(item["puc_codigo"])
-            saldo = float(item["saldo"])
-
-            if entidad not in datos:
-                datos[entidad] = {}
-            datos[entidad][cuenta] = saldo
-        return datos
-
-    def completar_cuentas(data_entities, db_data, cuentas_num):
-        resultado = {}
-
-        for entidad, cuentas_existentes in data_entities.items():
-            cuentas_entidad = {int(k): v for k, v in cuentas_existentes.items()}
-            
-            for cuenta in cuentas_num:
-                if cuenta not in cuentas_entidad:
-                    cuentas_entidad[cuenta] = db_data.get(entidad, {}).get(cuenta, 0.0)
-            cuentas_ordenadas = dict(sorted(cuentas_entidad.items()))
-
-            resultado[entidad] = cuentas_ordenadas
-
-        return resultado
-
-    # Inicio del proceso
-    entidades_list = limpiar_entidades(data_entities)
-    cuentas_num = convertir_cuentas(cuentas_num)
-    mes = convertir_mes(mes)
-    if mes is None:
-        return {}
-    
-    if not entidades_list:
-        entidades_list = razones_sociales
-        data_entities  = {
-        nombre: defaultdict(Decimal)
-        for nombre in razones_sociales
-        }
-
-    resultados_db = consultar_db(entidades_list, cuentas_num, anio, mes)
-    db_data = estructurar_db_resultado(resultados_db)
-    resultado_final = completar_cuentas(data_entities, db_data, cuentas_num)
-
-    return resultado_final
-
-def sumar_cuentas_financiera(año, mes, tipoEntidad, datosFinanciera):
-    sumas = {}
-    
-    for institucion in datosFinanciera.values():
-        for cuenta, valor in institucion.items():
-            
-            codigo_int = int(cuenta)
-            nombre_cuenta = valores_cuentas_financiera(codigo_int)
-            
-            if not isinstance(valor, Decimal):
-                valor = Decimal(str(valor))
-            
-            if nombre_cuenta in sumas:
-                sumas[nombre_cuenta] += valor
-            else:
-                sumas[nombre_cuenta] = valor
-    
+def sumar_cuentas_financiera(año, mes, tipoEntidad, sumasPorCodigo, completo=True):
     return {
         "año": año,
         "mes": mes,
         "TipoEntidad": tipoEntidad,
-        "cuentas_sumadas": sumas
+        "cuentas_sumadas": {valores_cuentas_financiera(codigo): saldo for codigo, saldo in sumasPorCodigo.items()},
+        "completo": completo,
     }
 
 def total_Financiera(anio, mes, tipoEntidad, cuenta):
@@ -224,86 +197,22 @@ def total_Financiera(anio, mes, tipoEntidad, cuenta):
 
     cuenta_numeros = valores_cuentas_financiera(cuenta)
 
-    resultadoDatosApi = get_api_financiera(anio, mes, cuenta_numeros, razones_sociales)
+    resultadoDatosApi, completo = get_api_financiera(anio, mes, cuenta_numeros, razones_sociales)
 
     resultadofinal = get_db_financiera(anio, mes, resultadoDatosApi, cuenta_numeros, razones_sociales)
 
-    resultadofinalsumado = sumar_cuentas_financiera(anio, mes, tipo_entidad_str(tipoEntidad), resultadofinal)
+    resultadofinalsumado = sumar_cuentas_financiera(anio, mes, tipo_entidad_str(tipoEntidad), resultadofinal, completo)
 
     return resultadofinalsumado
 
 # Solidaria
 
 def get_url_solidaria(periodo):
-    if periodo == 2020:
-        return ("https://www.datos.gov.co/resource/78xz-k3hv.json?$limit=100000", 'codcuenta')
-    elif periodo == 2021:
-        return ("https://www.datos.gov.co/resource/irgu-au8v.json?$limit=100000", 'codrenglon')
-    else:
-        return ("https://www.datos.gov.co/resource/tic6-rbue.json?$limit=100000", 'codrenglon')
-
-def clean_currency_value_Decimal(value):
-    try:
-        cleaned_value = value.replace('$', '').replace(',', '').strip()
-        
-        if cleaned_value.startswith('-'):
-            cleaned_value = '-' + cleaned_value[1:].replace(' ', '')
-        else:
-            cleaned_value = cleaned_value.replace(' ', '')
-
-        return Decimal(cleaned_value)
-    except InvalidOperation:
-        # print(f"Error convirtiendo el valor: {value}")
-        return Decimal(0)
-
-def get_month_name(month_number):
-    month_names = [
-        "ENERO", "FEBRERO", "MARZO", "ABRIL",
-        "MAYO", "JUNIO", "JULIO", "AGOSTO",
-        "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"
-    ]
-    
-    if 1 <= month_number <= 12:
-        return month_names[month_number - 1]
-    else:
-        raise ValueError("Número de mes inválido. Debe estar entre 1 y 12.")
+    return get_api_details(periodo)
 
 def get_api_solidaria(anio, mes, cuenta_numeros, formatted_nits_dvs):
-    
-    base_url, campo_cuenta = get_url_solidaria(anio)
-    
-    mes_str = get_month_name(mes)
-    
-    saldos = defaultdict(lambda: defaultdict(Decimal))
-    puc_codes_str = ','.join(f"'{code}'" for code in cuenta_numeros)
-    formatted_nits_dvs_str = ','.join(f"'{nit_dv}'" for nit_dv in formatted_nits_dvs)
-    url = f"{base_url}&$where=a_o='{anio}' AND mes='{mes_str}' AND nit IN({formatted_nits_dvs_str}) AND {campo_cuenta} IN ({puc_codes_str})"
-
-    max_retries = 20
-    retry_delay = 2
-    
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            all_data = response.json()
-            print(f"TOTALES Obtenidos {len(all_data)} registros de la API para el periodo {anio} y mes {mes} en el intento {attempt + 1}")
-            if all_data:
-                for result in all_data:
-                    nit = result.get("nit")
-                    cuenta = result.get(campo_cuenta)
-                    valor_en_pesos = clean_currency_value_Decimal(result.get('valor_en_pesos', '0'))
-                    saldos[nit][cuenta] += valor_en_pesos
-            break
-
-        except requests.exceptions.Timeout:
-            print(f"TOTALES Timeout en intento {attempt + 1}/{max_retries}")
-            if attempt < max_retries - 1:
-                sleep(retry_delay)
-        except requests.RequestException as e:
-            print(f"TOTALES Error no manejado en el intento {attempt + 1}: {e}")
-            break
-
+    saldos = obtener_saldos(anio, mes, cuenta_numeros, formatted_nits_dvs)
+    print(f"TOTALES Obtenidos saldos de {len(saldos)} entidades para el periodo {anio} y mes {mes}")
     return saldos
 
 def get_db_solidaria(anio, mes, data_entities, cuentas_num, razones_sociales, nit_a_razon_social):
@@ -317,96 +226,16 @@ def get_db_solidaria(anio, mes, data_entities, cuentas_num, razones_sociales, ni
                 print(f"Advertencia: NIT {nit} no encontrado y se mantiene")
         return data
 
-    def limpiar_entidades(data):
-        return [ent.strip() for ent in data.keys()]
-
-    def convertir_cuentas(cuentas):
-        return [int(c) for c in cuentas]
-
-    def convertir_mes(mes_valor):
-        try:
-            return int(mes_valor)
-        except ValueError:
-            print("❌ Error: El mes debe ser un número válido.")
-            return None
-
-    def consultar_db(entidades, cuentas, anio, mes):
-        return BalCoopModel.objects.filter(
-            Q(periodo=anio, mes=mes),
-            puc_codigo__in=[str(c) for c in cuentas],
-            entidad_RS__in=entidades
-        ).values("entidad_RS", "puc_codigo", "saldo")
-
-    def estructurar_db_resultado(queryset):
-        datos = {}
-        for item in queryset:
-            entidad = item["entidad_RS"]
-            cuenta = int(item["puc_codigo"])
-            saldo = float(item["saldo"])
-
-            if entidad not in datos:
-                datos[entidad] = {}
-            datos[entidad][cuenta] = saldo
-        return datos
-
-    def completar_cuentas(data_entities, db_data, cuentas_num):
-        resultado = {}
-
-        for entidad, cuentas_existentes in data_entities.items():
-            cuentas_entidad = {int(k): v for k, v in cuentas_existentes.items()}
-            
-            for cuenta in cuentas_num:
-                if cuenta not in cuentas_entidad:
-                    cuentas_entidad[cuenta] = db_data.get(entidad, {}).get(cuenta, 0.0)
-            cuentas_ordenadas = dict(sorted(cuentas_entidad.items()))
-
-            resultado[entidad] = cuentas_ordenadas
-
-        return resultado
-
-    # Inicio del proceso
     data_entities = nits_razon(data_entities, nit_a_razon_social)
-    
-    entidades_list = limpiar_entidades(data_entities)
-    cuentas_num = convertir_cuentas(cuentas_num)
-    mes = convertir_mes(mes)
-    if mes is None:
-        return {}
-
-    if not entidades_list:
-        entidades_list = razones_sociales
-        data_entities  = {
-        nombre: defaultdict(Decimal)
-        for nombre in razones_sociales
-        }
-
-    resultados_db = consultar_db(entidades_list, cuentas_num, anio, mes)
-    db_data = estructurar_db_resultado(resultados_db)
-    resultado_final = completar_cuentas(data_entities, db_data, cuentas_num)
-
-    return resultado_final
+    return sumar_con_respaldo_db(BalCoopModel, anio, mes, data_entities, cuentas_num, razones_sociales)
 
-def sumar_cuentas_Solidaria(año, mes, tipoEntidad, datosFinanciera):
-    sumas = {}
-    
-    for institucion in datosFinanciera.values():
-        for cuenta, valor in institucion.items():
-            
-            codigo_int = int(cuenta)
-            nombre_cuenta = valores_cuentas_solidaria(codigo_int)
-            
-            if not isinstance(valor, Decimal):
-                valor = Decimal(str(valor))
-            if nombre_cuenta in sumas:
-                sumas[nombre_cuenta] += valor
-            else:
-                sumas[nombre_cuenta] = valor
-    
+def sumar_cuentas_Solidaria(año, mes, tipoEntidad, sumasPorCodigo, completo=True):
     return {
         "año": año,
         "mes": mes,
         "TipoEntidad": tipoEntidad,
-        "cuentas_sumadas": sumas
+        "cuentas_sumadas": {valores_cuentas_solidaria(codigo): saldo for codigo, saldo in sumasPorCodigo.items()},
+        "completo": completo,
     }
 
 def total_solidaria(anio, mes, tipoEntidad, cuenta):
@@ -428,14 +257,113 @@ def total_solidaria(anio, mes, tipoEntidad, cuenta):
     cuenta_numeros = valores_cuentas_solidaria(cuenta)
 
     resultadoDatosApi = get_api_solidaria(anio, mes, cuenta_numeros, nits_formateados)
+    completo = saldos_completos(resultadoDatosApi)
+    # El espejo local también devuelve cargas manuales de otros tipos de entidad
+    resultadoDatosApi = {
+        clave: saldos for clave, saldos in resultadoDatosApi.items()
+        if clave in nit_a_razon_social or clave in razones_sociales
+    }
     
     resultadofinal = get_db_solidaria(anio, mes, resultadoDatosApi, cuenta_numeros, razones_sociales, nit_a_razon_social)
     
-    resultadofinalsumado = sumar_cuentas_Solidaria(anio, mes, tipo_entidad_str(tipoEntidad), resultadofinal)
+    resultadofinalsumado = sumar_cuentas_Solidaria(anio, mes, tipo_entidad_str(tipoEntidad), resultadofinal, completo)
 
     return resultadofinalsumado
 
 
+# Totales materializados. Los totales de un mes cerrado no cambian, así que un
+# comando los guarda en total_sector y la vista los lee en una sola consulta;
+# lo que no esté guardado se calcula como antes.
+
+TIPOS_FINANCIERA = (0, 1, 3)
+TIPO_SOLIDARIA = 2
+CUENTAS_TOTALES = [
+    "Activos", "Disponible", "Cartera", "Pasivos", "Deposito", "Obligaciones Financieras",
+    "Patrimonio", "Capital Social", "Excedentes", "Ingresos", "Gastos", "Costos"
+]
+
+def valores_cuentas(tipoEntidad, cuentas):
+    if tipoEntidad == TIPO_SOLIDARIA:
+        return valores_cuentas_solidaria(cuentas)
+    return valores_cuentas_financiera(cuentas)
+
+def total_sector(anio, mes, tipoEntidad, cuenta):
+    if tipoEntidad == TIPO_SOLIDARIA:
+        return total_solidaria(anio, mes, tipoEntidad, cuenta)
+    return total_Financiera(anio, mes, tipoEntidad, cuenta)
+
+def materializar_totales(periodo, mes, tipos):
+    """Recalcula y reemplaza en total_sector todas las cuentas de los tipos dados. Si
+    la consulta a datos.gov.co de algún tipo quedó incompleta no guarda el mes."""
+    filas = []
+    for tipo in tipos:
+        total = total_sector(periodo, mes, tipo, CUENTAS_TOTALES)
+        if not total["completo"]:
+            print(f"TOTALES {periodo}-{mes:02d}: consulta incompleta para {tipo_entidad_str(tipo)}, no se materializa")
+            return 0
+        sumas = total["cuentas_sumadas"]
+        filas.extend(
+            TotalSectorModel(
+                periodo=periodo,
+                mes=mes,
+                tipo_entidad=tipo,
+                puc_codigo=str(valores_cuentas(tipo, nombre)),
+                saldo=saldo,
+            )
+            for nombre, saldo in sumas.items()
+        )
+    with transaction.atomic():
+        TotalSectorModel.objects.filter(periodo=periodo, mes=mes, tipo_entidad__in=tipos).delete()
+        TotalSectorModel.objects.bulk_create(filas)
+    print(f"TOTALES {periodo}-{mes:02d}: {len(filas)} cuentas")
+    return len(filas)
+
+def totales_guardados(data):
+    """{(anio, mes, tipo): {puc_codigo: saldo}} de total_sector para todos los items
+    de la solicitud, en una sola consulta."""
+    claves = set()
+    for item in data:
+        tipos = item.get("TipoEntidad", [])
+        try:
+            anio, mes = int(item.get("anio")), int(item.get("mes"))
+        except (TypeError, ValueError):
+            continue
+        for tipo in tipos if isinstance(tipos, list) else [tipos]:
+            claves.add((anio, mes, tipo))
+    if not claves:
+        return {}
+
+    guardados = defaultdict(dict)
+    filas = TotalSectorModel.objects.filter(
+        periodo__in={anio for anio, _, _ in claves},
+        mes__in={mes for _, mes, _ in claves},
+        tipo_entidad__in={tipo for _, _, tipo in claves},
+    ).values_list("periodo", "mes", "tipo_entidad", "puc_codigo", "saldo")
+    for periodo, mes, tipo, puc_codigo, saldo in filas:
+        if (periodo, mes, tipo) in claves:
+            guardados[(periodo, mes, tipo)][puc_codigo] = saldo
+    return guardados
+
+def total_guardado(guardados, anio, mes, tipoEntidad, cuentas):
+    """El mismo resultado que total_Financiera/total_solidaria a partir de
+    total_sector, o None si falta alguna de las cuentas pedidas."""
+    if not isinstance(cuentas, list):
+        return None
+    try:
+        saldos = guardados.get((int(anio), int(mes), tipoEntidad))
+        codigos = {nombre: str(valores_cuentas(tipoEntidad, nombre)) for nombre in cuentas}
+    except (TypeError, ValueError):
+        return None
+    if not saldos or any(codigo not in saldos for codigo in codigos.values()):
+        return None
+    return {
+        "año": anio,
+        "mes": mes,
+        "TipoEntidad": tipo_entidad_str(tipoEntidad),
+        "cuentas_sumadas": {nombre: saldos[codigo] for nombre, codigo in codigos.items()},
+        "completo": True,
+    }
+
 def ordenar_datos(data_cruda, cuentita):
     # Estructura base del resultado
     resultado = {
@@ -480,16 +408,11 @@ class TotalAccounts(APIView):
         resultados_totales = []
 
         bloques = self.dividir_en_bloques(data)
+        guardados = totales_guardados(data)
 
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = [
-                executor.submit(self.procesar_bloque, bloque)
-                for bloque in bloques
-            ]
-            for future in concurrent.futures.as_completed(futures):
-                bloque_resultado = future.result()
-                if bloque_resultado:
-                    resultados_totales.extend(bloque_resultado)
+        for bloque_resultado in ejecutar_en_paralelo(self.procesar_bloque, bloques, guardados):
+            if bloque_resultado:
+                resultados_totales.extend(bloque_resultado)
 
         cuentas_disponibles = data[0].get("cuentas") if data else []
         resultado_final = ordenar_datos(resultados_totales, cuentas_disponibles)
@@ -499,7 +422,7 @@ class TotalAccounts(APIView):
     def dividir_en_bloques(self, datos):
         return [[item] for item in datos]
 
-    def procesar_bloque(self, bloque):
+    def procesar_bloque(self, bloque, guardados):
         resultados = []
 
         for item in bloque:
@@ -514,7 +437,10 @@ class TotalAccounts(APIView):
                 tipo_entidad = [tipo_entidad]
 
             for num in tipo_entidad:
-                if num in (0, 1, 3):
+                resultadoGuardado = total_guardado(guardados, anio, mes, num, cuentas_disponibles)
+                if resultadoGuardado:
+                    resultados.append(resultadoGuardado)
+                elif num in (0, 1, 3):
                     resultadoFinanciera = total_Financiera(anio, mes, num, cuentas_disponibles)
                     resultados.append(resultadoFinanciera)
                 elif num == 2:
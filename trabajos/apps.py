@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class TrabajosConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'trabajos'
+
+    def ready(self):
+        # Registra los reportes que se pueden pedir como trabajo (<app>.reportes).
+        autodiscover_modules('reportes')
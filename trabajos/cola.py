@@ -0,0 +1,155 @@
+import logging
+import os
+import socket
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from datosGov.motor import completados_en_paralelo
+from trabajos.models import EN_PROCESO, ERROR, PENDIENTE, TERMINADO, TrabajoModel, TrabajoParcialModel
+from trabajos.registro import obtener
+
+# Cola de trabajos respaldada por la base de datos. La vista crea el trabajo en
+# estado pendiente y responde de inmediato; el comando procesar_trabajos (o, si se
+# activa TRABAJOS_EN_PROCESO, un pool local) lo toma con un update condicional, de
+# modo que dos workers nunca ejecutan el mismo trabajo, y guarda las filas de
+# cada mes apenas se calculan para que el cliente las lea mientras avanza.
+
+MAX_WORKERS = getattr(settings, "TRABAJOS_MAX_WORKERS", 2)
+# Con True los procesos web también ejecutan los trabajos que crean. Lo que quede en
+# su pool se pierde si el proceso se reinicia hasta que lo tome procesar_trabajos.
+EN_PROCESO_WEB = getattr(settings, "TRABAJOS_EN_PROCESO", False)
+# Segundos sin avance tras los que un trabajo en proceso se da por abandonado.
+VENCIMIENTO = getattr(settings, "TRABAJOS_VENCIMIENTO", 1800)
+# Segundos entre renovaciones de updated_at mientras un worker calcula un mes.
+INTERVALO_LATIDO = getattr(settings, "TRABAJOS_LATIDO", 60)
+
+logger = logging.getLogger('django')
+
+class TrabajoTomado(Exception):
+    """Otro worker reencoló y tomó el trabajo mientras este lo calculaba."""
+
+ejecutor_trabajos = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="trabajos")
+
+def nombre_worker():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def crear_trabajo(reporte, datos, opciones):
+    trabajo = TrabajoModel.objects.create(
+        reporte=reporte,
+        parametros={"datos": datos, "opciones": opciones},
+        total=len(datos),
+    )
+    if EN_PROCESO_WEB:
+        transaction.on_commit(lambda: encolar(trabajo.id))
+    return trabajo
+
+def encolar(trabajo_id):
+    ejecutor_trabajos.submit(ejecutar_trabajo, trabajo_id)
+
+def tomar(trabajo_id, worker):
+    """Pasa el trabajo de pendiente a en proceso; False si otro worker lo tomó."""
+    ahora = timezone.now()
+    return TrabajoModel.objects.filter(id=trabajo_id, estado=PENDIENTE).update(
+        estado=EN_PROCESO, worker=worker, iniciado_at=ahora, updated_at=ahora,
+    ) == 1
+
+def finalizar(trabajo_id, worker, estado, error=None):
+    ahora = timezone.now()
+    TrabajoModel.objects.filter(id=trabajo_id, worker=worker, estado=EN_PROCESO).update(
+        estado=estado, error=error, terminado_at=ahora, updated_at=ahora,
+    )
+
+def latido(trabajo_id, worker):
+    """Renueva updated_at si el trabajo sigue en proceso en este worker."""
+    return TrabajoModel.objects.filter(id=trabajo_id, worker=worker, estado=EN_PROCESO).update(
+        updated_at=timezone.now(),
+    ) == 1
+
+@contextmanager
+def latiendo(trabajo_id, worker):
+    """Late en un hilo aparte mientras dura el bloque, para que reencolar_vencidos
+    no dé por abandonado un trabajo cuyo mes tarda más que VENCIMIENTO."""
+    detenido = threading.Event()
+
+    def latir():
+        try:
+            while not detenido.wait(INTERVALO_LATIDO):
+                if not latido(trabajo_id, worker):
+                    return
+        except Exception:
+            logger.exception("Error renovando el trabajo %s", trabajo_id)
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=latir, name=f"latido-{trabajo_id}", daemon=True).start()
+    try:
+        yield
+    finally:
+        detenido.set()
+
+def calcular_mes(item, reporte, opciones):
+    return reporte.calcular([item], opciones)
+
+def ejecutar_trabajo(trabajo_id, worker=None):
+    """Calcula los meses pendientes del trabajo en el pool compartido y guarda cada
+    uno en cuanto termina. Retoma los meses ya guardados si el trabajo se reencoló y
+    se detiene sin tocarlo si otro worker lo tomó mientras tanto."""
+    close_old_connections()
+    worker = worker or nombre_worker()
+    try:
+        if not tomar(trabajo_id, worker):
+            return False
+        try:
+            trabajo = TrabajoModel.objects.get(id=trabajo_id)
+            reporte = obtener(trabajo.reporte)
+            datos = trabajo.parametros.get("datos", [])
+            opciones = trabajo.parametros.get("opciones", {})
+            hechos = set(trabajo.parciales.values_list("indice", flat=True))
+            pendientes = [indice for indice in range(len(datos)) if indice not in hechos]
+            secuencia = len(hechos)
+            items = [datos[indice] for indice in pendientes]
+            with latiendo(trabajo_id, worker):
+                for posicion, filas in completados_en_paralelo(calcular_mes, items, reporte, opciones):
+                    indice = pendientes[posicion]
+                    secuencia += 1
+                    with transaction.atomic():
+                        # El update bloquea la fila del trabajo, así que el parcial
+                        # sólo se guarda si este worker todavía lo tiene.
+                        if not TrabajoModel.objects.filter(id=trabajo_id, worker=worker, estado=EN_PROCESO).update(
+                            completados=secuencia, updated_at=timezone.now(),
+                        ):
+                            raise TrabajoTomado()
+                        TrabajoParcialModel.objects.create(
+                            trabajo_id=trabajo_id,
+                            secuencia=secuencia,
+                            indice=indice,
+                            periodo=int(datos[indice].get("periodo")),
+                            mes=int(datos[indice].get("mes")),
+                            filas=filas,
+                        )
+        except TrabajoTomado:
+            logger.warning("El trabajo %s pasó a otro worker; %s se detiene", trabajo_id, worker)
+            return False
+        except Exception as e:
+            logger.exception("Error en el trabajo %s", trabajo_id)
+            finalizar(trabajo_id, worker, ERROR, str(e))
+            return False
+        finalizar(trabajo_id, worker, TERMINADO)
+        return True
+    finally:
+        close_old_connections()
+
+def reencolar_vencidos():
+    """Devuelve a pendiente los trabajos en proceso sin avance reciente (el proceso
+    que los tenía murió)."""
+    limite = timezone.now() - timedelta(seconds=VENCIMIENTO)
+    return TrabajoModel.objects.filter(estado=EN_PROCESO, updated_at__lt=limite).update(
+        estado=PENDIENTE, worker=None, updated_at=timezone.now(),
+    )
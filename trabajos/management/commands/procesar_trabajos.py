@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from trabajos.cola import ejecutar_trabajo, nombre_worker, reencolar_vencidos
+from trabajos.models import PENDIENTE, TrabajoModel
+
+class Command(BaseCommand):
+    help = "Ejecuta los trabajos pendientes (reportes en segundo plano) en este proceso."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--intervalo", type=float, default=2, help="Segundos entre revisiones de la cola.")
+        parser.add_argument("--una-vez", action="store_true", help="Procesa lo pendiente y termina.")
+
+    def handle(self, *args, **options):
+        worker = nombre_worker()
+        while True:
+            reencolados = reencolar_vencidos()
+            if reencolados:
+                self.stdout.write(f"{reencolados} trabajos vencidos reencolados")
+            pendientes = list(
+                TrabajoModel.objects.filter(estado=PENDIENTE)
+                .order_by("created_at").values_list("id", flat=True)
+            )
+            for trabajo_id in pendientes:
+                if ejecutar_trabajo(trabajo_id, worker):
+                    self.stdout.write(self.style.SUCCESS(f"Trabajo {trabajo_id} terminado"))
+            if options["una_vez"]:
+                return
+            if not pendientes:
+                time.sleep(options["intervalo"])
@@ -0,0 +1,55 @@
+# Generated by Django 5.2 on 2026-10-18 10:09
+
+import django.core.serializers.json
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoModel',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('reporte', models.CharField(max_length=60)),
+                ('parametros', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('terminado', 'Terminado'), ('error', 'Error')], default='pendiente', max_length=12)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('completados', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('worker', models.CharField(blank=True, max_length=120, null=True)),
+                ('iniciado_at', models.DateTimeField(blank=True, null=True)),
+                ('terminado_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'trabajo',
+                'indexes': [models.Index(fields=['estado', 'created_at'], name='trabajo_estado_c9e9bf_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrabajoParcialModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('secuencia', models.PositiveIntegerField()),
+                ('indice', models.PositiveIntegerField()),
+                ('periodo', models.SmallIntegerField()),
+                ('mes', models.SmallIntegerField()),
+                ('filas', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('trabajo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parciales', to='trabajos.trabajomodel')),
+            ],
+            options={
+                'db_table': 'trabajo_parcial',
+                'unique_together': {('trabajo', 'secuencia')},
+            },
+        ),
+    ]
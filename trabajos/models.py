@@ -0,0 +1,51 @@
+import uuid
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+PENDIENTE = "pendiente"
+EN_PROCESO = "en_proceso"
+TERMINADO = "terminado"
+ERROR = "error"
+
+ESTADOS = [
+    (PENDIENTE, "Pendiente"),
+    (EN_PROCESO, "En proceso"),
+    (TERMINADO, "Terminado"),
+    (ERROR, "Error"),
+]
+
+class TrabajoModel(models.Model):
+    """Reporte pedido en segundo plano. parametros guarda el cuerpo de la solicitud
+    (datos, un item por mes) y las opciones del reporte."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    reporte = models.CharField(max_length=60)
+    parametros = models.JSONField(encoder=DjangoJSONEncoder)
+    estado = models.CharField(max_length=12, choices=ESTADOS, default=PENDIENTE)
+    total = models.PositiveIntegerField(default=0)
+    completados = models.PositiveIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    worker = models.CharField(max_length=120, null=True, blank=True)
+    iniciado_at = models.DateTimeField(null=True, blank=True)
+    terminado_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "trabajo"
+        indexes = [models.Index(fields=["estado", "created_at"])]
+
+class TrabajoParcialModel(models.Model):
+    """Filas de un mes del trabajo. secuencia es el orden de llegada (lo que el
+    cliente pide con ?desde=) e indice la posición del mes en los datos."""
+    trabajo = models.ForeignKey(TrabajoModel, on_delete=models.CASCADE, related_name="parciales")
+    secuencia = models.PositiveIntegerField()
+    indice = models.PositiveIntegerField()
+    periodo = models.SmallIntegerField()
+    mes = models.SmallIntegerField()
+    filas = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "trabajo_parcial"
+        unique_together = ('trabajo', 'secuencia')
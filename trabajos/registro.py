@@ -0,0 +1,31 @@
+# Registro de reportes que se pueden ejecutar como trabajo. Cada app los declara
+# en su módulo reportes.py; TrabajosConfig.ready importa esos módulos al arrancar.
+# Los reportes con publico=False sólo los encola el propio backend (por ejemplo,
+# el recálculo de indicadores tras una carga), no la API de trabajos.
+
+reportes = {}
+
+class Reporte:
+    def __init__(self, nombre, vista, opciones=None, publico=True):
+        self.nombre = nombre
+        self.vista = vista
+        self.leer_opciones = opciones
+        self.publico = publico
+
+    def opciones(self, request):
+        """Opciones del reporte leídas de la solicitud (guardables en JSON). Lanza
+        ValueError si no son válidas."""
+        return self.leer_opciones(request) if self.leer_opciones else {}
+
+    def calcular(self, datos, opciones):
+        """Filas del reporte para los meses de datos, igual que la vista síncrona."""
+        return self.vista().calcular(datos, **opciones)
+
+def registrar(nombre, vista, opciones=None, publico=True):
+    if nombre in reportes:
+        raise ValueError(f"El reporte {nombre} ya está registrado")
+    reportes[nombre] = Reporte(nombre, vista, opciones, publico)
+    return reportes[nombre]
+
+def obtener(nombre):
+    return reportes[nombre]
@@ -0,0 +1,135 @@
+import json
+
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from trabajos import cola, views
+from trabajos.models import EN_PROCESO, ERROR, PENDIENTE, TERMINADO, TrabajoModel, TrabajoParcialModel
+from trabajos.registro import registrar, reportes
+from trabajos.views import TrabajoApiViewCrear, TrabajoApiViewDetail, TrabajoApiViewStream
+
+class VistaPrueba:
+    def calcular(self, datos, factor=1):
+        for item in datos:
+            if item["mes"] == 13:
+                raise ValueError("mes inválido")
+        return [{"periodo": item["periodo"], "mes": item["mes"], "valor": item["mes"] * factor} for item in datos]
+
+def opciones_prueba(request):
+    try:
+        return {"factor": int(request.query_params.get("factor", 1))}
+    except ValueError:
+        raise ValueError("factor debe ser un entero.")
+
+if "pruebas/reporte" not in reportes:
+    registrar("pruebas/reporte", VistaPrueba, opciones_prueba)
+
+MESES = [{"periodo": 2024, "mes": mes} for mes in (1, 2, 3)]
+
+
+class TrabajosTests(TestCase):
+    factory = APIRequestFactory()
+
+    def crear(self, datos=MESES, reporte="pruebas/reporte", consulta=""):
+        request = self.factory.post(f"/v1/trabajos/{reporte}{consulta}", datos, format="json")
+        return TrabajoApiViewCrear.as_view()(request, reporte=reporte)
+
+    def detalle(self, trabajo_id, desde=0):
+        request = self.factory.get(f"/v1/trabajos/{trabajo_id}", {"desde": desde})
+        return TrabajoApiViewDetail.as_view()(request, trabajo_id=trabajo_id)
+
+    def test_crear_responde_202_sin_calcular(self):
+        respuesta = self.crear(consulta="?factor=10")
+        self.assertEqual(respuesta.status_code, 202)
+        trabajo = TrabajoModel.objects.get(id=respuesta.data["id"])
+        self.assertEqual((trabajo.estado, trabajo.total, trabajo.completados), (PENDIENTE, 3, 0))
+        self.assertEqual(trabajo.parametros, {"datos": MESES, "opciones": {"factor": 10}})
+
+    def test_crear_no_ejecuta_en_el_proceso_web(self):
+        with mock.patch.object(cola, "encolar") as encolar, self.captureOnCommitCallbacks(execute=True):
+            self.crear()
+        encolar.assert_not_called()
+
+    def test_crear_valida_la_solicitud(self):
+        self.assertEqual(self.crear(reporte="pruebas/no_existe").status_code, 404)
+        self.assertEqual(self.crear(datos=[]).status_code, 400)
+        self.assertEqual(self.crear(consulta="?factor=x").status_code, 400)
+
+    def test_ejecutar_guarda_cada_mes_y_se_lee_desde(self):
+        trabajo_id = self.crear(consulta="?factor=10").data["id"]
+        self.assertTrue(cola.ejecutar_trabajo(trabajo_id, "prueba"))
+        self.assertFalse(cola.ejecutar_trabajo(trabajo_id, "otro"))
+
+        datos = self.detalle(trabajo_id).data
+        self.assertEqual((datos["estado"], datos["completados"]), (TERMINADO, 3))
+        self.assertEqual([parcial["secuencia"] for parcial in datos["parciales"]], [1, 2, 3])
+        filas = sorted((fila for parcial in datos["parciales"] for fila in parcial["filas"]), key=lambda fila: fila["mes"])
+        self.assertEqual(filas, VistaPrueba().calcular(MESES, factor=10))
+        self.assertEqual([parcial["secuencia"] for parcial in self.detalle(trabajo_id, desde=2).data["parciales"]], [3])
+
+    def test_retoma_los_meses_guardados(self):
+        trabajo_id = self.crear().data["id"]
+        TrabajoParcialModel.objects.create(trabajo_id=trabajo_id, secuencia=1, indice=1, periodo=2024, mes=2, filas=[])
+        with mock.patch.object(VistaPrueba, "calcular", autospec=True, side_effect=VistaPrueba.calcular) as calcular:
+            self.assertTrue(cola.ejecutar_trabajo(trabajo_id, "prueba"))
+        self.assertEqual(sorted(llamada.args[1][0]["mes"] for llamada in calcular.call_args_list), [1, 3])
+        self.assertEqual(sorted(TrabajoParcialModel.objects.filter(trabajo_id=trabajo_id).values_list("indice", flat=True)), [0, 1, 2])
+
+    def test_error_finaliza_el_trabajo(self):
+        trabajo_id = self.crear(datos=MESES + [{"periodo": 2024, "mes": 13}]).data["id"]
+        self.assertFalse(cola.ejecutar_trabajo(trabajo_id, "prueba"))
+        trabajo = TrabajoModel.objects.get(id=trabajo_id)
+        self.assertEqual((trabajo.estado, trabajo.error), (ERROR, "mes inválido"))
+
+    def test_reencolar_vencidos(self):
+        trabajo_id = self.crear().data["id"]
+        self.assertTrue(cola.tomar(trabajo_id, "muerto"))
+        self.assertEqual(cola.reencolar_vencidos(), 0)
+        TrabajoModel.objects.filter(id=trabajo_id).update(updated_at=timezone.now() - timedelta(seconds=cola.VENCIMIENTO + 1))
+        self.assertEqual(cola.reencolar_vencidos(), 1)
+        self.assertEqual(TrabajoModel.objects.get(id=trabajo_id).estado, PENDIENTE)
+        self.assertTrue(cola.tomar(trabajo_id, "nuevo"))
+        self.assertEqual(TrabajoModel.objects.get(id=trabajo_id).estado, EN_PROCESO)
+
+    def test_latido_solo_del_worker_que_lo_tiene(self):
+        trabajo_id = self.crear().data["id"]
+        self.assertTrue(cola.tomar(trabajo_id, "prueba"))
+        TrabajoModel.objects.filter(id=trabajo_id).update(updated_at=timezone.now() - timedelta(seconds=cola.VENCIMIENTO + 1))
+        self.assertFalse(cola.latido(trabajo_id, "otro"))
+        self.assertTrue(cola.latido(trabajo_id, "prueba"))
+        self.assertEqual(cola.reencolar_vencidos(), 0)
+
+    def test_se_detiene_si_otro_worker_lo_toma(self):
+        trabajo_id = self.crear().data["id"]
+
+        def tomado(funcion, items, *args):
+            TrabajoModel.objects.filter(id=trabajo_id).update(worker="nuevo")
+            yield 0, funcion(items[0], *args)
+
+        with mock.patch.object(cola, "completados_en_paralelo", tomado):
+            self.assertFalse(cola.ejecutar_trabajo(trabajo_id, "prueba"))
+        trabajo = TrabajoModel.objects.get(id=trabajo_id)
+        self.assertEqual((trabajo.estado, trabajo.worker, trabajo.error), (EN_PROCESO, "nuevo", None))
+        self.assertFalse(TrabajoParcialModel.objects.filter(trabajo_id=trabajo_id).exists())
+
+    def test_stream_termina_con_el_estado(self):
+        trabajo_id = self.crear().data["id"]
+        cola.ejecutar_trabajo(trabajo_id, "prueba")
+        request = self.factory.get(f"/v1/trabajos/{trabajo_id}/stream", {"desde": 1})
+        respuesta = TrabajoApiViewStream.as_view()(request, trabajo_id=trabajo_id)
+        lineas = [json.loads(linea) for linea in b"".join(respuesta.streaming_content).decode().splitlines()]
+        self.assertEqual([linea.get("secuencia") for linea in lineas[:-1]], [2, 3])
+        self.assertEqual(lineas[-1]["estado"], TERMINADO)
+
+    def test_stream_vence_con_el_estado_actual(self):
+        trabajo_id = self.crear().data["id"]
+        request = self.factory.get(f"/v1/trabajos/{trabajo_id}/stream")
+        with mock.patch.object(views, "DURACION_MAXIMA_STREAM", 0):
+            respuesta = TrabajoApiViewStream.as_view()(request, trabajo_id=trabajo_id)
+            lineas = [json.loads(linea) for linea in b"".join(respuesta.streaming_content).decode().splitlines()]
+        self.assertEqual(len(lineas), 1)
+        self.assertEqual((lineas[0]["estado"], lineas[0]["completados"]), (PENDIENTE, 0))
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from trabajos.views import TrabajoApiViewCrear, TrabajoApiViewDetail, TrabajoApiViewStream
+
+urlpatterns_trabajos = [
+    path('v1/trabajos/<uuid:trabajo_id>', TrabajoApiViewDetail.as_view()),
+    path('v1/trabajos/<uuid:trabajo_id>/stream', TrabajoApiViewStream.as_view()),
+    path('v1/trabajos/<path:reporte>', TrabajoApiViewCrear.as_view()),
+]
@@ -0,0 +1,109 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.http import StreamingHttpResponse
+
+from rest_framework import status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+
+from trabajos.cola import crear_trabajo
+from trabajos.models import ERROR, TERMINADO, TrabajoModel
+from trabajos.registro import reportes
+
+# Segundos entre lecturas de la base de datos mientras se transmite un trabajo.
+INTERVALO_STREAM = getattr(settings, "TRABAJOS_INTERVALO_STREAM", 1)
+# Segundos máximos que se mantiene abierto un stream; al vencer se envía el estado
+# actual y el cliente sigue con TrabajoApiViewDetail desde la última secuencia.
+DURACION_MAXIMA_STREAM = getattr(settings, "TRABAJOS_DURACION_MAXIMA_STREAM", 300)
+
+def estado_trabajo(trabajo):
+    return {
+        "id": str(trabajo.id),
+        "reporte": trabajo.reporte,
+        "estado": trabajo.estado,
+        "total": trabajo.total,
+        "completados": trabajo.completados,
+        "error": trabajo.error,
+        "created_at": trabajo.created_at,
+        "terminado_at": trabajo.terminado_at,
+    }
+
+def parciales_desde(trabajo, desde):
+    """Meses guardados después de la secuencia desde, en orden de llegada."""
+    return list(
+        trabajo.parciales.filter(secuencia__gt=desde)
+        .order_by("secuencia")
+        .values("secuencia", "indice", "periodo", "mes", "filas")
+    )
+
+def leer_desde(request):
+    try:
+        return max(int(request.query_params.get("desde", 0)), 0)
+    except ValueError:
+        raise ValueError("El parámetro desde debe ser un entero.")
+
+class TrabajoApiViewCrear(APIView):
+    def post(self, request, reporte):
+        """Encola el reporte con el mismo cuerpo (y parámetros) que su vista síncrona
+        y responde 202 con el id del trabajo."""
+        registrado = reportes.get(reporte)
+        if registrado is None or not registrado.publico:
+            return Response({"error": f"Reporte desconocido: {reporte}"}, status=status.HTTP_404_NOT_FOUND)
+        datos = request.data
+        if not isinstance(datos, list) or not datos:
+            return Response({"error": "Se esperaba una lista de meses."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            opciones = registrado.opciones(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        trabajo = crear_trabajo(reporte, datos, opciones)
+        return Response(estado_trabajo(trabajo), status=status.HTTP_202_ACCEPTED)
+
+class TrabajoApiViewDetail(APIView):
+    def get(self, request, trabajo_id):
+        """Estado del trabajo y los meses terminados después de ?desde=<secuencia>."""
+        try:
+            trabajo = TrabajoModel.objects.get(id=trabajo_id)
+        except TrabajoModel.DoesNotExist:
+            return Response({"error": "Trabajo no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            desde = leer_desde(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({**estado_trabajo(trabajo), "parciales": parciales_desde(trabajo, desde)})
+
+class TrabajoApiViewStream(APIView):
+    def get(self, request, trabajo_id):
+        """NDJSON con una línea por mes a medida que el trabajo los guarda y una
+        línea final con el estado cuando termina o vence el stream."""
+        if not TrabajoModel.objects.filter(id=trabajo_id).exists():
+            return Response({"error": "Trabajo no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            desde = leer_desde(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        respuesta = StreamingHttpResponse(transmitir(trabajo_id, desde), content_type="application/x-ndjson")
+        respuesta["Cache-Control"] = "no-cache"
+        respuesta["X-Accel-Buffering"] = "no"
+        return respuesta
+
+def transmitir(trabajo_id, desde):
+    limite = time.monotonic() + DURACION_MAXIMA_STREAM
+    try:
+        while True:
+            trabajo = TrabajoModel.objects.get(id=trabajo_id)
+            for parcial in parciales_desde(trabajo, desde):
+                desde = parcial["secuencia"]
+                yield json.dumps(parcial, cls=DjangoJSONEncoder) + "\n"
+            if trabajo.estado in (TERMINADO, ERROR) or time.monotonic() >= limite:
+                # Los meses guardados antes de finalizar ya salieron arriba; si el
+                # trabajo sigue pendiente o en proceso, el cliente pasa a consultar.
+                yield json.dumps(estado_trabajo(trabajo), cls=DjangoJSONEncoder) + "\n"
+                return
+            time.sleep(INTERVALO_STREAM)
+    finally:
+        close_old_connections()